@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark of the documentation value formatting over the files of a backup.
+
+Run from the repository root:
+    python -m benchmarks.clean_list -p /path/to/backup
+"""
+
+import os
+import copy
+import time
+import argparse
+
+from src.IntuneCD.documentation_functions import clean_list
+from src.IntuneCD.load_file import load_file
+from src.IntuneCD.scan_files import walk_files
+
+
+def load_backup(path):
+    """
+    This function loads all configuration files of a backup.
+
+    :param path: Path where the backup is saved
+    :return: List of configurations
+    """
+
+    configs = []
+    for filename in walk_files(path):
+        with open(filename) as f:
+            configs.append(load_file(filename, f))
+
+    return configs
+
+
+def start():
+    parser = argparse.ArgumentParser(description="Benchmark clean_list over the files of a backup")
+    parser.add_argument("-p", "--path", help="Path to where the backup is saved", default=os.environ.get("REPO_DIR"))
+    parser.add_argument("-r", "--repeat", help="Number of times to format the backup", type=int, default=5)
+    args = parser.parse_args()
+
+    configs = load_backup(args.path)
+    values = sum(len(config) for config in configs)
+
+    timings = []
+    for _ in range(args.repeat):
+        data = copy.deepcopy(configs)
+        start_time = time.perf_counter()
+        for config in data:
+            clean_list(config.values())
+        timings.append(time.perf_counter() - start_time)
+
+    best = min(timings)
+    print(f"{len(configs)} files, {values} values")
+    print(f"best of {args.repeat}: {best * 1000:.2f} ms, {values / best:.0f} values/s")
+
+
+if __name__ == '__main__':
+    start()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-in for the Microsoft Graph API, serving a synthetic tenant from benchmarks.tenant.
+
+Implements the behaviors IntuneCD relies on: collection listing with @odata.nextLink paging, single objects,
+assignments and other sub collections, $select, $batch, writes, 429 throttling with Retry-After, ETags with
+conditional GET requests and delta requests on collections.
+Requests to IntuneCD are sent to the server with src.IntuneCD.graph_request.set_graph_url.
+
+Run from the repository root:
+    python -m benchmarks.graph_server --size 10000 --latency 0.05 --throttle 0.01
+"""
+
+import re
+import json
+import hashlib
+import time
+import random
+import argparse
+import threading
+import collections
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode, unquote
+from benchmarks.tenant import DETAIL_FIELDS, generate_tenant
+
+# Graph returns at most this many requests in one $batch
+BATCH_LIMIT = 20
+
+# Actions on objects, POST to other paths creates an object in the collection
+ACTIONS = ('assign', 'updateSettings', 'scheduleActionsForRules', 'createInstance')
+
+ID_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+# Singletons IntuneCD backs up, served as not found as the synthetic tenant does not configure them
+SINGLETONS = (
+    'deviceManagement/applePushNotificationCertificate',
+    'deviceManagement/androidManagedStoreAccountEnterpriseSettings',
+)
+
+# Status code of writes, by method and path with object ids replaced by {id}. Updates return 204 and creates 201
+# unless listed here, the same as the status codes update expects from Graph
+WRITE_STATUS = {
+    ('PATCH', 'deviceManagement/assignmentFilters/{id}'): 200,
+    ('PATCH', 'deviceManagement/deviceManagementScripts/{id}'): 200,
+    ('PATCH', 'deviceManagement/deviceShellScripts/{id}'): 200,
+    ('PATCH', 'deviceManagement/deviceHealthScripts/{id}'): 200,
+    ('PATCH', 'deviceManagement/deviceEnrollmentConfigurations/{id}'): 200,
+    ('PATCH', 'deviceManagement/windowsAutopilotDeploymentProfiles/{id}'): 200,
+    ('PATCH', 'deviceManagement/notificationMessageTemplates/{id}'): 200,
+    ('PATCH', 'deviceManagement/notificationMessageTemplates/{id}/localizedNotificationMessages/{id}'): 200,
+    ('POST', 'deviceManagement/notificationMessageTemplates'): 200,
+    ('POST', 'deviceManagement/intents/{id}/assign'): 204,
+    ('POST', 'deviceManagement/intents/{id}/updateSettings'): 204,
+}
+
+
+def write_status(method, path, default):
+    """
+    This function gets the status code of a write.
+
+    :param method: The HTTP method
+    :param path: The path of the request
+    :param default: The status code if the write is not listed in WRITE_STATUS
+    :return: The status code
+    """
+
+    pattern = '/'.join('{id}' if ID_PATTERN.match(part) else part for part in path.split('/'))
+    return WRITE_STATUS.get((method, pattern), default)
+
+
+class GraphServer:
+    """
+    Graph stand-in running in a background thread.
+    """
+
+    def __init__(self, tenant, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, throttle=0.0, page_size=100,
+                 retry_after=1, seed=0, limit=None):
+        """
+        :param tenant: The tenant to serve
+        :param host: The host to listen on
+        :param port: The port to listen on, 0 picks a free port
+        :param latency: Seconds each response is delayed
+        :param jitter: Up to this many seconds are added to the latency at random
+        :param throttle: Share of the requests answered with 429 Too Many Requests
+        :param page_size: The number of objects in each page of a collection, unless $top is set
+        :param retry_after: Seconds sent in the Retry-After header of throttled requests
+        :param seed: Seed of the random generator used for latency and throttling
+        :param limit: Requests per second above which requests are answered with 429, like the per tenant limit of
+                      Graph. Requests in a $batch count separately
+        """
+
+        self.tenant = tenant
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle = throttle
+        self.page_size = page_size
+        self.retry_after = retry_after
+        self.limit = limit
+        self.accepted = collections.deque()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'batch_requests': 0, 'throttled': 0, 'not_modified': 0, 'bytes_sent': 0,
+                      'connections': 0}
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        This function starts serving requests in a background thread.
+
+        :return: The URL of the server
+        """
+
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        """
+        This function stops the server.
+        """
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def delay(self):
+        """
+        This function waits for the configured latency.
+        """
+
+        with self.lock:
+            seconds = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if seconds:
+            time.sleep(seconds)
+
+    def throttled(self):
+        """
+        This function decides if a request is throttled, at random or because the limit is exceeded.
+
+        :return: True if the request should be answered with 429
+        """
+
+        if not self.throttle and not self.limit:
+            return False
+        with self.lock:
+            throttled = bool(self.throttle) and self.random.random() < self.throttle
+            if self.limit:
+                # Count the requests accepted in the last second
+                now = time.monotonic()
+                while self.accepted and self.accepted[0] <= now - 1:
+                    self.accepted.popleft()
+                throttled = throttled or len(self.accepted) >= self.limit
+                if not throttled:
+                    self.accepted.append(now)
+            if throttled:
+                self.stats['throttled'] += 1
+        return throttled
+
+    def context(self, path):
+        return f"{self.url}/beta/$metadata#{path}"
+
+    def handle(self, method, path, query, body):
+        """
+        This function handles a request, also used for each request in a $batch.
+
+        :param method: The HTTP method
+        :param path: The path relative to the Graph version
+        :param query: Dict of query parameters
+        :param body: The parsed JSON body, or None
+        :return: The status code, headers and the body to return as JSON, or None for no body
+        """
+
+        with self.lock:
+            self.stats['requests'] += 1
+
+        if self.throttled():
+            return 429, {'Retry-After': str(self.retry_after)}, _error('TooManyRequests', 'Too many requests')
+
+        path = path.strip('/')
+        if method == 'GET':
+            return self.get(path, query)
+        if method == 'POST':
+            return self.post(path, body)
+        if method in ('PATCH', 'PUT'):
+            return self.update(method, path, body)
+        if method == 'DELETE':
+            if self.tenant.remove(path):
+                return 204, {}, None
+            return 404, {}, _error('ResourceNotFound', path)
+
+        return 405, {}, _error('MethodNotAllowed', method)
+
+    def get(self, path, query):
+        select = query.get('$select')
+        fields = set(select.split(',')) | {'id', '@odata.type'} if select else None
+
+        if path.endswith('/delta'):
+            return self.delta(path[:-len('/delta')], query, fields)
+
+        if path in self.tenant.collections:
+            return 200, {}, self.page(path, query, fields)
+
+        obj = self.tenant.get_object(path)
+        if obj is not None:
+            return 200, {}, dict(_project(obj, fields), **{'@odata.context': self.context(path)})
+
+        if path in SINGLETONS or ID_PATTERN.match(path.rsplit('/', 1)[-1]):
+            return 404, {}, _error('ResourceNotFound', path)
+
+        # Collections and sub collections without objects are empty
+        return 200, {}, {'@odata.context': self.context(path), 'value': []}
+
+    def page(self, path, query, fields):
+        objects = self.tenant.collections[path]
+        top = int(query.get('$top', self.page_size))
+        skip = int(query.get('$skiptoken', 0))
+        value = [_project(obj, fields, DETAIL_FIELDS.get(path, ())) for obj in objects[skip:skip + top]]
+        page = {'@odata.context': self.context(path), 'value': value}
+        if skip + top < len(objects):
+            next_query = {key: val for key, val in query.items() if key != '$skiptoken'}
+            next_query['$skiptoken'] = skip + top
+            page['@odata.nextLink'] = f"{self.url}/beta/{path}?{urlencode(next_query)}"
+        return page
+
+    def delta(self, collection, query, fields):
+        # Collections of objects support delta, sub collections and singletons are answered with 400
+        if collection not in self.tenant.collections or collection.count('/') > 1:
+            return 400, {}, _error('BadRequest', f"Delta is not supported for {collection}")
+
+        if '$deltatoken' in query:
+            if not query['$deltatoken'].isdigit():
+                return 410, {}, _error('SyncStateNotFound', 'The delta token is not valid')
+            objects = self.tenant.changes(collection, int(query['$deltatoken']))
+        else:
+            objects = self.tenant.collections[collection]
+        top = int(query.get('$top', self.page_size))
+        skip = int(query.get('$skiptoken', 0))
+        value = [obj if '@removed' in obj else _project(obj, fields, DETAIL_FIELDS.get(collection, ()))
+                 for obj in objects[skip:skip + top]]
+        page = {'@odata.context': self.context(collection), 'value': value}
+        if skip + top < len(objects):
+            next_query = {key: val for key, val in query.items() if key != '$skiptoken'}
+            next_query['$skiptoken'] = skip + top
+            page['@odata.nextLink'] = f"{self.url}/beta/{collection}/delta?{urlencode(next_query)}"
+        else:
+            page['@odata.deltaLink'] = (f"{self.url}/beta/{collection}/delta?"
+                                        f"{urlencode({'$deltatoken': self.tenant.version})}")
+        return 200, {}, page
+
+    def post(self, path, body):
+        if path == '$batch':
+            return self.batch(body)
+
+        if path.rsplit('/', 1)[-1] not in ACTIONS:
+            obj = dict(body or {})
+            obj.pop('id', None)
+            obj = self.tenant.add(path, obj)
+            return write_status('POST', path, 201), {}, obj
+
+        status = write_status('POST', path, 200)
+        action = path.rsplit('/', 1)[-1]
+        if action == 'createInstance':
+            obj = dict(body or {})
+            obj['templateId'] = path.split('/')[-2]
+            return status, {}, self.tenant.add('deviceManagement/intents', obj)
+        if action == 'assign':
+            self.tenant.collections[path.rsplit('/', 1)[0] + '/assignments'] = (body or {}).get('assignments', [])
+        return status, {}, None
+
+    def update(self, method, path, body):
+        obj = self.tenant.get_object(path)
+        if obj is None:
+            return 404, {}, _error('ResourceNotFound', path)
+        if method == 'PUT':
+            obj.clear()
+            obj['id'] = path.rsplit('/', 1)[1]
+        obj.update({key: value for key, value in (body or {}).items() if key != 'id'})
+        self.tenant.touch(path)
+        return write_status(method, path, 204), {}, None
+
+    def batch(self, body):
+        requests = (body or {}).get('requests', [])
+        if len(requests) > BATCH_LIMIT:
+            return 400, {}, _error('BadRequest', f"A maximum of {BATCH_LIMIT} requests is allowed in a batch")
+
+        with self.lock:
+            self.stats['batch_requests'] += 1
+
+        responses = []
+        for request in requests:
+            url = urlsplit(request['url'])
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            status, headers, response = self.handle(request.get('method', 'GET'), unquote(url.path), query,
+                                                    request.get('body'))
+            responses.append({'id': str(request['id']), 'status': status, 'headers': headers, 'body': response or {}})
+
+        return 200, {}, {'responses': responses}
+
+
+def _error(code, message):
+    return {'error': {'code': code, 'message': message}}
+
+
+def _project(obj, fields, omit=()):
+    if fields is None:
+        return {key: value for key, value in obj.items() if key not in omit}
+    return {key: value for key, value in obj.items() if key in fields}
+
+
+def _handler(server):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            with server.lock:
+                server.stats['connections'] += 1
+
+        def respond(self, method):
+            url = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            data = self.rfile.read(length) if length else b''
+
+            if not self.headers.get('Authorization'):
+                status, headers, body = 401, {}, _error('InvalidAuthenticationToken', 'Access token is empty')
+            else:
+                server.delay()
+                path = unquote(url.path)
+                for version in ('/beta/', '/v1.0/'):
+                    if path.startswith(version):
+                        path = path[len(version):]
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                status, headers, body = server.handle(method, path, query, json.loads(data) if data else None)
+
+            content = json.dumps(body).encode('utf-8') if body is not None else b''
+            if method == 'GET' and status == 200:
+                # The ETag changes with the body, so unchanged responses are answered with 304 Not Modified
+                headers = dict(headers, ETag=f'W/"{hashlib.sha256(content).hexdigest()[:16]}"')
+                if self.headers.get('If-None-Match') == headers['ETag']:
+                    status, content = 304, b''
+                    with server.lock:
+                        server.stats['not_modified'] += 1
+            with server.lock:
+                server.stats['bytes_sent'] += len(content)
+
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            if content:
+                self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self):
+            self.respond('GET')
+
+        def do_POST(self):
+            self.respond('POST')
+
+        def do_PATCH(self):
+            self.respond('PATCH')
+
+        def do_PUT(self):
+            self.respond('PUT')
+
+        def do_DELETE(self):
+            self.respond('DELETE')
+
+    return Handler
+
+
+def start():
+    parser = argparse.ArgumentParser(description="Serve a synthetic tenant as a local Graph stand-in")
+    parser.add_argument("--size", help="Number of objects in the tenant", type=int, default=1000)
+    parser.add_argument("--seed", help="Seed of the tenant generator", type=int, default=0)
+    parser.add_argument("--settings", help="Number of settings in each policy", type=int, default=20)
+    parser.add_argument("--assignments", help="Number of assignments of each object", type=int, default=2)
+    parser.add_argument("--latency", help="Seconds each response is delayed", type=float, default=0.0)
+    parser.add_argument("--jitter", help="Random seconds added to the latency", type=float, default=0.0)
+    parser.add_argument("--throttle", help="Share of requests answered with 429", type=float, default=0.0)
+    parser.add_argument("--limit", help="Requests per second above which requests are answered with 429", type=float)
+    parser.add_argument("--pagesize", help="Objects in each page of a collection", type=int, default=100)
+    parser.add_argument("--port", help="Port to listen on", type=int, default=8000)
+    args = parser.parse_args()
+
+    tenant = generate_tenant(args.size, args.seed, settings=args.settings, assignments=args.assignments)
+    server = GraphServer(tenant, port=args.port, latency=args.latency, jitter=args.jitter, throttle=args.throttle,
+                         page_size=args.pagesize, seed=args.seed, limit=args.limit)
+    print(f"Serving {sum(tenant.count().values())} objects on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    start()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of the start up time of the IntuneCD commands, measured with python -X importtime.
+
+Each command module is imported in a new process. The import time of the module and the heavy dependencies it
+imports are reported, heavy dependencies should only be imported once a category or option that needs them runs.
+
+Run from the repository root, --check exits with an error if a command is over the import time budget:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --check
+"""
+
+import sys
+import argparse
+import subprocess
+
+# Module of each command
+COMMANDS = {
+    'IntuneCD-startbackup': 'src.IntuneCD.run_backup',
+    'IntuneCD-startupdate': 'src.IntuneCD.run_update',
+    'IntuneCD-startdocumentation': 'src.IntuneCD.run_documentation',
+    'IntuneCD-startdevtoprod': 'src.IntuneCD.run_devtoprod',
+}
+
+# Dependencies that add noticeably to the start up time
+HEAVY_MODULES = ('adal', 'requests', 'yaml', 'deepdiff', 'pytablewriter', 'asyncio')
+
+# Seconds importing a command module may take, the modules imported eagerly took more than 0.1s
+IMPORT_BUDGET = 0.06
+
+
+def import_times(module):
+    """
+    This function imports a module in a new process and gets the time each imported module took.
+
+    :param module: The module to import
+    :return: Dict of module and cumulative seconds, including the modules it imported
+    """
+
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            check=True, stderr=subprocess.PIPE, text=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative_us) / 1e6
+
+    return times
+
+
+def measure(module, runs=3):
+    """
+    This function measures the import time of a module.
+
+    :param module: The module to import
+    :param runs: The number of times to import the module, the fastest run is used
+    :return: Dict with the import time in seconds and the heavy dependencies imported
+    """
+
+    fastest = min((import_times(module) for i in range(runs)), key=lambda times: times[module])
+    return {
+        'seconds': round(fastest[module], 6),
+        'heavy_modules': [name for name in HEAVY_MODULES if name in fastest]
+    }
+
+
+def start():
+    parser = argparse.ArgumentParser(description="Measure the start up time of the IntuneCD commands")
+    parser.add_argument("--runs", help="The number of times to import each command, the fastest run is used. "
+                                       "Default is 3", type=int, default=3)
+    parser.add_argument("--check", help=f"Exit with an error if a command takes more than the budget of "
+                                        f"{IMPORT_BUDGET * 1000:g}ms to import", action='store_true')
+    args = parser.parse_args()
+
+    over_budget = []
+    for command, module in COMMANDS.items():
+        result = measure(module, args.runs)
+        if result['seconds'] > IMPORT_BUDGET:
+            over_budget.append(command)
+        print(f"{command:<28} {result['seconds'] * 1000:6.1f}ms  heavy modules: "
+              f"{', '.join(result['heavy_modules']) or 'none'}")
+
+    if args.check and over_budget:
+        sys.exit(f"Over the import time budget of {IMPORT_BUDGET * 1000:g}ms: {', '.join(over_budget)}")
+
+
+if __name__ == "__main__":
+    start()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end benchmark of backup, update and documentation against the local Graph stand-in.
+
+For each tenant size a synthetic tenant is served by benchmarks.graph_server, then backup, update and
+documentation each run in their own process so peak RSS and CPU time are measured per phase. Results are saved
+as JSON and can be compared with the results of an earlier run to catch regressions.
+
+Run from the repository root:
+    python -m benchmarks.suite --sizes 100 1000 10000 50000 --out results.json
+    python -m benchmarks.suite --sizes 100 1000 --compare results.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import resource
+import contextlib
+import subprocess
+
+from benchmarks.tenant import generate_tenant
+from benchmarks.graph_server import GraphServer
+
+SIZES = (100, 1000, 10000, 50000)
+PHASES = ('backup', 'update', 'documentation')
+RESULTS_VERSION = 1
+
+# Measurements compared with the baseline, a result is a regression when it is higher by more than the tolerance
+COMPARED = ('wall_seconds', 'cpu_seconds', 'peak_rss_kb', 'requests')
+
+TOKEN = {'accessToken': 'benchmark'}
+
+
+def run_phase(phase, path, url):
+    """
+    This function runs one phase in the current process and measures it.
+
+    :param phase: backup, update or documentation
+    :param path: The path of the backup
+    :param url: The URL of the Graph stand-in
+    :return: Dict of measurements
+    """
+
+    from src.IntuneCD.graph_request import set_graph_url
+    from src.IntuneCD.metrics import start_metrics, metrics_report
+
+    set_graph_url(url)
+    start_metrics()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if phase == 'backup':
+            from src.IntuneCD.run_backup import run_backup
+            run_backup(path, 'json', [], TOKEN)
+        elif phase == 'update':
+            from src.IntuneCD.run_update import run_update
+            run_update(path, TOKEN, True, [])
+        else:
+            from src.IntuneCD.run_documentation import start
+            sys.argv = ['IntuneCD-startdocumentation', '-p', path, '-o', os.path.join(path, 'README.md')]
+            start()
+
+    report = metrics_report()
+    return {
+        'wall_seconds': round(time.perf_counter() - wall_start, 6),
+        'cpu_seconds': round(time.process_time() - cpu_start, 6),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'requests': report['requests'],
+        'bytes_received': report['bytes_received'],
+        'categories': report['categories']
+    }
+
+
+def measure(phase, path, url):
+    """
+    This function runs one phase in a new process.
+
+    :param phase: backup, update or documentation
+    :param path: The path of the backup
+    :param url: The URL of the Graph stand-in
+    :return: Dict of measurements
+    """
+
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.suite', '--phase', phase, '--path', path, '--url', url],
+        check=True, stdout=subprocess.PIPE, text=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def run_suite(sizes, seed=0, latency=0.0, phases=PHASES):
+    """
+    This function runs the benchmark for each tenant size.
+
+    :param sizes: List of tenant sizes
+    :param seed: Seed of the tenant generator
+    :param latency: Seconds each Graph response is delayed
+    :param phases: The phases to run, backup always runs as the other phases use the backup
+    :return: The results
+    """
+
+    results = []
+    for size in sizes:
+        tenant = generate_tenant(size, seed)
+        path = tempfile.mkdtemp(prefix='IntuneCD-benchmark-')
+        try:
+            with GraphServer(tenant, latency=latency, seed=seed) as server:
+                for phase in PHASES:
+                    if phase != 'backup' and phase not in phases:
+                        continue
+                    result = measure(phase, path, server.url)
+                    result.update({'size': size, 'phase': phase})
+                    results.append(result)
+                    print(f"{size:>6} {phase:<14} {result['wall_seconds']:8.2f}s {result['cpu_seconds']:8.2f}s CPU "
+                          f"{result['peak_rss_kb'] / 1024:8.1f} MB {result['requests']:>7} requests")
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    return {
+        'version': RESULTS_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'latency': latency,
+        'results': results
+    }
+
+
+def compare_results(results, baseline, tolerance=0.2):
+    """
+    This function compares results with a baseline.
+
+    :param results: The results of this run
+    :param baseline: The results of an earlier run
+    :param tolerance: Share a measurement can be higher than the baseline before it is a regression
+    :return: List of regressions
+    """
+
+    previous = {(result['size'], result['phase']): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        base = previous.get((result['size'], result['phase']))
+        if base is None:
+            continue
+        for key in COMPARED:
+            if base[key] and result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{result['size']} {result['phase']}: {key} {base[key]} -> {result[key]} "
+                                   f"(+{(result[key] / base[key] - 1) * 100:.0f}%)")
+
+    return regressions
+
+
+def start():
+    parser = argparse.ArgumentParser(description="Benchmark backup, update and documentation against a local Graph "
+                                                 "stand-in")
+    parser.add_argument("--sizes", help="Tenant sizes to benchmark", type=int, nargs='+', default=list(SIZES))
+    parser.add_argument("--seed", help="Seed of the tenant generator", type=int, default=0)
+    parser.add_argument("--latency", help="Seconds each Graph response is delayed", type=float, default=0.0)
+    parser.add_argument("--phases", help="Phases to run", choices=PHASES, nargs='+', default=list(PHASES))
+    parser.add_argument("--out", help="Path to save the results to as JSON", type=str)
+    parser.add_argument("--compare", help="Path to results of an earlier run to compare with", type=str)
+    parser.add_argument("--tolerance", help="Share a measurement can increase before it is reported as a "
+                                            "regression. Default is 0.2", type=float, default=0.2)
+    # Used by measure to run a phase in a new process
+    parser.add_argument("--phase", help=argparse.SUPPRESS, choices=PHASES)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        print(json.dumps(run_phase(args.phase, args.path, args.url)))
+        return
+
+    results = run_suite(args.sizes, args.seed, args.latency, args.phases)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("Regression: " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions found")
+
+
+if __name__ == "__main__":
+    start()
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+
+"""
+Seeded generator of synthetic Intune tenants, served by benchmarks.graph_server.
+
+The same size and seed always give the same tenant. Objects are spread over the categories IntuneCD backs up
+with list, batch and assignment requests, categories without generated objects are served as empty collections.
+"""
+
+import uuid
+import base64
+import random
+
+# Share of the objects generated for each collection
+WEIGHTS = {
+    'deviceManagement/deviceConfigurations': 0.3,
+    'deviceManagement/configurationPolicies': 0.2,
+    'deviceManagement/deviceCompliancePolicies': 0.1,
+    'deviceManagement/assignmentFilters': 0.05,
+    'deviceManagement/deviceManagementScripts': 0.1,
+    'deviceManagement/deviceShellScripts': 0.05,
+    'deviceManagement/deviceHealthScripts': 0.1,
+    'deviceManagement/intents': 0.1,
+}
+
+# Fields Graph only returns when a single object is requested
+DETAIL_FIELDS = {
+    'deviceManagement/deviceManagementScripts': ('scriptContent',),
+    'deviceManagement/deviceShellScripts': ('scriptContent',),
+    'deviceManagement/deviceHealthScripts': ('detectionScriptContent', 'remediationScriptContent'),
+}
+
+# Collections that can be assigned, assignments are served from {collection}/{id}/assignments
+ASSIGNABLE = (
+    'deviceManagement/deviceConfigurations',
+    'deviceManagement/configurationPolicies',
+    'deviceManagement/deviceCompliancePolicies',
+    'deviceManagement/deviceManagementScripts',
+    'deviceManagement/deviceShellScripts',
+    'deviceManagement/deviceHealthScripts',
+    'deviceManagement/intents',
+)
+
+PROFILE_TYPES = ('windows10GeneralConfiguration', 'iosGeneralDeviceConfiguration', 'macOSCustomConfiguration')
+TEMPLATES = ('Security Baseline', 'Endpoint Protection', 'Account Protection')
+
+MOBILECONFIG = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">
+<plist version="1.0">
+<dict>
+    <key>PayloadDisplayName</key>
+    <string>{name}</string>
+    <key>PayloadIdentifier</key>
+    <string>com.intunecd.{index}</string>
+</dict>
+</plist>
+"""
+
+
+class Tenant:
+    """
+    Synthetic tenant. Collections are lists of objects by their path relative to the Graph version, such as
+    deviceManagement/deviceConfigurations or deviceManagement/configurationPolicies/{id}/settings.
+    """
+
+    def __init__(self, seed=0):
+        """
+        :param seed: Seed of the random generator
+        """
+
+        self.random = random.Random(seed)
+        self.collections = {}
+        self.objects = {}
+        # Changes are numbered so delta requests can return the changes since a number
+        self.version = 0
+        self.versions = {}
+        self.removed = {}
+
+    def new_id(self):
+        """
+        This function creates an object id.
+
+        :return: A random UUID from the seeded generator
+        """
+
+        return str(uuid.UUID(int=self.random.getrandbits(128), version=4))
+
+    def add(self, collection, obj):
+        """
+        This function adds an object to a collection, an id is created if the object does not have one.
+
+        :param collection: The path of the collection
+        :param obj: The object to add
+        :return: The object
+        """
+
+        obj.setdefault('id', self.new_id())
+        self.collections.setdefault(collection, []).append(obj)
+        self.objects[f"{collection}/{obj['id']}"] = obj
+        self.touch(f"{collection}/{obj['id']}")
+        return obj
+
+    def touch(self, path):
+        """
+        This function records that an object changed.
+
+        :param path: The path of the object, {collection}/{id}
+        """
+
+        self.version += 1
+        self.versions[path] = self.version
+
+    def get_object(self, path):
+        """
+        This function gets an object by path.
+
+        :param path: The path of the object, {collection}/{id}
+        :return: The object, or None if it does not exist
+        """
+
+        return self.objects.get(path)
+
+    def remove(self, path):
+        """
+        This function removes an object.
+
+        :param path: The path of the object, {collection}/{id}
+        :return: True if the object existed
+        """
+
+        obj = self.objects.pop(path, None)
+        if obj is None:
+            return False
+        collection = path.rsplit('/', 1)[0]
+        self.collections[collection].remove(obj)
+        self.version += 1
+        self.versions.pop(path, None)
+        self.removed.setdefault(collection, []).append((self.version, obj['id']))
+        return True
+
+    def changes(self, collection, since):
+        """
+        This function gets the objects of a collection that changed after a version, as returned by delta.
+
+        :param collection: The path of the collection
+        :param since: The version to get the changes after
+        :return: List of changed objects in the order they changed, removed objects only have id and @removed
+        """
+
+        changes = [(self.versions[f"{collection}/{obj['id']}"], obj) for obj in self.collections.get(collection, [])]
+        changes += [(version, {'id': id, '@removed': {'reason': 'deleted'}})
+                    for version, id in self.removed.get(collection, [])]
+        # In the order of the changes, so an object removed and added again is not returned as removed last
+        return [obj for version, obj in sorted(changes, key=lambda change: change[0]) if version > since]
+
+    def count(self):
+        """
+        This function counts the objects in the tenant, not counting assignments, settings and groups.
+
+        :return: Dict of collection and number of objects
+        """
+
+        return {collection: len(self.collections.get(collection, [])) for collection in WEIGHTS}
+
+
+def _timestamp(rng):
+    return f"2022-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z"
+
+
+def _base(tenant, collection, odata_type, name):
+    return {
+        '@odata.type': '#microsoft.graph.' + odata_type,
+        'id': tenant.new_id(),
+        'displayName': name,
+        'description': f"Synthetic {odata_type} generated for benchmarking",
+        'createdDateTime': _timestamp(tenant.random),
+        'lastModifiedDateTime': _timestamp(tenant.random),
+        'roleScopeTagIds': ['0'],
+    }
+
+
+def _settings(rng, prefix, count):
+    settings = {}
+    for i in range(count):
+        kind = rng.randint(0, 2)
+        if kind == 0:
+            settings[f"{prefix}Setting{i}Enabled"] = rng.random() < 0.5
+        elif kind == 1:
+            settings[f"{prefix}Setting{i}Value"] = rng.randint(0, 1000)
+        else:
+            settings[f"{prefix}Setting{i}Mode"] = rng.choice(['notConfigured', 'enabled', 'disabled', 'block'])
+    return settings
+
+
+def _script(name, lines):
+    return base64.b64encode('\n'.join(f"Write-Output \"{name} {i}\"" for i in range(lines)).encode()).decode()
+
+
+def _profile(tenant, i, settings):
+    odata_type = PROFILE_TYPES[i % len(PROFILE_TYPES)]
+    name = f"Profile {i:05d}"
+    profile = _base(tenant, 'deviceManagement/deviceConfigurations', odata_type, name)
+    profile['version'] = 1
+    profile['supportsScopeTags'] = True
+    if odata_type == 'macOSCustomConfiguration':
+        profile['payloadName'] = name
+        profile['payloadFileName'] = f"profile{i:05d}.mobileconfig"
+        profile['payload'] = base64.b64encode(MOBILECONFIG.format(name=name, index=i).encode()).decode()
+    else:
+        profile.update(_settings(tenant.random, 'profile', settings))
+    return profile
+
+
+def _compliance(tenant, i, settings):
+    policy = _base(tenant, 'deviceManagement/deviceCompliancePolicies', 'windows10CompliancePolicy',
+                   f"Compliance {i:05d}")
+    policy['version'] = 1
+    policy.update(_settings(tenant.random, 'compliance', settings))
+    policy['scheduledActionsForRule'] = [{
+        'id': tenant.new_id(),
+        'ruleName': None,
+        'scheduledActionConfigurations': [{
+            'id': tenant.new_id(),
+            'gracePeriodHours': 0,
+            'actionType': 'block',
+            'notificationTemplateId': '',
+            'notificationMessageCCList': []
+        }]
+    }]
+    return policy
+
+
+def _settings_catalog(tenant, i, settings):
+    policy = {
+        'id': tenant.new_id(),
+        'name': f"Settings Catalog {i:05d}",
+        'description': "Synthetic Settings Catalog policy generated for benchmarking",
+        'platforms': 'windows10',
+        'technologies': 'mdm',
+        'createdDateTime': _timestamp(tenant.random),
+        'lastModifiedDateTime': _timestamp(tenant.random),
+        'settingCount': settings,
+        'roleScopeTagIds': ['0'],
+        'templateReference': {'templateId': '', 'templateFamily': 'none', 'templateDisplayName': None,
+                              'templateDisplayVersion': None}
+    }
+    values = []
+    for s in range(settings):
+        definition = f"device_vendor_msft_policy_config_synthetic_setting{s}"
+        values.append({
+            'id': str(s),
+            'settingInstance': {
+                '@odata.type': '#microsoft.graph.deviceManagementConfigurationChoiceSettingInstance',
+                'settingDefinitionId': definition,
+                'settingInstanceTemplateReference': None,
+                'choiceSettingValue': {
+                    'settingValueTemplateReference': None,
+                    'value': f"{definition}_{tenant.random.randint(0, 1)}",
+                    'children': []
+                }
+            }
+        })
+    return policy, values
+
+
+def _filter(tenant, i):
+    return {
+        'id': tenant.new_id(),
+        'displayName': f"Filter {i:05d}",
+        'description': "",
+        'platform': 'windows10AndLater',
+        'rule': f'(device.deviceName -eq "device{i}")',
+        'roleScopeTags': ['0'],
+    }
+
+
+def _powershell_script(tenant, i, lines):
+    script = _base(tenant, 'deviceManagement/deviceManagementScripts', 'deviceManagementScript', f"Script {i:05d}")
+    script.update({'runAsAccount': 'system', 'enforceSignatureCheck': False, 'fileName': f"script{i:05d}.ps1",
+                   'runAs32Bit': False, 'scriptContent': _script(script['displayName'], lines)})
+    return script
+
+
+def _shell_script(tenant, i, lines):
+    script = _base(tenant, 'deviceManagement/deviceShellScripts', 'deviceShellScript', f"Shell Script {i:05d}")
+    script.update({'runAsAccount': 'system', 'fileName': f"script{i:05d}.sh", 'executionFrequency': 'PT0S',
+                   'retryCount': 0, 'blockExecutionNotifications': True,
+                   'scriptContent': _script(script['displayName'], lines)})
+    return script
+
+
+def _health_script(tenant, i, lines):
+    script = _base(tenant, 'deviceManagement/deviceHealthScripts', 'deviceHealthScript', f"Remediation {i:05d}")
+    script.update({'publisher': 'IntuneCD', 'version': '1', 'runAsAccount': 'system', 'enforceSignatureCheck': False,
+                   'runAs32Bit': False, 'isGlobalScript': False,
+                   'detectionScriptContent': _script(script['displayName'] + ' detection', lines),
+                   'remediationScriptContent': _script(script['displayName'] + ' remediation', lines)})
+    return script
+
+
+def _intent(tenant, i, templates, settings):
+    template, categories = templates[i % len(templates)]
+    intent = {
+        'id': tenant.new_id(),
+        'displayName': f"Intent {i:05d}",
+        'description': "",
+        'isAssigned': False,
+        'lastModifiedDateTime': _timestamp(tenant.random),
+        'templateId': template['id'],
+        'roleScopeTagIds': ['0'],
+    }
+    for c, category in enumerate(categories):
+        values = []
+        for s in range(settings // len(categories)):
+            values.append({
+                '@odata.type': '#microsoft.graph.deviceManagementBooleanSettingInstance',
+                'id': tenant.new_id(),
+                'definitionId': f"deviceConfiguration--synthetic_category{c}Setting{s}",
+                'valueJson': 'true',
+                'value': True
+            })
+        tenant.collections[f"deviceManagement/intents/{intent['id']}/categories/{category['id']}/settings"] = values
+    return intent
+
+
+def _assignments(tenant, groups, filters, count):
+    assignments = []
+    for group in tenant.random.sample(groups, min(count, len(groups))):
+        target = {
+            '@odata.type': '#microsoft.graph.groupAssignmentTarget',
+            'groupId': group['id'],
+            'deviceAndAppManagementAssignmentFilterId': None,
+            'deviceAndAppManagementAssignmentFilterType': 'none'
+        }
+        if filters and tenant.random.random() < 0.3:
+            target['deviceAndAppManagementAssignmentFilterId'] = tenant.random.choice(filters)['id']
+            target['deviceAndAppManagementAssignmentFilterType'] = 'include'
+        assignments.append({'id': tenant.new_id(), 'sourceId': None, 'target': target})
+    return assignments
+
+
+def generate_tenant(size=100, seed=0, weights=None, settings=20, assignments=2, groups=50, script_lines=20):
+    """
+    This function generates a synthetic tenant.
+
+    :param size: The number of objects to generate, spread over the collections by weight
+    :param seed: Seed of the random generator, the same size and seed always give the same tenant
+    :param weights: Dict of collection and share of the objects, default is WEIGHTS
+    :param settings: The number of settings in each profile, policy and intent
+    :param assignments: The number of group assignments of each assignable object
+    :param groups: The number of groups in the tenant
+    :param script_lines: The number of lines in each script
+    :return: The tenant
+    """
+
+    tenant = Tenant(seed)
+    weights = weights or WEIGHTS
+    total = sum(weights.values())
+    counts = {collection: int(round(size * weight / total)) for collection, weight in weights.items()}
+
+    group_list = [tenant.add('groups', {'id': tenant.new_id(), 'displayName': f"Group {i:05d}"})
+                  for i in range(groups)]
+
+    for i in range(counts.get('deviceManagement/assignmentFilters', 0)):
+        tenant.add('deviceManagement/assignmentFilters', _filter(tenant, i))
+    filter_list = tenant.collections.get('deviceManagement/assignmentFilters', [])
+
+    templates = []
+    for name in TEMPLATES:
+        template = tenant.add('deviceManagement/templates', {
+            'id': tenant.new_id(), 'displayName': name, 'templateType': 'securityBaseline'})
+        categories = [tenant.add(f"deviceManagement/templates/{template['id']}/categories",
+                                 {'id': tenant.new_id(), 'displayName': f"{name} category {c}"})
+                      for c in range(2)]
+        templates.append((template, categories))
+
+    for i in range(counts.get('deviceManagement/deviceConfigurations', 0)):
+        tenant.add('deviceManagement/deviceConfigurations', _profile(tenant, i, settings))
+    for i in range(counts.get('deviceManagement/configurationPolicies', 0)):
+        policy, values = _settings_catalog(tenant, i, settings)
+        tenant.add('deviceManagement/configurationPolicies', policy)
+        tenant.collections[f"deviceManagement/configurationPolicies/{policy['id']}/settings"] = values
+    for i in range(counts.get('deviceManagement/deviceCompliancePolicies', 0)):
+        tenant.add('deviceManagement/deviceCompliancePolicies', _compliance(tenant, i, settings))
+    for i in range(counts.get('deviceManagement/deviceManagementScripts', 0)):
+        tenant.add('deviceManagement/deviceManagementScripts', _powershell_script(tenant, i, script_lines))
+    for i in range(counts.get('deviceManagement/deviceShellScripts', 0)):
+        tenant.add('deviceManagement/deviceShellScripts', _shell_script(tenant, i, script_lines))
+    for i in range(counts.get('deviceManagement/deviceHealthScripts', 0)):
+        tenant.add('deviceManagement/deviceHealthScripts', _health_script(tenant, i, script_lines))
+    for i in range(counts.get('deviceManagement/intents', 0)):
+        tenant.add('deviceManagement/intents', _intent(tenant, i, templates, settings))
+
+    for collection in ASSIGNABLE:
+        for obj in tenant.collections.get(collection, []):
+            tenant.collections[f"{collection}/{obj['id']}/assignments"] = _assignments(
+                tenant, group_list, filter_list, assignments)
+
+    return tenant
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to save the backup to, and read the backup from, a single compressed archive.
+"""
+
+import io
+import os
+import tarfile
+import tempfile
+
+from contextlib import contextmanager
+from .thread_state import ThreadState
+
+ARCHIVE_NAME = "IntuneCD-backup.tar.gz"
+
+# The archive currently being written to in this thread, set by open_archive
+archive = ThreadState(root=None, tar=None, path=None)
+
+
+def open_archive(path):
+    """
+    This function opens a new gzip compressed tar archive in the backup path.
+    Files are streamed to the archive as they are saved, nothing is kept in memory.
+
+    :param path: The path the backup is saved to
+    :return: The path of the archive
+    """
+
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    archive['root'] = path
+    archive['path'] = os.path.join(path, ARCHIVE_NAME)
+    archive['tar'] = tarfile.open(archive['path'] + ".tmp", mode='w|gz')
+
+    return archive['path']
+
+
+def close_archive():
+    """
+    This function closes the archive and moves it in place.
+    """
+
+    if archive['tar'] is None:
+        return
+
+    archive['tar'].close()
+    os.replace(archive['path'] + ".tmp", archive['path'])
+    archive['root'] = None
+    archive['tar'] = None
+    archive['path'] = None
+
+
+def discard_archive():
+    """
+    This function closes the archive of a backup that failed and removes it, the last archive is kept.
+    """
+
+    if archive['tar'] is None:
+        return
+
+    try:
+        archive['tar'].close()
+    finally:
+        os.remove(archive['path'] + ".tmp")
+        archive['root'] = None
+        archive['tar'] = None
+        archive['path'] = None
+
+
+def write_to_archive(configpath, filename, content):
+    """
+    This function writes a file to the open archive.
+
+    :param configpath: The path the file would have been saved to
+    :param filename: The name of the file
+    :param content: The content of the file as str or bytes
+    """
+
+    if archive['tar'] is None:
+        raise Exception("No archive is open, call open_archive first")
+
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    name = os.path.relpath(os.path.join(configpath, filename), archive['root'])
+    info = tarfile.TarInfo(name.replace(os.sep, '/'))
+    info.size = len(content)
+    archive['tar'].addfile(info, io.BytesIO(content))
+
+
+def add_file_to_archive(configpath, filename, local_path):
+    """
+    This function adds a file already on disk to the open archive without reading it into memory.
+
+    :param configpath: The path the file would have been saved to
+    :param filename: The name of the file
+    :param local_path: The path of the file on disk
+    """
+
+    if archive['tar'] is None:
+        raise Exception("No archive is open, call open_archive first")
+
+    name = os.path.relpath(os.path.join(configpath, filename), archive['root'])
+    archive['tar'].add(local_path, arcname=name.replace(os.sep, '/'))
+
+
+def extract_archive(archive_path, path):
+    """
+    This function extracts a backup archive.
+
+    :param archive_path: The path to the archive
+    :param path: The path to extract the archive to
+    """
+
+    with tarfile.open(archive_path, mode='r:gz') as tar:
+        for member in tar.getmembers():
+            name = os.path.normpath(member.name)
+            if os.path.isabs(name) or name.startswith('..') or not (member.isfile() or member.isdir()):
+                raise Exception(f"Unsafe path in backup archive: {member.name}")
+        tar.extractall(path)
+
+
+@contextmanager
+def open_backup(path):
+    """
+    This function yields a path to read the backup from.
+    If the path is an archive it is extracted to a temporary directory that is removed afterwards.
+
+    :param path: The path to the backup directory or archive
+    :return: The path to the backup directory
+    """
+
+    if path and os.path.isfile(path) and tarfile.is_tarfile(path):
+        with tempfile.TemporaryDirectory() as backup_path:
+            extract_archive(path, backup_path)
+            yield backup_path
+    else:
+        yield path
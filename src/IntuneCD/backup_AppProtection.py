@@ -47,6 +47,7 @@ def savebackup(path, output, exclude, token):
             if assignments:
                 profile['assignments'] = assignments
 
+        graph_id = profile.get('id')
         profile = remove_keys(profile)
 
         print("Backing up App Protection: " + profile['displayName'])
@@ -60,6 +61,6 @@ def savebackup(path, output, exclude, token):
 
         # Save App Protection as JSON or YAML depending on configured value in
         # "-o"
-        save_output(output, configpath, fname, profile)
+        save_output(output, configpath, fname, profile, graph_id=graph_id)
 
     return config_count
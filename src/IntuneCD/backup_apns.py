@@ -30,12 +30,13 @@ def savebackup(path, output, token):
 
     if data:
         config_count += 1
+        graph_id = data.get('id')
         data = remove_keys(data)
         print("Backing up Apple Push Notification: " + data['appleIdentifier'])
 
         # Get filename without illegal characters
         fname = clean_filename(data['appleIdentifier'])
         # Save APNs as JSON or YAML depending on configured value in "-o"
-        save_output(output, configpath, fname, data)
+        save_output(output, configpath, fname, data, graph_id=graph_id)
 
     return config_count
@@ -43,6 +43,7 @@ def savebackup(path, output, exclude, token):
                 if assignments:
                     profile['assignments'] = assignments
 
+            graph_id = profile.get('id')
             profile = remove_keys(profile)
 
             # Get name and type of app on App Configuration Profile
@@ -64,6 +65,6 @@ def savebackup(path, output, exclude, token):
                 f"{profile['displayName']}_{str(profile['@odata.type'].split('.')[2])}")
             # Save App Configuration as JSON or YAML depending on configured value
             # in "-o"
-            save_output(output, configpath, fname, profile)
+            save_output(output, configpath, fname, profile, graph_id=graph_id)
 
     return config_count
@@ -42,6 +42,7 @@ def savebackup(path, output, token):
         for profile in batch_profile_data:
             config_count += 1
             for value in profile['value']:
+                graph_id = value.get('id')
                 value = remove_keys(value)
 
                 print(
@@ -52,6 +53,6 @@ def savebackup(path, output, token):
                 fname = clean_filename(value['displayName'])
                 # Save Apple Enrollment Profile as JSON or YAML depending on
                 # configured value in "-o"
-                save_output(output, configpath, fname, value)
+                save_output(output, configpath, fname, value, graph_id=graph_id)
 
     return config_count
@@ -62,6 +62,7 @@ def savebackup(path, output, exclude, token):
             if assignments:
                 app['assignments'] = assignments
 
+        graph_id = app.get('id')
         app = remove_keys(app)
         app.pop('description', None)
 
@@ -114,6 +115,6 @@ def savebackup(path, output, exclude, token):
         # Get filename without illegal characters
         fname = clean_filename(app_name)
 
-        save_output(output, configpath, fname, app)
+        save_output(output, configpath, fname, app, graph_id=graph_id)
 
     return config_count
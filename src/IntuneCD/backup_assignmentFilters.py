@@ -30,6 +30,7 @@ def savebackup(path, output, token):
     if data:
         for assign_filter in data['value']:
             config_count += 1
+            graph_id = assign_filter.get('id')
             assign_filter = remove_keys(assign_filter)
             print("Backing up Filter: " + assign_filter['displayName'])
 
@@ -37,6 +38,6 @@ def savebackup(path, output, token):
             fname = clean_filename(assign_filter['displayName'])
             # Save Filters as JSON or YAML depending on configured value in
             # "-o"
-            save_output(output, configpath, fname, assign_filter)
+            save_output(output, configpath, fname, assign_filter, graph_id=graph_id)
 
     return config_count
@@ -4,8 +4,16 @@
 This module backs up all Autopilot devices in Intune.
 """
 
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+from .archive_output import add_file_to_archive
 from .clean_filename import clean_filename
-from .graph_request import makeapirequest
+from .graph_request import makeapirequest_pages
+from .manifest import record_object
 from .save_output import save_output
 
 # Set MS Graph endpoint
@@ -13,23 +21,66 @@ ENDPOINT = "https://graph.microsoft.com/beta/deviceManagement/windowsAutopilotDe
 
 
 # Get all Autopilot devices and save them in specified path
-def savebackup(path, output, token):
+def savebackup(path, output, token, record_format="files"):
     """
-    Saves all Autopilot devices in Intune to a JSON or YAML file.
+    Saves all Autopilot devices in Intune to a JSON or YAML file per device, or to a single JSON Lines file.
+    Devices are written page by page as they are returned from Graph.
 
     :param path: Path to save the backup to
     :param output: Format the backup will be saved as
     :param token: Token to use for authenticating the request
+    :param record_format: "files" to save one file per device, "jsonl" to save all devices to one JSON Lines file
+    :return: The number of devices saved
     """
 
     print("Backing up Autopilot Devices")
+    device_count = 0
     configpath = path + "/" + "Autopilot Devices/"
-    data = makeapirequest(ENDPOINT, token)
 
-    for device in data['value']:
+    if record_format == "jsonl":
+        if output == 'archive':
+            fd, tmp_path = tempfile.mkstemp(suffix=".jsonl")
+            os.close(fd)
+        else:
+            if not os.path.exists(configpath):
+                os.makedirs(configpath)
+            tmp_path = configpath + "devices.jsonl.tmp"
+        # Write to a temporary file first so a failed run does not leave a partial record. The file is hashed
+        # while it is written so it can be recorded in the manifest without reading it again
+        sha256 = hashlib.sha256()
+        size = 0
+        serialize_seconds = 0
+        with open(tmp_path, 'wb') as jsonlFile:
+            for page in makeapirequest_pages(ENDPOINT, token):
+                start = time.perf_counter()
+                for device in page:
+                    device_count += 1
+                    line = (json.dumps(device) + "\n").encode('utf-8')
+                    jsonlFile.write(line)
+                    sha256.update(line)
+                    size += len(line)
+                serialize_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        if output == 'archive':
+            add_file_to_archive(configpath, "devices.jsonl", tmp_path)
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, configpath + "devices.jsonl")
+        serialize_seconds += time.perf_counter() - start
+        record_object(configpath, "devices.jsonl", None, serialize_seconds=serialize_seconds,
+                      sha256=sha256.hexdigest(), size=size)
+
+    elif record_format == "files":
+        for page in makeapirequest_pages(ENDPOINT, token):
+            for device in page:
+                device_count += 1
+                # Get filename without illegal characters
+                fname = clean_filename(device['id'])
+                # Save Autopilot device as JSON or YAML depending on configured
+                # value in "-o"
+                save_output(output, configpath, fname, device, graph_id=device['id'])
+
+    else:
+        raise ValueError("Invalid Autopilot record format")
 
-        # Get filename without illegal characters
-        fname = clean_filename(device['id'])
-        # Save Autopilot device as JSON or YAML depending on configured
-        # value in "-o"
-        save_output(output, configpath, fname, device)
+    return device_count
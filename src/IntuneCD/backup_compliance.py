@@ -36,6 +36,7 @@ def savebackup(path, output, exclude, token):
 
     for policy in data['value']:
         config_count += 1
+        graph_id = policy.get('id')
         print("Backing up compliance policy: " + policy['displayName'])
 
         if "assignments" not in exclude:
@@ -55,6 +56,6 @@ def savebackup(path, output, exclude, token):
         fname = clean_filename(policy['displayName'])
         # Save Compliance policy as JSON or YAML depending on configured value
         # in "-o"
-        save_output(output, configpath, f'{fname}_' + str(policy['@odata.type'].split('.')[2]), policy)
+        save_output(output, configpath, f'{fname}_' + str(policy['@odata.type'].split('.')[2]), policy, graph_id=graph_id)
 
     return config_count
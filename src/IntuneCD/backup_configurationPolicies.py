@@ -4,6 +4,8 @@
 This module backs up all Configuration Policies in Intune.
 """
 
+import asyncio
+
 from .clean_filename import clean_filename
 from .graph_request import makeapirequest
 from .graph_batch import batch_assignment, get_object_assignment, batch_request, get_object_details
@@ -25,8 +27,6 @@ def savebackup(path, output, exclude, token):
     :param token: Token to use for authenticating the request
     """
 
-    config_count = 0
-    configpath = path + "/" + "Settings Catalog/"
     policies = makeapirequest(BASE_ENDPOINT + "/configurationPolicies", token)
     policy_ids = []
     for policy in policies['value']:
@@ -43,6 +43,45 @@ def savebackup(path, output, exclude, token):
         '/settings',
         token)
 
+    return save_policies(path, output, exclude, policies, policy_settings_batch, assignment_responses)
+
+
+async def savebackup_async(path, output, exclude, client):
+    """
+    Saves all Configuration Policies in Intune to a JSON or YAML file. The assignments and settings are requested
+    at the same time.
+
+    :param path: Path to save the backup to
+    :param output: Format the backup will be saved as
+    :param exclude: If "assignments" is in the list, it will not back up the assignments
+    :param client: AsyncGraphClient to send the requests with
+    """
+
+    policies = await client.makeapirequest(BASE_ENDPOINT + "/configurationPolicies")
+    policy_ids = [policy['id'] for policy in policies['value']]
+
+    assignment_responses, policy_settings_batch = await asyncio.gather(
+        client.batch_assignment(policies, 'deviceManagement/configurationPolicies/', '/assignments'),
+        client.batch_request(policy_ids, 'deviceManagement/configurationPolicies/', '/settings'))
+
+    return save_policies(path, output, exclude, policies, policy_settings_batch, assignment_responses)
+
+
+def save_policies(path, output, exclude, policies, policy_settings_batch, assignment_responses):
+    """
+    Saves Configuration Policies to a JSON or YAML file.
+
+    :param path: Path to save the backup to
+    :param output: Format the backup will be saved as
+    :param exclude: If "assignments" is in the list, it will not back up the assignments
+    :param policies: The Configuration Policies
+    :param policy_settings_batch: Settings from the batch request
+    :param assignment_responses: Assignments from the batch request
+    :return: The number of policies saved
+    """
+
+    config_count = 0
+    configpath = path + "/" + "Settings Catalog/"
     for policy in policies['value']:
         config_count += 1
         name = policy['name']
@@ -59,12 +98,13 @@ def savebackup(path, output, exclude, token):
             if assignments:
                 policy['assignments'] = assignments
 
+        graph_id = policy.get('id')
         policy = remove_keys(policy)
 
         # Get filename without illegal characters
         fname = clean_filename(name)
         # Save Configuration Policy as JSON or YAML depending on configured
         # value in "-o"
-        save_output(output, configpath, fname, policy)
+        save_output(output, configpath, fname, policy, graph_id=graph_id)
 
     return config_count
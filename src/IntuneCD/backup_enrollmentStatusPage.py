@@ -45,6 +45,7 @@ def savebackup(path, output, exclude, token):
                 if assignments:
                     profile['assignments'] = assignments
 
+            graph_id = profile.get('id')
             profile = remove_keys(profile)
 
             # If the profile contains apps, get the name of the app
@@ -66,6 +67,6 @@ def savebackup(path, output, exclude, token):
             fname = clean_filename(profile['displayName'])
             # Save Windows Enrollment Profile as JSON or YAML depending on
             # configured value in "-o"
-            save_output(output, configpath, fname, profile)
+            save_output(output, configpath, fname, profile, graph_id=graph_id)
 
     return config_count
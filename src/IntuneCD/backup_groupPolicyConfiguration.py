@@ -4,6 +4,8 @@
 This module backs up Group Policy Configurations in Intune.
 """
 
+import asyncio
+
 from .clean_filename import clean_filename
 from .graph_request import makeapirequest
 from .graph_batch import batch_assignment, get_object_assignment
@@ -49,19 +51,73 @@ def savebackup(path, output, exclude, token):
                 presentation = makeapirequest(presentation_endpoint, token)
                 definition['presentationValues'] = presentation['value']
 
-        if "assignments" not in exclude:
-            assignments = get_object_assignment(
-                profile['id'], assignment_responses)
-            if assignments:
-                profile['assignments'] = assignments
+        save_profile(profile, configpath, output, exclude, assignment_responses)
 
-        profile = remove_keys(profile)
+    return config_count
 
-        print("Backing up profile: " + profile['displayName'])
 
-        # Get filename without illegal characters
-        fname = clean_filename(profile['displayName'])
+async def savebackup_async(path, output, exclude, client):
+    """
+    Saves all Group Policy Configurations in Intune to a JSON or YAML file. The definitions and presentations of
+    all configurations are requested at the same time.
 
-        save_output(output, configpath, fname, profile)
+    :param path: Path to save the backup to
+    :param output: Format the backup will be saved as
+    :param exclude: If "assignments" is in the list, it will not back up the assignments
+    :param client: AsyncGraphClient to send the requests with
+    """
 
-    return config_count
+    configpath = path + "/" + "Group Policy Configurations/"
+    data = await client.makeapirequest(ENDPOINT)
+
+    async def get_definitions(profile):
+        definition_endpoint = f"{ENDPOINT}/{profile['id']}/definitionValues?$expand=definition"
+        definitions = await client.makeapirequest(definition_endpoint)
+        if definitions:
+            profile['definitionValues'] = definitions['value']
+            await asyncio.gather(*[get_presentations(profile, definition)
+                                   for definition in profile['definitionValues']])
+
+    async def get_presentations(profile, definition):
+        presentation_endpoint = \
+            f"{ENDPOINT}/{profile['id']}/definitionValues/{definition['id']}/" \
+            f"presentationValues?$expand=presentation "
+        presentation = await client.makeapirequest(presentation_endpoint)
+        definition['presentationValues'] = presentation['value']
+
+    assignment_responses, *_ = await asyncio.gather(
+        client.batch_assignment(data, 'deviceManagement/groupPolicyConfigurations/', '/assignments'),
+        *[get_definitions(profile) for profile in data['value']])
+
+    for profile in data['value']:
+        save_profile(profile, configpath, output, exclude, assignment_responses)
+
+    return len(data['value'])
+
+
+def save_profile(profile, configpath, output, exclude, assignment_responses):
+    """
+    Saves a Group Policy Configuration to a JSON or YAML file.
+
+    :param profile: The Group Policy Configuration with its definitions
+    :param configpath: Path to save the configuration to
+    :param output: Format the backup will be saved as
+    :param exclude: If "assignments" is in the list, it will not back up the assignments
+    :param assignment_responses: Assignments from the batch request
+    """
+
+    if "assignments" not in exclude:
+        assignments = get_object_assignment(
+            profile['id'], assignment_responses)
+        if assignments:
+            profile['assignments'] = assignments
+
+    graph_id = profile.get('id')
+    profile = remove_keys(profile)
+
+    print("Backing up profile: " + profile['displayName'])
+
+    # Get filename without illegal characters
+    fname = clean_filename(profile['displayName'])
+
+    save_output(output, configpath, fname, profile, graph_id=graph_id)
@@ -29,6 +29,7 @@ def savebackup(path, output, token):
 
     if data:
         config_count += 1
+        graph_id = data.get('id')
         data = remove_keys(data)
         print("Backing up Managed Google Play: " +
               data['ownerUserPrincipalName'])
@@ -37,6 +38,6 @@ def savebackup(path, output, token):
         fname = clean_filename(data['ownerUserPrincipalName'])
         # Save Managed Google Play as JSON or YAML depending on configured
         # value in "-o"
-        save_output(output, configpath, fname, data)
+        save_output(output, configpath, fname, data, graph_id=graph_id)
 
     return config_count
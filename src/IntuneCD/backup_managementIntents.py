@@ -54,11 +54,11 @@ def savebackup(path, output, exclude, token):
 
             for setting in intent_value['settingsDelta']:
                 setting.pop('id', None)
-            intent_value.pop('id', None)
+            graph_id = intent_value.pop('id', None)
 
             # Get filename without illegal characters
             fname = clean_filename(intent_value['displayName'])
             # Save Intent as JSON or YAML depending on configured value in "-o"
-            save_output(output, configpath, fname, intent_value)
+            save_output(output, configpath, fname, intent_value, graph_id=graph_id)
 
     return config_count
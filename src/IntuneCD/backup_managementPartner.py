@@ -34,12 +34,13 @@ def savebackup(path, output, token):
         config_count += 1
         print("Backing up Management Partner: " + partner['displayName'])
 
+        graph_id = partner.get('id')
         partner = remove_keys(partner)
 
         # Get filename without illegal characters
         fname = clean_filename(partner['displayName'])
         # Save Compliance policy as JSON or YAML depending on configured
         # value in "-o"
-        save_output(output, configpath, fname, partner)
+        save_output(output, configpath, fname, partner, graph_id=graph_id)
 
     return config_count
@@ -36,6 +36,7 @@ def savebackup(path, output, token):
         template_data = makeapirequest(
             ENDPOINT + "/" + template['id'], token, q_param)
 
+        graph_id = template_data.get('id')
         template_data = remove_keys(template_data)
 
         for locale in template_data['localizedNotificationMessages']:
@@ -45,6 +46,6 @@ def savebackup(path, output, token):
         fname = clean_filename(template_data['displayName'])
         # Save Notification template as JSON or YAML depending on configured
         # value in "-o"
-        save_output(output, configpath, fname, template_data)
+        save_output(output, configpath, fname, template_data, graph_id=graph_id)
 
     return config_count
@@ -4,13 +4,14 @@
 This module backs up all Powershell scripts in Intune.
 """
 
-import os
 import base64
+import asyncio
 
 from .clean_filename import clean_filename
 from .graph_request import makeapirequest
 from .graph_batch import batch_assignment, get_object_assignment, batch_request
-from .save_output import save_output
+from .save_output import save_output, save_text
+from .blob_store import save_blob
 from .remove_keys import remove_keys
 
 # Set MS Graph endpoint
@@ -18,7 +19,7 @@ ENDPOINT = "https://graph.microsoft.com/beta/deviceManagement/deviceManagementSc
 
 
 # Get all Powershell scripts and save them in specified path
-def savebackup(path, output, exclude, token):
+def savebackup(path, output, exclude, token, blobstore=False):
     """
     Saves all Powershell scripts in Intune to a JSON or YAML file and script files.
 
@@ -26,10 +27,10 @@ def savebackup(path, output, exclude, token):
     :param output: Format the backup will be saved as
     :param exclude: If "assignments" is in the list, it will not back up the assignments
     :param token: Token to use for authenticating the request
+    :param blobstore: If True, script content is saved once in the blob store and referenced by hash
     """
 
     config_count = 0
-    configpath = path + "/" + "Scripts/Powershell/"
     data = makeapirequest(ENDPOINT, token)
     if data['value']:
         script_ids = []
@@ -41,30 +42,80 @@ def savebackup(path, output, exclude, token):
         script_data_responses = batch_request(
             script_ids, 'deviceManagement/deviceManagementScripts/', '', token)
 
-        for script_data in script_data_responses:
-            config_count += 1
-            if "assignments" not in exclude:
-                assignments = get_object_assignment(
-                    script_data['id'], assignment_responses)
-                if assignments:
-                    script_data['assignments'] = assignments
+        config_count = save_scripts(path, output, exclude, blobstore, script_data_responses,
+                                    assignment_responses)
+
+    return config_count
+
+
+async def savebackup_async(path, output, exclude, client, blobstore=False):
+    """
+    Saves all Powershell scripts in Intune to a JSON or YAML file and script files. The assignments and script
+    content are requested at the same time.
+
+    :param path: Path to save the backup to
+    :param output: Format the backup will be saved as
+    :param exclude: If "assignments" is in the list, it will not back up the assignments
+    :param client: AsyncGraphClient to send the requests with
+    :param blobstore: If True, script content is saved once in the blob store and referenced by hash
+    """
+
+    config_count = 0
+    data = await client.makeapirequest(ENDPOINT)
+    if data['value']:
+        script_ids = [script['id'] for script in data['value']]
+
+        assignment_responses, script_data_responses = await asyncio.gather(
+            client.batch_assignment(data, 'deviceManagement/intents/', '/assignments'),
+            client.batch_request(script_ids, 'deviceManagement/deviceManagementScripts/', ''))
 
-            script_data = remove_keys(script_data)
+        config_count = save_scripts(path, output, exclude, blobstore, script_data_responses,
+                                    assignment_responses)
 
-            print("Backing up Powershell script: " + script_data['displayName'])
+    return config_count
+
+
+def save_scripts(path, output, exclude, blobstore, script_data_responses, assignment_responses):
+    """
+    Saves Powershell scripts to a JSON or YAML file and script files.
 
-            # Get filename without illegal characters
-            fname = clean_filename(script_data['displayName'])
-            # Save Powershell script as JSON or YAML depending on configured value
-            # in "-o"
-            save_output(output, configpath, fname, script_data)
+    :param path: Path to save the backup to
+    :param output: Format the backup will be saved as
+    :param exclude: If "assignments" is in the list, it will not back up the assignments
+    :param blobstore: If True, script content is saved once in the blob store and referenced by hash
+    :param script_data_responses: Scripts from the batch request
+    :param assignment_responses: Assignments from the batch request
+    :return: The number of scripts saved
+    """
 
+    config_count = 0
+    configpath = path + "/" + "Scripts/Powershell/"
+    for script_data in script_data_responses:
+        config_count += 1
+        if "assignments" not in exclude:
+            assignments = get_object_assignment(
+                script_data['id'], assignment_responses)
+            if assignments:
+                script_data['assignments'] = assignments
+
+        graph_id = script_data.get('id')
+        script_data = remove_keys(script_data)
+
+        print("Backing up Powershell script: " + script_data['displayName'])
+
+        # Get filename without illegal characters
+        fname = clean_filename(script_data['displayName'])
+
+        decoded = base64.b64decode(script_data['scriptContent'])
+        if blobstore:
+            # Replace the script content with a reference to the blob store
+            script_data['scriptContent'] = save_blob(output, path, decoded)
+        else:
             # Save Powershell script data to the script data folder
-            if not os.path.exists(configpath + "Script Data/"):
-                os.makedirs(configpath + "Script Data/")
-            decoded = base64.b64decode(
-                script_data['scriptContent']).decode('utf-8')
-            f = open(configpath + "Script Data/" + script_data['fileName'], 'w')
-            f.write(decoded)
+            save_text(output, configpath + "Script Data/", script_data['fileName'], decoded.decode('utf-8'))
+
+        # Save Powershell script as JSON or YAML depending on configured value
+        # in "-o"
+        save_output(output, configpath, fname, script_data, graph_id=graph_id)
 
     return config_count
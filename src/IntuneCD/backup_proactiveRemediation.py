@@ -4,13 +4,14 @@
 This module backs up all Proactive Remediation in Intune.
 """
 
-import os
 import base64
+import asyncio
 
 from .clean_filename import clean_filename
 from .graph_request import makeapirequest
 from .graph_batch import batch_assignment, get_object_assignment, batch_request
-from .save_output import save_output
+from .save_output import save_output, save_text
+from .blob_store import save_blob
 from .remove_keys import remove_keys
 
 # Set MS Graph endpoint
@@ -18,7 +19,7 @@ ENDPOINT = "https://graph.microsoft.com/beta/deviceManagement/deviceHealthScript
 
 
 # Get all Proactive Remediation and save them in specified path
-def savebackup(path, output, exclude, token):
+def savebackup(path, output, exclude, token, blobstore=False):
     """
     Saves all Proactive Remediation in Intune to a JSON or YAML file and script files.
 
@@ -26,10 +27,10 @@ def savebackup(path, output, exclude, token):
     :param output: Format the backup will be saved as
     :param exclude: If "assignments" is in the list, it will not back up the assignments
     :param token: Token to use for authenticating the request
+    :param blobstore: If True, detection and remediation scripts are saved once in the blob store and referenced by hash
     """
 
     config_count = 0
-    configpath = f'{path}/Proactive Remediations/'
     data = makeapirequest(ENDPOINT, token)
     if data['value']:
         pr_ids = []
@@ -41,45 +42,86 @@ def savebackup(path, output, exclude, token):
         pr_data_responses = batch_request(
             pr_ids, 'deviceManagement/deviceHealthScripts/', '', token)
 
-        for pr_details in pr_data_responses:
-            if "Microsoft" not in pr_details['publisher']:
-                config_count += 1
-                if "assignments" not in exclude:
-                    assignments = get_object_assignment(
-                        pr_details['id'], assignment_responses)
-                    if assignments:
-                        pr_details['assignments'] = assignments
+        config_count = save_remediations(path, output, exclude, blobstore, pr_data_responses,
+                                         assignment_responses)
 
-                pr_details = remove_keys(pr_details)
+    return config_count
 
-                print(
-                    f"Backing up Proactive Remediation: {pr_details['displayName']}")
 
-                # Get filename without illegal characters
-                fname = clean_filename(pr_details['displayName'])
+async def savebackup_async(path, output, exclude, client, blobstore=False):
+    """
+    Saves all Proactive Remediation in Intune to a JSON or YAML file and script files. The assignments and
+    scripts are requested at the same time.
 
-                # Save Proactive Remediation as JSON or YAML depending on
-                # configured value in "-o"
-                save_output(output, configpath, fname, pr_details)
+    :param path: Path to save the backup to
+    :param output: Format the backup will be saved as
+    :param exclude: If "assignments" is in the list, it will not back up the assignments
+    :param client: AsyncGraphClient to send the requests with
+    :param blobstore: If True, detection and remediation scripts are saved once in the blob store and referenced by hash
+    """
+
+    config_count = 0
+    data = await client.makeapirequest(ENDPOINT)
+    if data['value']:
+        pr_ids = [script['id'] for script in data['value']]
 
-                if not os.path.exists(f'{configpath}/Script Data'):
-                    os.makedirs(f'{configpath}/Script Data')
+        assignment_responses, pr_data_responses = await asyncio.gather(
+            client.batch_assignment(data, 'deviceManagement/deviceHealthScripts/', '/assignments'),
+            client.batch_request(pr_ids, 'deviceManagement/deviceHealthScripts/', ''))
 
-                # Save detection script to the Script Data folder
-                config_count += 1
-                decoded = base64.b64decode(
-                    pr_details['detectionScriptContent']).decode('utf-8')
-                f = open(
-                    f"{configpath}/Script Data/{pr_details['displayName']}_DetectionScript.ps1",
-                    'w')
-                f.write(decoded)
-                # Save remediation script to the Script Data folder
+        config_count = save_remediations(path, output, exclude, blobstore, pr_data_responses,
+                                         assignment_responses)
+
+    return config_count
+
+
+def save_remediations(path, output, exclude, blobstore, pr_data_responses, assignment_responses):
+    """
+    Saves Proactive Remediations to a JSON or YAML file and script files.
+
+    :param path: Path to save the backup to
+    :param output: Format the backup will be saved as
+    :param exclude: If "assignments" is in the list, it will not back up the assignments
+    :param blobstore: If True, detection and remediation scripts are saved once in the blob store and referenced by hash
+    :param pr_data_responses: Proactive Remediations from the batch request
+    :param assignment_responses: Assignments from the batch request
+    :return: The number of configurations saved
+    """
+
+    config_count = 0
+    configpath = f'{path}/Proactive Remediations/'
+    for pr_details in pr_data_responses:
+        if "Microsoft" not in pr_details['publisher']:
+            config_count += 1
+            if "assignments" not in exclude:
+                assignments = get_object_assignment(
+                    pr_details['id'], assignment_responses)
+                if assignments:
+                    pr_details['assignments'] = assignments
+
+            graph_id = pr_details.get('id')
+            pr_details = remove_keys(pr_details)
+
+            print(
+                f"Backing up Proactive Remediation: {pr_details['displayName']}")
+
+            # Get filename without illegal characters
+            fname = clean_filename(pr_details['displayName'])
+
+            for script_type in ('Detection', 'Remediation'):
+                key = f'{script_type.lower()}ScriptContent'
                 config_count += 1
-                decoded = base64.b64decode(
-                    pr_details['remediationScriptContent']).decode('utf-8')
-                f = open(
-                    f"{configpath}/Script Data/{pr_details['displayName']}_RemediationScript.ps1",
-                    'w')
-                f.write(decoded)
+                decoded = base64.b64decode(pr_details[key])
+                if blobstore:
+                    # Replace the script content with a reference to the blob store
+                    pr_details[key] = save_blob(output, path, decoded)
+                else:
+                    # Save script to the Script Data folder
+                    save_text(output, f'{configpath}/Script Data/',
+                              f"{pr_details['displayName']}_{script_type}Script.ps1", decoded.decode('utf-8'))
+
+            # Save Proactive Remediation as JSON or YAML depending on
+            # configured value in "-o"
+            save_output(output, configpath, fname, pr_details, graph_id=graph_id)
 
     return config_count
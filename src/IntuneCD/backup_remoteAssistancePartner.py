@@ -36,12 +36,13 @@ def savebackup(path, output, token):
             "Backing up Remote Assistance Partner: " +
             partner['displayName'])
 
+        graph_id = partner.get('id')
         partner = remove_keys(partner)
 
         # Get filename without illegal characters
         fname = clean_filename(partner['displayName'])
         # Save Compliance policy as JSON or YAML depending on configured
         # value in "-o"
-        save_output(output, configpath, fname, partner)
+        save_output(output, configpath, fname, partner, graph_id=graph_id)
 
     return config_count
@@ -4,13 +4,14 @@
 This module backs up all Shell scripts in Intune.
 """
 
-import os
 import base64
+import asyncio
 
 from .clean_filename import clean_filename
 from .graph_request import makeapirequest
 from .graph_batch import batch_assignment, get_object_assignment, batch_request
-from .save_output import save_output
+from .save_output import save_output, save_text
+from .blob_store import save_blob
 from .remove_keys import remove_keys
 
 # Set MS Graph endpoint
@@ -19,7 +20,7 @@ ASSIGNMENT_ENDPOINT = "https://graph.microsoft.com/beta/deviceManagement/deviceM
 
 
 # Get all Shell scripts and save them in specified path
-def savebackup(path, output, exclude, token):
+def savebackup(path, output, exclude, token, blobstore=False):
     """
     Saves all Shell scripts in Intune to a JSON or YAML file and script files.
 
@@ -27,10 +28,9 @@ def savebackup(path, output, exclude, token):
     :param output: Format the backup will be saved as
     :param exclude: If "assignments" is in the list, it will not back up the assignments
     :param token: Token to use for authenticating the request
+    :param blobstore: If True, script content is saved once in the blob store and referenced by hash
     """
 
-    config_count = 0
-    configpath = path + "/" + "Scripts/Shell/"
     data = makeapirequest(ENDPOINT, token)
     script_ids = []
     for script in data['value']:
@@ -39,6 +39,46 @@ def savebackup(path, output, exclude, token):
     assignment_responses = batch_assignment(data, 'deviceManagement/deviceManagementScripts/', '/assignments', token)
     script_data_responses = batch_request(script_ids, 'deviceManagement/deviceShellScripts/', '', token)
 
+    return save_scripts(path, output, exclude, blobstore, script_data_responses, assignment_responses)
+
+
+async def savebackup_async(path, output, exclude, client, blobstore=False):
+    """
+    Saves all Shell scripts in Intune to a JSON or YAML file and script files. The assignments and script
+    content are requested at the same time.
+
+    :param path: Path to save the backup to
+    :param output: Format the backup will be saved as
+    :param exclude: If "assignments" is in the list, it will not back up the assignments
+    :param client: AsyncGraphClient to send the requests with
+    :param blobstore: If True, script content is saved once in the blob store and referenced by hash
+    """
+
+    data = await client.makeapirequest(ENDPOINT)
+    script_ids = [script['id'] for script in data['value']]
+
+    assignment_responses, script_data_responses = await asyncio.gather(
+        client.batch_assignment(data, 'deviceManagement/deviceManagementScripts/', '/assignments'),
+        client.batch_request(script_ids, 'deviceManagement/deviceShellScripts/', ''))
+
+    return save_scripts(path, output, exclude, blobstore, script_data_responses, assignment_responses)
+
+
+def save_scripts(path, output, exclude, blobstore, script_data_responses, assignment_responses):
+    """
+    Saves Shell scripts to a JSON or YAML file and script files.
+
+    :param path: Path to save the backup to
+    :param output: Format the backup will be saved as
+    :param exclude: If "assignments" is in the list, it will not back up the assignments
+    :param blobstore: If True, script content is saved once in the blob store and referenced by hash
+    :param script_data_responses: Scripts from the batch request
+    :param assignment_responses: Assignments from the batch request
+    :return: The number of scripts saved
+    """
+
+    config_count = 0
+    configpath = path + "/" + "Scripts/Shell/"
     for script_data in script_data_responses:
         config_count += 1
         if "assignments" not in exclude:
@@ -46,6 +86,7 @@ def savebackup(path, output, exclude, token):
             if assignments:
                 script_data['assignments'] = assignments
 
+        graph_id = script_data.get('id')
         script_data = remove_keys(script_data)
 
         print("Backing up Shell script: " + script_data['displayName'])
@@ -53,15 +94,15 @@ def savebackup(path, output, exclude, token):
         # Get filename without illegal characters
         fname = clean_filename(script_data['displayName'])
 
+        decoded = base64.b64decode(script_data['scriptContent'])
+        if blobstore:
+            # Replace the script content with a reference to the blob store
+            script_data['scriptContent'] = save_blob(output, path, decoded)
+        else:
+            # Save Shell script data to the script data folder
+            save_text(output, configpath + "Script Data/", script_data['fileName'], decoded.decode('utf-8'))
+
         # Save Shell script as JSON or YAML depending on configured value in "-o"
-        save_output(output, configpath, fname, script_data)
-
-        # Save Shell script data to the script data folder
-        if not os.path.exists(configpath + "Script Data/"):
-            os.makedirs(configpath + "Script Data/")
-        decoded = base64.b64decode(
-            script_data['scriptContent']).decode('utf-8')
-        f = open(configpath + "Script Data/" + script_data['fileName'], 'w')
-        f.write(decoded)
+        save_output(output, configpath, fname, script_data, graph_id=graph_id)
 
     return config_count
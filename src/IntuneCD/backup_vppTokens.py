@@ -30,6 +30,7 @@ def savebackup(path, output, token):
     for vpp_token in data['value']:
         config_count += 1
         token_name = vpp_token['displayName']
+        graph_id = vpp_token.get('id')
         vpp_token = remove_keys(vpp_token)
 
         print(f'Backing up VPP token: {token_name}')
@@ -38,6 +39,6 @@ def savebackup(path, output, token):
         fname = clean_filename(token_name)
 
         # Save token as JSON or YAML depending on configured value in "-o"
-        save_output(output, configpath, fname, vpp_token)
+        save_output(output, configpath, fname, vpp_token, graph_id=graph_id)
 
     return config_count
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to save script content and mobileconfig payloads once in a content addressed store,
+referenced by hash from the configuration files.
+"""
+
+import base64
+import hashlib
+
+from .save_output import save_text
+from .manifest import record_object
+from .snapshot import open_file, path_exists
+
+BLOB_DIR = "Blobs"
+BLOB_PREFIX = "sha256:"
+
+# Hashes already saved during this run, per backup path
+saved_blobs = set()
+
+
+def is_blob_reference(value):
+    """
+    This function checks if a value is a reference to a blob.
+
+    :param value: The value to check
+    :return: True if the value is a blob reference
+    """
+
+    return type(value) is str and value.startswith(BLOB_PREFIX) and len(value) == len(BLOB_PREFIX) + 64
+
+
+def save_blob(output, path, content):
+    """
+    This function saves content to the blob store if it is not already there and returns the reference.
+
+    :param output: The format the backup is saved as
+    :param path: Path the backup is saved to
+    :param content: The content to save as str or bytes
+    :return: The blob reference to save in the configuration
+    """
+
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    digest = hashlib.sha256(content).hexdigest()
+    blobpath = f"{path}/{BLOB_DIR}/"
+
+    if (path, digest) not in saved_blobs:
+        if output != 'archive' and path_exists(blobpath + digest):
+            # Saved in an earlier backup, only record it in the manifest
+            record_object(blobpath, digest, content)
+        else:
+            save_text(output, blobpath, digest, content)
+    saved_blobs.add((path, digest))
+
+    return BLOB_PREFIX + digest
+
+
+def load_blob(path, reference):
+    """
+    This function loads the content of a blob.
+
+    :param path: Path where the backup is saved
+    :param reference: The blob reference
+    :return: The content of the blob as bytes
+    """
+
+    digest = reference[len(BLOB_PREFIX):]
+    with open_file(f"{path}/{BLOB_DIR}/{digest}", 'rb') as f:
+        content = f.read()
+
+    if hashlib.sha256(content).hexdigest() != digest:
+        raise Exception(f"Blob {digest} does not match its hash")
+
+    return content
+
+
+def resolve_blobs(path, data):
+    """
+    This function replaces blob references in the configuration with the base64 encoded content,
+    the same format Intune returns the content in.
+
+    :param path: Path where the backup is saved
+    :param data: The configuration data
+    :return: Dict of the resolved keys and their content as bytes
+    """
+
+    blobs = {}
+    for key, value in data.items():
+        if is_blob_reference(value):
+            blobs[key] = load_blob(path, value)
+            data[key] = base64.b64encode(blobs[key]).decode('utf-8')
+
+    return blobs
+
+
+def get_repo_content(filepath, blobs, key):
+    """
+    This function gets content from a resolved blob, or from a file if the content is not stored as a blob.
+
+    :param filepath: The path to the file the content is saved in when not using the blob store
+    :param blobs: Dict of resolved blobs from resolve_blobs
+    :param key: The key of the content in the configuration
+    :return: The content as str, or None if it cannot be found
+    """
+
+    if key in blobs:
+        return blobs[key].decode('utf-8')
+    if path_exists(filepath):
+        with open_file(filepath, 'r') as f:
+            return f.read()
+
+    return None
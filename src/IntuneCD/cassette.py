@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to record the requests sent to Microsoft Graph and their responses to a cassette, and to
+replay a cassette instead of sending the requests, so runs can be reproduced offline.
+"""
+
+import gzip
+import atexit
+import json
+import time
+import threading
+
+from collections import defaultdict, deque
+
+CASSETTE_VERSION = 1
+
+# Response headers saved in the cassette, other headers are not used by IntuneCD
+HEADERS = ('Content-Type', 'ETag', 'Retry-After', 'Location')
+
+# Token used when replaying, no requests are sent so no access token is needed
+REPLAY_TOKEN = {'accessToken': ''}
+
+# The cassette being recorded or replayed, set by record_cassette or replay_cassette
+cassette = {'mode': None, 'file': None, 'responses': {}, 'timing': False, 'recorded': 0, 'replayed': 0}
+lock = threading.Lock()
+
+
+class ReplayResponse:
+    """
+    Response replayed from a cassette, with the attributes of a requests response IntuneCD uses.
+    """
+
+    def __init__(self, entry):
+        """
+        :param entry: The recorded exchange
+        """
+
+        self.status_code = entry['status']
+        self.text = entry['text']
+        self.content = entry['text'].encode('utf-8')
+        self.headers = entry['headers']
+        self.url = entry['url']
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def _key(method, url, params=None, data=None):
+    if params is not None and not isinstance(params, str):
+        params = json.dumps(params, sort_keys=True)
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return json.dumps([method, url, params, data])
+
+
+def record_cassette(path):
+    """
+    This function starts recording requests and responses to a cassette.
+    The cassette is also saved if the run fails, so failing runs can be reproduced.
+
+    :param path: The path to save the cassette to, saved as gzip compressed JSON lines
+    """
+
+    atexit.register(finish_cassette)
+
+    with lock:
+        cassette['mode'] = 'record'
+        cassette['file'] = gzip.open(path, 'wt', encoding='utf-8')
+        cassette['file'].write(json.dumps({'version': CASSETTE_VERSION}) + '\n')
+        cassette['recorded'] = 0
+
+
+def replay_cassette(path, timing=False):
+    """
+    This function starts replaying responses from a cassette instead of sending requests.
+
+    :param path: The path to the cassette
+    :param timing: Wait as long as the original request took before returning each response
+    """
+
+    responses = defaultdict(deque)
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Cassette version {header.get('version')} is not supported")
+        for line in f:
+            entry = json.loads(line)
+            responses[entry['key']].append(entry)
+
+    with lock:
+        cassette['mode'] = 'replay'
+        cassette['responses'] = responses
+        cassette['timing'] = timing
+        cassette['replayed'] = 0
+
+
+def replaying():
+    """
+    This function checks if a cassette is being replayed.
+
+    :return: True if responses are replayed from a cassette
+    """
+
+    return cassette['mode'] == 'replay'
+
+
+def record_exchange(method, url, kwargs, response, seconds):
+    """
+    This function saves a request and its response to the cassette, if one is being recorded.
+
+    :param method: The HTTP method
+    :param url: The URL of the request
+    :param kwargs: The arguments the request was sent with
+    :param response: The response
+    :param seconds: The time the request took
+    """
+
+    if cassette['mode'] != 'record':
+        return
+
+    entry = {
+        'key': _key(method, url, kwargs.get('params'), kwargs.get('data')),
+        'url': url,
+        'status': response.status_code,
+        'headers': {key: response.headers[key] for key in HEADERS if key in response.headers},
+        'text': response.text,
+        'seconds': round(seconds, 6)
+    }
+    line = json.dumps(entry, separators=(',', ':')) + '\n'
+    with lock:
+        cassette['file'].write(line)
+        cassette['recorded'] += 1
+
+
+def replay_request(method, url, kwargs):
+    """
+    This function gets the recorded response of a request. Identical requests get their responses in the
+    order they were recorded.
+
+    :param method: The HTTP method
+    :param url: The URL of the request
+    :param kwargs: The arguments the request is sent with
+    :return: The recorded response
+    """
+
+    key = _key(method, url, kwargs.get('params'), kwargs.get('data'))
+    with lock:
+        recorded = cassette['responses'].get(key)
+        if not recorded:
+            raise Exception(f"Request not found in cassette: {method} {url}")
+        # The last response is kept so requests sent more often than recorded get the same response
+        entry = recorded.popleft() if len(recorded) > 1 else recorded[0]
+        cassette['replayed'] += 1
+
+    if cassette['timing']:
+        time.sleep(entry['seconds'])
+
+    return ReplayResponse(entry)
+
+
+def finish_cassette():
+    """
+    This function stops recording or replaying the cassette.
+    """
+
+    with lock:
+        if cassette['mode'] == 'record':
+            cassette['file'].close()
+            print(f"Recorded {cassette['recorded']} requests to cassette")
+        elif cassette['mode'] == 'replay':
+            print(f"Replayed {cassette['replayed']} requests from cassette")
+        cassette['mode'] = None
+        cassette['file'] = None
+        cassette['responses'] = {}
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to list collections with delta requests to the Microsoft Graph API, so runs after the first
+only get the objects that changed or were removed.
+
+The delta link and the objects of each collection are saved between runs. Collections are first requested with
+/delta, and listed in full as before when Graph does not support delta for them. Collections without delta support
+are remembered, so they are not requested with /delta again.
+"""
+
+import os
+import re
+import copy
+import json
+import threading
+
+from .cassette import cassette
+
+# Increase when the format of the saved state changes so old state is not used
+DELTA_VERSION = 1
+
+# Collections listed with delta, such as https://graph.microsoft.com/beta/deviceManagement/deviceConfigurations
+COLLECTION = re.compile(r'^https://graph\.microsoft\.com/(beta|v1\.0)/[A-Za-z]+(/[A-Za-z]+)?/?$')
+
+# The delta state used for requests, set by open_delta
+delta_state = {'path': None, 'collections': {}, 'delta': 0, 'unsupported': 0}
+lock = threading.Lock()
+
+
+def open_delta(path):
+    """
+    This function loads the delta state saved by an earlier run and starts listing collections with delta.
+
+    :param path: The path of the JSON file the delta state is saved in
+    """
+
+    collections = {}
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('version') == DELTA_VERSION:
+                collections = data['collections']
+        except (ValueError, KeyError):
+            print("Delta state is not valid, listing all collections in full")
+
+    with lock:
+        delta_state['path'] = path
+        delta_state['collections'] = collections
+        delta_state['delta'] = 0
+        delta_state['unsupported'] = 0
+
+
+def delta_supported(endpoint):
+    """
+    This function checks if a collection is listed with delta.
+
+    :param endpoint: The endpoint of the collection
+    :return: True if the collection should be requested with /delta
+    """
+
+    if delta_state['path'] is None or cassette['mode'] is not None or not COLLECTION.match(endpoint):
+        return False
+    return delta_state['collections'].get(endpoint.rstrip('/'), {}).get('supported', True)
+
+
+def delta_url(endpoint):
+    """
+    This function gets the URL to request the changes of a collection from.
+
+    :param endpoint: The endpoint of the collection
+    :return: The delta link saved by the last request, or the /delta URL of the collection
+    """
+
+    collection = endpoint.rstrip('/')
+    state = delta_state['collections'].get(collection)
+    if state and state.get('deltaLink'):
+        return state['deltaLink']
+    return collection + '/delta'
+
+
+def delta_failed(endpoint, status_code):
+    """
+    This function handles a delta request that failed. An expired delta link is forgotten, and a collection
+    Graph does not support delta for is remembered. After errors of Graph the state is kept for the next run.
+
+    :param endpoint: The endpoint of the collection
+    :param status_code: The status code of the delta request
+    :return: True if the collection should be requested with /delta again
+    """
+
+    collection = endpoint.rstrip('/')
+    if status_code == 429 or status_code >= 500:
+        return False
+
+    with lock:
+        state = delta_state['collections'].get(collection)
+        if state and state.get('deltaLink'):
+            del delta_state['collections'][collection]
+            print(f"Delta link of {collection} is no longer valid, listing all objects")
+            return True
+        delta_state['collections'][collection] = {'supported': False}
+        delta_state['unsupported'] += 1
+
+    return False
+
+
+def merge_delta(endpoint, values, json_data):
+    """
+    This function applies the changes returned by a delta request to the saved objects of a collection.
+
+    :param endpoint: The endpoint of the collection
+    :param values: The objects of all pages of the delta response
+    :param json_data: The last page of the delta response
+    :return: The collection in the same format as a full listing, or None if the response has no delta link
+    """
+
+    collection = endpoint.rstrip('/')
+    with lock:
+        if '@odata.deltaLink' not in json_data:
+            delta_state['collections'][collection] = {'supported': False}
+            delta_state['unsupported'] += 1
+            return None
+
+        state = delta_state['collections'].get(collection)
+        # Without a delta link the response has all objects, otherwise only the changed and removed objects
+        objects = {obj['id']: obj for obj in state['value']} if state and state.get('deltaLink') else {}
+        for obj in values:
+            if '@removed' in obj:
+                objects.pop(obj['id'], None)
+            elif obj['id'] in objects:
+                objects[obj['id']].update(obj)
+            else:
+                objects[obj['id']] = obj
+
+        delta_state['collections'][collection] = {
+            'deltaLink': json_data['@odata.deltaLink'],
+            'value': list(objects.values())
+        }
+        delta_state['delta'] += 1
+        # Copied so changes made to the objects by the caller are not saved
+        data = {'value': copy.deepcopy(list(objects.values()))}
+
+    if json_data.get('@odata.context'):
+        data['@odata.context'] = json_data['@odata.context']
+    return data
+
+
+def close_delta():
+    """
+    This function saves the delta state for the next run and stops listing collections with delta.
+    """
+
+    with lock:
+        if delta_state['path'] is None:
+            return
+        # Written to a temporary file first so the state of the last run is kept if saving fails
+        temp_path = delta_state['path'] + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'version': DELTA_VERSION, 'collections': delta_state['collections']}, f)
+        os.replace(temp_path, delta_state['path'])
+        print(f"Delta: {delta_state['delta']} collections listed with delta, "
+              f"{delta_state['unsupported']} collections found without delta support")
+        delta_state['path'] = None
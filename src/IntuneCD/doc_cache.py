@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to cache rendered documentation fragments between runs, so only configurations that changed
+in the backup are rendered again.
+"""
+
+import os
+import json
+import hashlib
+
+DOC_CACHE_NAME = ".IntuneCD-doc-cache.json"
+# Increase when the rendered Markdown changes so old fragments are not reused
+CACHE_VERSION = 1
+
+# The cache of the running documentation, set by start_doc_cache
+doc_cache = {'path': None, 'root': None, 'fragments': {}, 'used': {}, 'hits': 0, 'misses': 0}
+
+
+def start_doc_cache(cache_dir, root):
+    """
+    This function loads the fragment cache and starts using it.
+
+    :param cache_dir: The directory the cache is saved in, next to the documentation
+    :param root: The path where the backup is saved, cache keys are relative to this path
+    """
+
+    cache_path = os.path.join(cache_dir, DOC_CACHE_NAME)
+    fragments = {}
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                fragments = data['fragments']
+        except (ValueError, KeyError):
+            print("Documentation cache is not valid, rendering all configurations")
+
+    doc_cache['path'] = cache_path
+    doc_cache['root'] = root
+    doc_cache['fragments'] = fragments
+    doc_cache['used'] = {}
+    doc_cache['hits'] = 0
+    doc_cache['misses'] = 0
+
+
+def _cache_key(filename):
+    return os.path.relpath(filename, doc_cache['root']).replace(os.sep, '/')
+
+
+def _file_hash(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def get_cached_fragments(filenames, options):
+    """
+    This function gets the cached fragments of files that have not changed since they were rendered.
+
+    :param filenames: List of files to get fragments for
+    :param options: Dict of the renderer options used to render the files
+    :return: Dict of filename and fragment for the files found in the cache
+    """
+
+    cached = {}
+    if doc_cache['path'] is None:
+        return cached
+
+    for filename in filenames:
+        key = _cache_key(filename)
+        entry = {'sha256': _file_hash(filename), 'options': options, 'fragment': None}
+        previous = doc_cache['fragments'].get(key)
+        if previous and previous['sha256'] == entry['sha256'] and previous['options'] == options:
+            entry['fragment'] = previous['fragment']
+            cached[filename] = entry['fragment']
+            doc_cache['hits'] += 1
+        doc_cache['used'][key] = entry
+
+    return cached
+
+
+def cache_fragment(filename, fragment):
+    """
+    This function saves a rendered fragment in the cache.
+
+    :param filename: The file the fragment was rendered from
+    :param fragment: The rendered Markdown
+    """
+
+    if doc_cache['path'] is None:
+        return
+
+    doc_cache['used'][_cache_key(filename)]['fragment'] = fragment
+    doc_cache['misses'] += 1
+
+
+def finish_doc_cache():
+    """
+    This function saves the fragments used in this run to the cache and stops using it.
+    Fragments of files that no longer exist in the backup are dropped.
+    """
+
+    if doc_cache['path'] is None:
+        return
+
+    cache_path = doc_cache['path']
+    data = {
+        'version': CACHE_VERSION,
+        'fragments': {key: entry for key, entry in sorted(doc_cache['used'].items()) if entry['fragment'] is not None}
+    }
+
+    with open(cache_path + ".tmp", 'w') as f:
+        json.dump(data, f)
+    os.replace(cache_path + ".tmp", cache_path)
+
+    print(f"Documentation cache: {doc_cache['hits']} configurations reused, {doc_cache['misses']} rendered")
+    doc_cache['path'] = None
@@ -4,12 +4,22 @@
 This module contains all functions for the documentation.
 """
 
-import yaml
 import json
 import os
-import glob
+import time
 
-from pytablewriter import MarkdownTableWriter
+from functools import partial
+from contextlib import contextmanager
+from .load_file import load_file
+from .scan_files import get_files, walk_files
+from .doc_cache import get_cached_fragments, cache_fragment
+
+REMOVE_CHARS = str.maketrans('', '', '#@}{]["')
+SETTING_VALUE_KEYS = ('choiceSettingValue', 'choiceSettingCollectionValue', 'simpleSettingValue',
+                      'simpleSettingCollectionValue', 'groupSettingValue', 'groupSettingCollectionValue')
+
+# Time in seconds it took to render each file in this run, by path
+render_times = {}
 
 
 def md_file(outpath):
@@ -32,6 +42,9 @@ def write_table(data):
     :return: The Markdown table writer
     """
 
+    # Imported when the first table is written, configurations found in the documentation cache need no tables
+    from pytablewriter import MarkdownTableWriter
+
     writer = MarkdownTableWriter(
         headers=['setting', 'value'],
         value_matrix=data
@@ -49,6 +62,8 @@ def assignment_table(data):
     """
 
     def write_assignment_table(data, headers):
+        from pytablewriter import MarkdownTableWriter
+
         writer = MarkdownTableWriter(
             headers=headers,
             value_matrix=data
@@ -96,11 +111,47 @@ def remove_characters(string):
     :return: The cleaned string
     """
 
-    remove_chars = '#@}{]["'
-    for char in remove_chars:
-        string = string.replace(char, "")
+    return string.translate(REMOVE_CHARS)
+
+
+def expand_long_value(value):
+    """
+    This function wraps strings longer than 200 characters in a collapsed details block.
+    :param value: The value to wrap
+    :return: The wrapped string, or the value if it is not a long string
+    """
+
+    if type(value) is str and len(value) > 200:
+        return f'<details><summary>Click to expand...</summary>{value}</details>'
 
-    return string
+    return value
+
+
+def format_value(item):
+    """
+    This function formats a configuration value for the Markdown table.
+    :param item: The value to format
+    :return: The formatted value
+    """
+
+    if type(item) is list:
+        # Only the last digit string, list or dict in the list is displayed, so only that one is formatted
+        for i in reversed(item):
+            if type(i) is str and i.isdigit():
+                return i
+            if type(i) is list:
+                return remove_characters(",".join(str(v) for v in i) + ",")
+            if type(i) is dict:
+                return remove_characters(json.dumps({k: expand_long_value(v) for k, v in i.items()}))
+        return ""
+
+    if type(item) is dict:
+        return remove_characters(json.dumps(item))
+
+    if type(item) is str:
+        return expand_long_value(item)
+
+    return item
 
 
 def clean_list(data):
@@ -110,193 +161,374 @@ def clean_list(data):
     :return: The cleaned list
     """
 
-    values = []
-    liststr = ","
-    for item in data:
-        string = ""
-        if type(item) is list:
-            for i in item:
-                if type(i) is str:
-                    if i.isdigit():
-                        string = i
-                if type(i) is list:
-                    string = i + liststr
-                    string = remove_characters(string)
-                if type(i) is dict:
-                    for k, v in i.items():
-                        if type(v) is str and len(v) > 200:
-                            i[k] = f'<details><summary>Click to expand...</summary>{v}</details>'
-                    string = json.dumps(i)
-                    string = remove_characters(string)
-
-            values.append(string)
-
-        elif type(item) is dict:
-            string = json.dumps(item)
-            string = remove_characters(string)
-
-            values.append(string)
-
-        elif type(item) is str:
-            if len(item) > 200:
-                string = f'<details><summary>Click to expand...</summary>{item}</details>'
-            else:
-                string = item
-            values.append(string)
+    return [format_value(item) for item in data]
+
+
+@contextmanager
+def md_output(outpath):
+    """
+    This function yields a handle to write Markdown to.
+
+    :param outpath: The path to append the Markdown to, or a MarkdownWriter
+    """
+
+    if hasattr(outpath, 'write'):
+        yield outpath
+    else:
+        with open(outpath, 'a') as md:
+            yield md
+
+
+def get_config_files(configpath):
+    """
+    This function gets the JSON and YAML files of a configuration, sorted in the order they are documented.
+
+    :param configpath: The path to where the backup files are saved
+    :return: List of file paths
+    """
+
+    # Management intents are saved in a folder per template, their configpath ends with a slash
+    return get_files(configpath, subdirs=configpath.endswith('/'))
+
+
+def render_fragment(repo_data, description, assignments_table, table):
+    """
+    This function creates the Markdown for one configuration.
+
+    :param repo_data: The configuration data
+    :param description: The description of the configuration
+    :param assignments_table: The assignments table, or an empty string
+    :param table: The configuration table rows
+    :return: The Markdown as a string
+    """
+
+    fragment = ""
+    if "displayName" in repo_data:
+        fragment += '## ' + repo_data['displayName'] + '\n'
+    if "name" in repo_data:
+        fragment += '## ' + repo_data['name'] + '\n'
+    if description:
+        fragment += f'Description: {description} \n'
+    if assignments_table:
+        fragment += '### Assignments \n'
+        fragment += str(assignments_table) + '\n'
+    fragment += str(write_table(table)) + '\n'
+
+    return fragment
+
+
+def config_rows(keys, values, max_length=None):
+    """
+    This function creates the rows of the configuration table.
+
+    :param keys: The settings
+    :param values: The formatted values
+    :param max_length: The maximum length of a value, longer values are replaced
+    :return: List of setting and value rows
+    """
+
+    rows = []
+    for key, value in zip(keys, values):
+        if max_length:
+            if value and type(value) == str and len(value) > max_length:
+                value = "Value too long to display"
+        rows.append([key, value])
+
+    return rows
+
+
+def render_config(filename, max_length=None):
+    """
+    This function renders one configuration file to Markdown.
+
+    :param filename: The path to the configuration file
+    :param max_length: The maximum length of the configuration to write to the Markdown document
+    :return: The Markdown as a string
+    """
+
+    # Check which format the file is saved as then open file and load data
+    with open(filename) as f:
+        repo_data = load_file(filename, f)
+
+    # Create assignments table
+    assignments_table = assignment_table(repo_data)
+    repo_data.pop('assignments', None)
+
+    description = ""
+    if repo_data.get('description') is not None:
+        description = repo_data.pop('description')
+
+    # Create configuration table
+    config_table_list = config_rows(repo_data.keys(), clean_list(repo_data.values()), max_length)
+
+    return render_fragment(repo_data, description, assignments_table, config_table_list)
+
+
+def setting_value(definition_id, value):
+    """
+    This function formats the value of a Settings Catalog setting.
+    Choice values are prefixed with the setting definition id, the prefix is removed.
+
+    :param definition_id: The setting definition id
+    :param value: The value of the setting
+    :return: The value as a string
+    """
+
+    if type(value) is str and value.startswith(definition_id + "_"):
+        return value[len(definition_id) + 1:]
+
+    return str(value)
+
+
+def settings_catalog_rows(settings):
+    """
+    This function flattens the settings of a Settings Catalog policy to one row per setting.
+    The settingInstance trees are walked depth first with a stack, children follow their parent setting.
+
+    :param settings: The settings of the policy
+    :return: List of setting and value rows
+    """
+
+    rows = []
+    stack = [setting['settingInstance'] for setting in reversed(settings) if setting.get('settingInstance')]
+    while stack:
+        instance = stack.pop()
+        definition_id = instance.get('settingDefinitionId', '')
+        values = []
+        children = []
+        for key in SETTING_VALUE_KEYS:
+            setting_values = instance.get(key)
+            if not setting_values:
+                continue
+            if type(setting_values) is not list:
+                setting_values = [setting_values]
+            for item in setting_values:
+                if 'value' in item:
+                    values.append(setting_value(definition_id, item['value']))
+                children.extend(item.get('children') or [])
+
+        if values:
+            rows.append([definition_id, ", ".join(values)])
+        stack.extend(reversed(children))
+
+    return rows
+
+
+def render_settings_catalog(filename, max_length=None):
+    """
+    This function renders one Settings Catalog policy file to Markdown, with one row per setting.
+
+    :param filename: The path to the policy file
+    :param max_length: The maximum length of the configuration to write to the Markdown document
+    :return: The Markdown as a string
+    """
+
+    # Check which format the file is saved as then open file and load data
+    with open(filename) as f:
+        repo_data = load_file(filename, f)
+
+    # Create assignments table
+    assignments_table = assignment_table(repo_data)
+    repo_data.pop('assignments', None)
+
+    description = ""
+    if repo_data.get('description') is not None:
+        description = repo_data.pop('description')
+
+    settings = repo_data.pop('settings', None) or []
+
+    # Create configuration table, followed by the settings
+    config_table_list = config_rows(repo_data.keys(), clean_list(repo_data.values()), max_length)
+    rows = settings_catalog_rows(settings)
+    config_table_list += config_rows([row[0] for row in rows], [expand_long_value(row[1]) for row in rows],
+                                     max_length)
+
+    return render_fragment(repo_data, description, assignments_table, config_table_list)
+
+
+def render_intent(filename):
+    """
+    This function renders one management intent file to Markdown.
+
+    :param filename: The path to the management intent file
+    :return: The Markdown as a string
+    """
+
+    # Check which format the file is saved as then open file and load data
+    with open(filename) as f:
+        repo_data = load_file(filename, f)
+
+    # Create assignments table
+    assignments_table = assignment_table(repo_data)
+    repo_data.pop('assignments', None)
+
+    intent_settings_list = []
+    for setting in repo_data['settingsDelta']:
+        intent_settings_list.append([setting['definitionId'].split("_")[1],
+                                     str(remove_characters(setting['valueJson']))])
+
+    repo_data.pop('settingsDelta')
+
+    description = ""
+    if repo_data.get('description') is not None:
+        description = repo_data.pop('description')
+
+    intent_table_list = []
+    for key, value in zip(repo_data.keys(), clean_list(repo_data.values())):
+        intent_table_list.append([key, value])
+
+    return render_fragment(repo_data, description, assignments_table, intent_table_list + intent_settings_list)
+
+
+def timed_render(render, filename):
+    """
+    This function renders a file and measures the time it took.
+
+    :param render: The function to render the file with
+    :param filename: The file to render
+    :return: Tuple of the Markdown and the time in seconds
+    """
+
+    start = time.perf_counter()
+    fragment = render(filename)
+
+    return fragment, time.perf_counter() - start
+
+
+def render_files(render, filenames, options, executor=None):
+    """
+    This function renders files to Markdown, in parallel if an executor is given.
+    Files that have not changed since the last run are taken from the documentation cache, if it is used.
+
+    :param render: The function to render one file with, must be picklable for process pools
+    :param filenames: List of files to render
+    :param options: Dict of the renderer options, cached fragments are only used if the options are the same
+    :param executor: Optional concurrent.futures executor to render the files with
+    :return: List of Markdown fragments in the same order as the files
+    """
+
+    fragments = get_cached_fragments(filenames, options)
+    missing = [filename for filename in filenames if filename not in fragments]
+
+    timed = partial(timed_render, render)
+    if executor is None or len(missing) < 2:
+        rendered = map(timed, missing)
+    else:
+        rendered = executor.map(timed, missing, chunksize=max(1, len(missing) // 64))
+
+    for filename, (fragment, seconds) in zip(missing, rendered):
+        fragments[filename] = fragment
+        render_times[filename] = seconds
+        cache_fragment(filename, fragment)
+
+    return [fragments[filename] for filename in filenames]
 
-        else:
-            values.append(item)
 
-    return values
+def write_if_changed(outpath, content):
+    """
+    This function writes content to a file, unless the file already has the same content.
+
+    :param outpath: The path of the file
+    :param content: The content to write
+    :return: True if the file was written
+    """
+
+    if os.path.exists(outpath):
+        with open(outpath) as f:
+            if f.read() == content:
+                return False
+
+    with open(outpath, 'w') as f:
+        f.write(content)
 
+    return True
 
-def document_configs(configpath, outpath, header, max_length, split):
+
+def write_section(configpath, outpath, header, fragments, split):
+    """
+    This function writes a documented section.
+    When split, the section is saved to its own file, which is only written if the content changed.
+
+    :param configpath: The path to where the backup files are saved
+    :param outpath: The path to save the Markdown document to, or a MarkdownWriter
+    :param header: Header of the configuration being documented
+    :param fragments: List of rendered Markdown fragments
+    :param split: Split documentation into multiple files
+    """
+
+    if split:
+        write_if_changed(configpath + "/" + header + ".md", '# ' + header + '\n' + ''.join(fragments))
+        return
+
+    with md_output(outpath) as md:
+        md.write('# ' + header + '\n')
+        for fragment in fragments:
+            md.write(fragment)
+
+
+def document_configs(configpath, outpath, header, max_length, split, executor=None):
     """
     This function documents the configuration.
 
     :param configpath: The path to where the backup files are saved
-    :param outpath: The path to save the Markdown document to
+    :param outpath: The path to save the Markdown document to, or a MarkdownWriter
     :param header: Header of the configuration being documented
     :param max_length: The maximum length of the configuration to write to the Markdown document
     :param split: Split documentation into multiple files
+    :param executor: Optional concurrent.futures executor to render the configurations with
     """
 
     # If configurations path exists, continue
     if os.path.exists(configpath):
-        if split:
-            outpath = configpath + "/" + header + ".md"
-            md_file(outpath)
-        with open(outpath, 'a') as md:
-            md.write('# ' + header + '\n')
+        files = get_config_files(configpath)
+        render = partial(render_config, max_length=max_length)
+        fragments = render_files(render, files, {'renderer': 'config', 'maxlength': max_length}, executor)
+        write_section(configpath, outpath, header, fragments, split)
 
-        pattern = configpath + "*/*"
-        for filename in sorted(glob.glob(pattern, recursive=True), key=str.casefold):
-            if filename.endswith(".md"):
-                continue
-            # If path is Directory, skip
-            if os.path.isdir(filename):
-                continue
-            # If file is .DS_Store, skip
-            if filename == ".DS_Store":
-                continue
 
-            # Check which format the file is saved as then open file, load data and set query parameter
-            with open(filename) as f:
-                if filename.endswith(".yaml"):
-                    data = json.dumps(yaml.safe_load(f))
-                    repo_data = json.loads(data)
-                elif filename.endswith(".json"):
-                    f = open(filename)
-                    repo_data = json.load(f)
-
-                # Create assignments table
-                assignments_table = ""
-                assignments_table = assignment_table(repo_data)
-                repo_data.pop('assignments', None)
-
-                description = ""
-                if 'description' in repo_data:
-                    if repo_data['description'] is not None:
-                        description = repo_data['description']
-                        repo_data.pop('description')
-
-                # Write configuration Markdown table
-                config_table_list = []
-                for key, value in zip(repo_data.keys(), clean_list(repo_data.values())):
-                    if max_length:
-                        if value and type(value) == str and len(value) > max_length:
-                            value = "Value too long to display"
-                    config_table_list.append([key, value])
-                config_table = write_table(config_table_list)
-
-                # Write data to file
-                with open(outpath, 'a') as md:
-                    if "displayName" in repo_data:
-                        md.write('## ' + repo_data['displayName'] + '\n')
-                    if "name" in repo_data:
-                        md.write('## ' + repo_data['name'] + '\n')
-                    if description:
-                        md.write(f'Description: {description} \n')
-                    if assignments_table:
-                        md.write('### Assignments \n')
-                        md.write(str(assignments_table) + '\n')
-                    md.write(str(config_table) + '\n')
-
-
-def document_management_intents(configpath, outpath, header, split):
+def document_settings_catalog(configpath, outpath, header, max_length, split, executor=None):
     """
-    This function documents the management intents.
+    This function documents the Settings Catalog policies with one row per setting.
 
     :param configpath: The path to where the backup files are saved
-    :param outpath: The path to save the Markdown document to
+    :param outpath: The path to save the Markdown document to, or a MarkdownWriter
     :param header: Header of the configuration being documented
+    :param max_length: The maximum length of the configuration to write to the Markdown document
     :param split: Split documentation into multiple files
+    :param executor: Optional concurrent.futures executor to render the policies with
     """
 
     # If configurations path exists, continue
     if os.path.exists(configpath):
-        if split:
-            outpath = configpath + "/" + header + ".md"
-            md_file(outpath)
-        with open(outpath, 'a') as md:
-            md.write('# ' + header + '\n')
+        files = get_config_files(configpath)
+        render = partial(render_settings_catalog, max_length=max_length)
+        fragments = render_files(render, files, {'renderer': 'settings_catalog', 'maxlength': max_length}, executor)
+        write_section(configpath, outpath, header, fragments, split)
 
-        pattern = configpath + "*/*"
-        for filename in sorted(glob.glob(pattern, recursive=True), key=str.casefold):
-            # If path is Directory, skip
-            if os.path.isdir(filename):
-                continue
-            # If file is .DS_Store, skip
-            if filename == ".DS_Store":
-                continue
+        rendered = [filename for filename in files if filename in render_times]
+        if rendered:
+            slowest = max(rendered, key=render_times.get)
+            print(f"Rendered {len(rendered)} Settings Catalog policies in "
+                  f"{sum(render_times[filename] for filename in rendered):.3f}s, slowest: "
+                  f"{os.path.basename(slowest)} ({render_times[slowest]:.3f}s)")
 
-            # Check which format the file is saved as then open file, load data and set query parameter
-            with open(filename) as f:
-                if filename.endswith(".yaml"):
-                    data = json.dumps(yaml.safe_load(f))
-                    repo_data = json.loads(data)
-                elif filename.endswith(".json"):
-                    f = open(filename)
-                    repo_data = json.load(f)
-
-                # Create assignments table
-                assignments_table = ""
-                assignments_table = assignment_table(repo_data)
-                repo_data.pop('assignments', None)
-
-                intent_settings_list = []
-                for setting in repo_data['settingsDelta']:
-                    intent_settings_list.append([setting['definitionId'].split("_")[1],
-                                                 str(remove_characters(setting['valueJson']))])
-
-                repo_data.pop('settingsDelta')
-
-                description = ""
-                if 'description' in repo_data:
-                    if repo_data['description'] is not None:
-                        description = repo_data['description']
-                        repo_data.pop('description')
-
-                intent_table_list = []
-
-                for key, value in zip(repo_data.keys(), clean_list(repo_data.values())):
-                    intent_table_list.append([key, value])
-
-                table = intent_table_list + intent_settings_list
-
-                config_table = write_table(table)
-                # Write data to file
-                with open(outpath, 'a') as md:
-                    if "displayName" in repo_data:
-                        md.write('## ' + repo_data['displayName'] + '\n')
-                    if "name" in repo_data:
-                        md.write('## ' + repo_data['name'] + '\n')
-                    if description:
-                        md.write(f'Description: {description} \n')
-                    if assignments_table:
-                        md.write('### Assignments \n')
-                        md.write(str(assignments_table) + '\n')
-                    md.write(str(config_table) + '\n')
+
+def document_management_intents(configpath, outpath, header, split, executor=None):
+    """
+    This function documents the management intents.
+
+    :param configpath: The path to where the backup files are saved
+    :param outpath: The path to save the Markdown document to, or a MarkdownWriter
+    :param header: Header of the configuration being documented
+    :param split: Split documentation into multiple files
+    :param executor: Optional concurrent.futures executor to render the management intents with
+    """
+
+    # If configurations path exists, continue
+    if os.path.exists(configpath):
+        files = get_config_files(configpath)
+        fragments = render_files(render_intent, files, {'renderer': 'intent'}, executor)
+        write_section(configpath, outpath, header, fragments, split)
 
 
 def get_md_files():
@@ -305,9 +537,5 @@ def get_md_files():
     :return: List of Markdown files
     """
 
-    md_files = []
-    patterns = ["*/*.md", "*/*/*.md", "*/*/*/*.md"]
-    for pattern in patterns:
-        for filename in glob.glob(pattern, recursive=True):
-            md_files.append(f'./{filename}')
-    return md_files
+    # Markdown files are written one to three folders down from the current directory
+    return [file for file in walk_files('.', formats=('md',), max_depth=3) if file.count(os.sep) > 1]
@@ -4,10 +4,166 @@
 This module contains the functions used to get the access token for MS Graph.
 """
 
-from adal import AuthenticationContext
+import os
+import time
+import threading
 
+from datetime import datetime
 
-def obtain_accesstoken(TENANT_NAME, CLIENT_ID, CLIENT_SECRET, resource):
+# Refresh the token when it expires within this many seconds
+REFRESH_MARGIN = 300
+
+# Token caches saved to disk, by path, shared by all tokens using the same file
+token_caches = {}
+# Locks of the token caches by path, tenants run in parallel write the same file
+token_cache_locks = {}
+lock = threading.Lock()
+
+
+def load_token_cache(cache_path):
+    """
+    This function loads a token cache from disk, or creates an empty cache.
+
+    :param cache_path: The path to the token cache file, or None for an in-memory cache
+    :return: The ADAL token cache
+    """
+
+    # ADAL is imported when a token is needed, so commands that do not authenticate start faster
+    from adal import TokenCache
+
+    if cache_path is None:
+        return TokenCache()
+
+    with lock:
+        if cache_path not in token_caches:
+            state = None
+            if os.path.exists(cache_path):
+                with open(cache_path) as f:
+                    state = f.read() or None
+            token_caches[cache_path] = TokenCache(state=state)
+            token_cache_locks[cache_path] = threading.Lock()
+
+        return token_caches[cache_path]
+
+
+def save_token_cache(cache_path, cache):
+    """
+    This function saves a token cache to disk, readable only by the current user.
+
+    :param cache_path: The path to the token cache file
+    :param cache: The ADAL token cache
+    """
+
+    with lock:
+        cache_lock = token_cache_locks.setdefault(cache_path, threading.Lock())
+
+    with cache_lock:
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(cache.serialize())
+        os.replace(tmp_path, cache_path)
+        cache.has_state_changed = False
+
+
+def token_expiry(token):
+    """
+    This function gets the time a token expires.
+
+    :param token: The token returned by ADAL
+    :return: The expiry as seconds since the epoch
+    """
+
+    expires_on = token.get('expiresOn')
+    if expires_on:
+        for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
+            try:
+                return time.mktime(datetime.strptime(expires_on, fmt).timetuple())
+            except ValueError:
+                continue
+
+    return time.time() + token.get('expiresIn', 0)
+
+
+class TokenProvider:
+    """
+    Access token for MS Graph that is refreshed before it expires.
+
+    The provider can be used like the token dict returned by ADAL, token['accessToken'] always returns
+    a valid access token. Tokens are cached in memory, and on disk if a cache path is given.
+    """
+
+    def __init__(self, TENANT_NAME, CLIENT_ID, CLIENT_SECRET, resource, cache_path=None):
+        """
+        :param TENANT_NAME: The name of the Azure tenant
+        :param CLIENT_ID: The ID of the registered Azure AD application
+        :param CLIENT_SECRET: Secret of the registered Azure AD application
+        :param resource: The resource to get an access token for
+        :param cache_path: Optional path to save the token cache to
+        """
+
+        from adal import AuthenticationContext
+
+        self.client_id = CLIENT_ID
+        self.client_secret = CLIENT_SECRET
+        self.resource = resource
+        self.cache_path = cache_path
+        self.cache = load_token_cache(cache_path)
+        self.auth_context = AuthenticationContext('https://login.microsoftonline.com/' + TENANT_NAME,
+                                                  cache=self.cache)
+        self.token = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """
+        This function gets a token from the cache, or from Azure AD if the cached token is about to expire.
+        """
+
+        with self.lock:
+            self.token = self.auth_context.acquire_token_with_client_credentials(
+                resource=self.resource, client_id=self.client_id,
+                client_secret=self.client_secret)
+            self.expires_at = token_expiry(self.token)
+            if self.cache_path and self.cache.has_state_changed:
+                save_token_cache(self.cache_path, self.cache)
+
+    def invalidate(self):
+        """
+        This function removes the token from the cache, the next request gets a new token from Azure AD.
+        """
+
+        with self.lock:
+            # Tenants can share an app registration and a cache, only remove the token of this tenant
+            entries = [entry for entry in self.cache.find({'_clientId': self.client_id})
+                       if entry.get('resource') == self.resource
+                       and entry.get('_authority') == self.auth_context.authority.url]
+            if entries:
+                self.cache.remove(entries)
+            self.token = None
+            self.expires_at = 0
+
+    def access_token(self):
+        """
+        This function returns a valid access token, refreshing it first if it is about to expire.
+
+        :return: The access token
+        """
+
+        if self.token is None or time.time() > self.expires_at - REFRESH_MARGIN:
+            self.refresh()
+
+        return self.token['accessToken']
+
+    def __getitem__(self, key):
+        if key == 'accessToken':
+            return self.access_token()
+        if self.token is None:
+            self.refresh()
+        return self.token[key]
+
+
+def obtain_accesstoken(TENANT_NAME, CLIENT_ID, CLIENT_SECRET, resource, cache_path=None):
     """
     This function is used to get an access token to MS Graph.
 
@@ -15,12 +171,11 @@ def obtain_accesstoken(TENANT_NAME, CLIENT_ID, CLIENT_SECRET, resource):
     :param CLIENT_ID: The ID of the registered Azure AD application
     :param CLIENT_SECRET: Secret of the registered Azure AD application
     :param resource: The resource to get an access token for
-    :return: The access token
+    :param cache_path: Optional path to save the token cache to
+    :return: The access token provider
     """
 
-    auth_context = AuthenticationContext('https://login.microsoftonline.com/' +
-                                         TENANT_NAME)
-    token = auth_context.acquire_token_with_client_credentials(
-        resource=resource, client_id=CLIENT_ID,
-        client_secret=CLIENT_SECRET)
+    token = TokenProvider(TENANT_NAME, CLIENT_ID, CLIENT_SECRET, resource, cache_path)
+    # Authenticate right away so invalid credentials fail before any work is done
+    token.refresh()
     return token
@@ -18,7 +18,7 @@ def getAuth(mode, localauth, tenant):
     :param mode: The mode used when using this tool
     :param localauth: Path to dict with keys to authenticate
     :param tenant: Which tenant to authenticate to, PROD or DEV
-    :return: The access token
+    :return: The access token, refreshed before it expires. If TOKEN_CACHE is set, tokens are cached in that file
     """
 
     if mode == 'devtoprod':
@@ -44,7 +44,8 @@ def getAuth(mode, localauth, tenant):
                 tenant_TENANT_NAME,
                 tenant_CLIENT_ID,
                 tenant_CLIENT_SECRET,
-                resource)
+                resource,
+                cache_path=os.environ.get("TOKEN_CACHE"))
             return token
 
     elif mode == 'standalone':
@@ -64,5 +65,25 @@ def getAuth(mode, localauth, tenant):
             raise Exception("One or more os.environ variables not set")
         else:
             token = obtain_accesstoken(
-                TENANT_NAME, CLIENT_ID, CLIENT_SECRET, resource)
+                TENANT_NAME, CLIENT_ID, CLIENT_SECRET, resource, cache_path=os.environ.get("TOKEN_CACHE"))
             return token
+
+
+def getTenantAuth(params):
+    """
+    This function authenticates to MS Graph with the params of one tenant, in the same format as the
+    params of the --localauth file in standalone mode.
+
+    :param params: Dict with keys TENANT_NAME, CLIENT_ID and CLIENT_SECRET
+    :return: The access token
+    """
+
+    TENANT_NAME = params.get('TENANT_NAME')
+    CLIENT_ID = params.get('CLIENT_ID')
+    CLIENT_SECRET = params.get('CLIENT_SECRET')
+    if ((TENANT_NAME is None) or (CLIENT_ID is None)
+            or (CLIENT_SECRET is None)):
+        raise Exception("One or more params not set for tenant " + str(TENANT_NAME))
+
+    return obtain_accesstoken(
+        TENANT_NAME, CLIENT_ID, CLIENT_SECRET, resource, cache_path=os.environ.get("TOKEN_CACHE"))
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+"""
+This module contains an asyncio client for the Microsoft Graph API, so many requests can be in flight at the same
+time from one thread.
+
+Requests are sent through the same pipeline as the synchronous functions in graph_request, so the rate limit,
+token refresh, run metrics and cassettes apply to them as well. Connections are kept alive and reused, in the
+session shared with the synchronous functions.
+"""
+
+import json
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+from .graph_request import send_request, session, size_session_pool
+from .graph_batch import (BATCH_URL, batch_bodies, batch_responses, throttled_requests, assignment_ids,
+                          assignment_targets, add_group_names, add_filter_names)
+from .rate_limit import rate_limit
+from .metrics import current, record_retry
+from .response_cache import cached_batch
+from .delta import delta_supported, delta_url, delta_failed, merge_delta
+
+# Default maximum number of requests in flight
+DEFAULT_CONCURRENCY = 20
+
+
+class AsyncGraphClient:
+    """
+    Sends requests to the Microsoft Graph API from coroutines, with no more than the given number in flight.
+
+    The client is used as an async context manager:
+        async with AsyncGraphClient(token) as client:
+            data = await client.makeapirequest(endpoint)
+    """
+
+    def __init__(self, token, concurrency=DEFAULT_CONCURRENCY):
+        """
+        :param token: Token to use for authenticating the requests
+        :param concurrency: The maximum number of requests in flight
+        """
+
+        self.token = token
+        self.concurrency = concurrency
+        self.semaphore = None
+        self.executor = None
+
+    async def __aenter__(self):
+        # Requests from the client count against the rate limit of the tenant in this thread
+        limiter = rate_limit['limiter']
+
+        def set_limiter():
+            rate_limit['limiter'] = limiter
+
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        # Requests are sent with the session shared with the other requests to Graph
+        size_session_pool(self.concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, initializer=set_limiter)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.executor.shutdown(wait=True)
+
+    def _send(self, method, endpoint, category, kwargs):
+        current['category'] = category
+        return send_request(getattr(session, method.lower()), endpoint, self.token, **kwargs)
+
+    async def request(self, method, endpoint, **kwargs):
+        """
+        This function sends a request when fewer than the maximum number of requests are in flight.
+
+        :param method: The HTTP method
+        :param endpoint: The endpoint to make the request to
+        :return: The response from the request
+        """
+
+        # Requests are counted under the category of the coroutine that sends them
+        category = current['category']
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self._send, method, endpoint, category, kwargs)
+
+    async def makeapirequest(self, endpoint, q_param=None):
+        """
+        This function makes a GET request to the Microsoft Graph API, following nextLinks.
+
+        :param endpoint: The endpoint to make the request to
+        :param q_param: The query parameters to use for the request
+        :return: The response from the request
+        """
+
+        if q_param is None and delta_supported(endpoint):
+            json_data = await self.makeapirequest_delta(endpoint)
+            if json_data is not None:
+                return json_data
+
+        kwargs = {'params': q_param} if q_param is not None else {}
+        response = await self.request('GET', endpoint, **kwargs)
+        if response.status_code == 504 or response.status_code == 502 or response.status_code == 503:
+            print('Ran into issues with Graph request, waiting 10 seconds and trying again...')
+            record_retry('GET', endpoint)
+            await asyncio.sleep(10)
+            response = await self.request('GET', endpoint, **kwargs)
+        if response.status_code == 200:
+            json_data = json.loads(response.text)
+
+            if '@odata.nextLink' in json_data.keys():
+                record = await self.makeapirequest(json_data['@odata.nextLink'])
+                json_data['value'].extend(record['value'])
+
+            return json_data
+
+        elif response.status_code == 404:
+            print("Resource not found in Microsoft Graph: " + endpoint)
+        elif ("assignmentFilters" in endpoint) and ("FeatureNotEnabled" in response.text):
+            print("Assignment filters not enabled in tenant, skipping")
+        else:
+            raise Exception('Request failed with ', response.status_code, ' - ',
+                            response.text)
+
+    async def makeapirequest_delta(self, endpoint):
+        """
+        This function lists a collection with delta requests, the same as makeapirequest_delta in graph_request.
+
+        :param endpoint: The endpoint of the collection
+        :return: The collection, or None if it could not be listed with delta
+        """
+
+        url = delta_url(endpoint)
+        values = []
+        while url:
+            response = await self.request('GET', url)
+            if response.status_code != 200:
+                if delta_failed(endpoint, response.status_code):
+                    return await self.makeapirequest_delta(endpoint)
+                return None
+            json_data = json.loads(response.text)
+            values.extend(json_data.get('value', []))
+            url = json_data.get('@odata.nextLink')
+
+        return merge_delta(endpoint, values, json_data)
+
+    async def makeapirequestPost(self, endpoint, q_param=None, jdata=None, status_code=200):
+        """
+        This function makes a POST request to the Microsoft Graph API.
+
+        :param endpoint: The endpoint to make the request to
+        :param q_param: The query parameters to use for the request
+        :param jdata: The JSON data to use for the request
+        :param status_code: The status code to expect from the request
+        :return: The response from the request, if it has a body
+        """
+
+        if q_param is not None:
+            response = await self.request('POST', endpoint, params=q_param, data=jdata)
+        else:
+            response = await self.request('POST', endpoint, data=jdata)
+        if response.status_code == status_code:
+            if response.text:
+                return json.loads(response.text)
+        else:
+            raise Exception('Request failed with ', response.status_code, ' - ',
+                            response.text)
+
+    async def batch_request(self, data, url, extra_url, method='GET') -> list:
+        """
+        Batch request to the Graph API. The batches are sent at the same time.
+
+        :param data: List of object IDs to get data for
+        :param url: MS graph endpoint for the object
+        :param extra_url: Used if anything extra is needed for the url such as /assignments or ?$filter
+        :param method: GET or POST
+        :return: List of responses from the batch request
+        """
+
+        batches = await asyncio.gather(*[self.send_batch(query_data)
+                                         for query_data in batch_bodies(data, url, extra_url, method)])
+
+        return [body for batch in batches for body in batch]
+
+    async def send_batch(self, query_data) -> list:
+        """
+        Send a batch request, sending the requests Graph throttled again.
+
+        :param query_data: The body of the batch request
+        :return: List of response bodies
+        """
+
+        done = []
+        attempt = 0
+        query_data = cached_batch(query_data, done)
+        while query_data:
+            request = await self.makeapirequestPost(BATCH_URL, jdata=json.dumps(query_data))
+            query_data = throttled_requests(request, query_data, done, attempt)
+            attempt += 1
+
+        return batch_responses(done)
+
+    async def batch_assignment(self, data, url, extra_url, app_protection=False) -> list:
+        """
+        Batch request the assignments of objects. The names of the groups and filters are requested at the
+        same time.
+
+        :param data: List of objects
+        :param url: MS graph endpoint for the object
+        :param extra_url: Used if anything extra is needed for the url such as /assignments or ?$filter
+        :param app_protection: By default False, set to true when getting assignments for APP to get the platform
+        :return: List of responses from the batch request
+        """
+
+        data_ids = assignment_ids(data, app_protection)
+        # If we have any IDs, batch request the assignments
+        if data_ids:
+            responses = await self.batch_request(data_ids, url, extra_url)
+            group_ids, filter_ids = assignment_targets(responses) if responses else ([], [])
+
+            group_responses, filter_responses = await asyncio.gather(
+                self.batch_request(group_ids, 'groups/', '?$select=displayName,id'),
+                self.batch_request(filter_ids, 'deviceManagement/assignmentFilters/', '?$select=displayName'))
+            if group_ids:
+                add_group_names(responses, group_responses)
+            if filter_ids:
+                add_filter_names(responses, filter_responses)
+
+            return responses
+
+
+def run_async(func, *args, token, concurrency=DEFAULT_CONCURRENCY, **kwargs):
+    """
+    This function runs an async variant of a function in a new event loop with its own client.
+
+    :param func: The coroutine function, taking the client in place of the token
+    :param token: Token to use for authenticating the requests
+    :param concurrency: The maximum number of requests in flight
+    :return: The result of the function
+    """
+
+    async def run():
+        async with AsyncGraphClient(token, concurrency) as client:
+            return await func(*args, client, **kwargs)
+
+    return asyncio.run(run())
@@ -8,6 +8,11 @@ the batch request.
 
 import json
 from .graph_request import makeapirequestPost
+from .metrics import record_batch
+from .rate_limit import get_rate_limiter, retry_after, MAX_THROTTLE_RETRIES
+from .response_cache import cached_batch, store_batch
+
+BATCH_URL = 'https://graph.microsoft.com/beta/$batch'
 
 
 def batch_request(data, url, extra_url, token, method='GET') -> list:
@@ -23,6 +28,32 @@ def batch_request(data, url, extra_url, token, method='GET') -> list:
     """
 
     responses = []
+    for query_data in batch_bodies(data, url, extra_url, method):
+        done = []
+        attempt = 0
+        query_data = cached_batch(query_data, done)
+        while query_data:
+            # POST to the graph batch endpoint
+            request = makeapirequestPost(BATCH_URL, token, jdata=json.dumps(query_data))
+            query_data = throttled_requests(request, query_data, done, attempt)
+            attempt += 1
+        responses.extend(batch_responses(done))
+
+    return responses
+
+
+def batch_bodies(data, url, extra_url, method='GET') -> list:
+    """
+    Build the bodies of the batch requests, with up to 20 requests in each.
+
+    :param data: List of object IDs to get data for
+    :param url: MS graph endpoint for the object
+    :param extra_url: Used if anything extra is needed for the url such as /assignments or ?$filter
+    :param method: GET or POST
+    :return: List of batch request bodies
+    """
+
+    bodies = []
     batch_id = 1
     batch_count = 20
     # Split objects into lists of 20
@@ -41,20 +72,53 @@ def batch_request(data, url, extra_url, token, method='GET') -> list:
 
             batch_id += 1
             query_data['requests'].append(body)
+        bodies.append(query_data)
 
-        # POST to the graph batch endpoint
-        json_data = json.dumps(query_data)
-        request = makeapirequestPost(
-            'https://graph.microsoft.com/beta/$batch', token, jdata=json_data)
-        request_data = sorted(
-            request['responses'], key=lambda item: item.get("id"))
+    return bodies
 
-        # Append each successful request to responses list
-        for resp in request_data:
-            if resp['status'] == 200:
-                responses.append(resp['body'])
 
-    return responses
+def throttled_requests(request, query_data, done, attempt) -> dict:
+    """
+    Collect the responses of a batch request and get the requests that were throttled, to send them again.
+
+    :param request: The response of the batch endpoint
+    :param query_data: The body of the batch request
+    :param done: List the responses that are not sent again are added to
+    :param attempt: The number of times the throttled requests have been sent again
+    :return: The body of a batch request with the throttled requests, or None if there are none to send again
+    """
+
+    record_batch(request['responses'])
+    store_batch(query_data, request['responses'])
+    throttled = [resp for resp in request['responses'] if resp['status'] == 429]
+    if not throttled or attempt >= MAX_THROTTLE_RETRIES:
+        done.extend(request['responses'])
+        return None
+
+    done.extend(resp for resp in request['responses'] if resp['status'] != 429)
+    wait = max(retry_after(resp.get('headers') or {}) for resp in throttled)
+    print(f'{len(throttled)} requests in batch were throttled by Graph, trying again in {wait:g} seconds...')
+    # The next batch waits for the rate limiter, the batch counts once with the share of its requests throttled
+    get_rate_limiter().throttled(wait, len(throttled) / len(request['responses']))
+    ids = {str(resp['id']) for resp in throttled}
+
+    return {'requests': [req for req in query_data['requests'] if str(req['id']) in ids]}
+
+
+def batch_responses(responses) -> list:
+    """
+    Get the successful responses of a batch request in the order they were requested.
+
+    :param responses: The responses of the requests in the batch
+    :return: List of response bodies
+    """
+
+    # Graph returns the IDs as strings, sort them as numbers so the 10th request does not come before the 2nd
+    request_data = sorted(
+        responses, key=lambda item: int(item.get("id")))
+
+    # Append each successful request to responses list
+    return [resp['body'] for resp in request_data if resp['status'] == 200]
 
 
 def batch_assignment(data, url, extra_url, token, app_protection=False) -> list:
@@ -69,10 +133,42 @@ def batch_assignment(data, url, extra_url, token, app_protection=False) -> list:
     :return: List of responses from the batch request
     """
 
-    data_ids = []
     group_ids = []
     filter_ids = []
 
+    data_ids = assignment_ids(data, app_protection)
+    # If we have any IDs, batch request the assignments
+    if data_ids:
+        responses = batch_request(data_ids, url, extra_url, token)
+        if responses:
+            group_ids, filter_ids = assignment_targets(responses)
+
+        # Batch get name of the groups
+        if group_ids:
+            group_responses = batch_request(
+                group_ids, 'groups/', '?$select=displayName,id', token)
+            add_group_names(responses, group_responses)
+
+        # Batch get name of the Filters
+        if filter_ids:
+            filter_responses = batch_request(
+                filter_ids, 'deviceManagement/assignmentFilters/', '?$select=displayName', token)
+            add_filter_names(responses, filter_responses)
+
+        return responses
+
+
+def assignment_ids(data, app_protection=False) -> list:
+    """
+    Get the IDs used to request the assignments of the objects.
+
+    :param data: List of objects
+    :param app_protection: By default False, set to true when getting assignments for APP to get the platform
+    :return: List of IDs
+    """
+
+    data_ids = []
+
     # If getting App Protection Assignments, get the platform
     if app_protection is True:
         for id in data['value']:
@@ -89,43 +185,61 @@ def batch_assignment(data, url, extra_url, token, app_protection=False) -> list:
     else:
         for id in data['value']:
             data_ids.append(id['id'])
-    # If we have any IDs, batch request the assignments
-    if data_ids:
-        responses = batch_request(data_ids, url, extra_url, token)
-        if responses:
-            group_ids = [val for list in responses for val in list['value']
-                         for keys, val in val.items() if 'target' in keys
-                         for keys, val in val.items() if 'groupId' in keys]
-            filter_ids = [val for list in responses for val in list['value']
-                          for keys, val in val.items() if 'target' in keys
-                          for keys, val in val.items() if 'deviceAndAppManagementAssignmentFilterId' in keys if
-                          val is not None]
 
-        # Batch get name of the groups
-        if group_ids:
-            group_responses = batch_request(
-                group_ids, 'groups/', '?$select=displayName,id', token)
-            for value in responses:
-                if value['value']:
-                    for val in value['value']:
-                        if 'groupId' in val['target']:
-                            for id in group_responses:
-                                if id['id'] == val['target']['groupId']:
-                                    val['target']['groupName'] = id['displayName']
+    return data_ids
 
-        # Batch get name of the Filters
-        if filter_ids:
-            filter_responses = batch_request(
-                filter_ids, 'deviceManagement/assignmentFilters/', '?$select=displayName', token)
-            for value in responses:
-                if value['value']:
-                    for val in value['value']:
-                        if 'deviceAndAppManagementAssignmentFilterId' in val['target']:
-                            for id in filter_responses:
-                                if id['id'] == val['target']['deviceAndAppManagementAssignmentFilterId']:
-                                    val['target']['deviceAndAppManagementAssignmentFilterId'] = id['displayName']
 
-        return responses
+def assignment_targets(responses) -> tuple:
+    """
+    Get the group and filter IDs the objects are assigned to.
+
+    :param responses: List of assignment responses from the batch request
+    :return: List of group IDs and list of filter IDs
+    """
+
+    group_ids = [val for list in responses for val in list['value']
+                 for keys, val in val.items() if 'target' in keys
+                 for keys, val in val.items() if 'groupId' in keys]
+    filter_ids = [val for list in responses for val in list['value']
+                  for keys, val in val.items() if 'target' in keys
+                  for keys, val in val.items() if 'deviceAndAppManagementAssignmentFilterId' in keys if
+                  val is not None]
+
+    return group_ids, filter_ids
+
+
+def add_group_names(responses, group_responses):
+    """
+    Add the name of the group to each assignment.
+
+    :param responses: List of assignment responses from the batch request
+    :param group_responses: List of groups from the batch request
+    """
+
+    for value in responses:
+        if value['value']:
+            for val in value['value']:
+                if 'groupId' in val['target']:
+                    for id in group_responses:
+                        if id['id'] == val['target']['groupId']:
+                            val['target']['groupName'] = id['displayName']
+
+
+def add_filter_names(responses, filter_responses):
+    """
+    Replace the filter ID of each assignment with the name of the filter.
+
+    :param responses: List of assignment responses from the batch request
+    :param filter_responses: List of filters from the batch request
+    """
+
+    for value in responses:
+        if value['value']:
+            for val in value['value']:
+                if 'deviceAndAppManagementAssignmentFilterId' in val['target']:
+                    for id in filter_responses:
+                        if id['id'] == val['target']['deviceAndAppManagementAssignmentFilterId']:
+                            val['target']['deviceAndAppManagementAssignmentFilterId'] = id['displayName']
 
 
 def batch_intents(data, token) -> dict:
@@ -7,6 +7,164 @@ This module contains the functions to make API requests to the Microsoft Graph A
 import json
 import time
 import requests
+import threading
+
+from requests.adapters import HTTPAdapter
+from .rate_limit import wait_for_rate_limit, update_rate_limit, retry_after, MAX_THROTTLE_RETRIES
+from .metrics import record_request, record_retry
+from .cassette import replaying, replay_request, record_exchange
+from .response_cache import get_cached, cached_response, conditional_headers, store_response, is_immutable
+from .delta import delta_supported, delta_url, delta_failed, merge_delta
+
+GRAPH_URL = "https://graph.microsoft.com"
+
+# Requests to GRAPH_URL are sent to this URL instead when it is set, such as a local Graph stand-in
+graph = {'url': None}
+
+# Connections kept open to each host, the default of requests
+DEFAULT_POOL_SIZE = 10
+
+# Session shared by all requests to Graph, from every thread and tenant, so connections are reused
+session = requests.Session()
+session_pool = {'size': 0}
+session_lock = threading.Lock()
+
+
+def set_graph_url(url):
+    """
+    This function sets the URL requests to the Microsoft Graph API are sent to.
+
+    :param url: The URL to send requests to, None to send them to Microsoft Graph.
+    """
+
+    graph['url'] = url.rstrip('/') if url else None
+
+
+def graph_url(endpoint):
+    """
+    This function gets the URL to send a request for an endpoint to.
+
+    :param endpoint: The endpoint of the request.
+    :return: The URL to send the request to.
+    """
+
+    if graph['url'] is not None and endpoint.startswith(GRAPH_URL):
+        return graph['url'] + endpoint[len(GRAPH_URL):]
+    return endpoint
+
+
+def size_session_pool(size):
+    """
+    This function makes sure the shared session keeps at least the given number of connections open to each host,
+    so requests sent at the same time from several threads reuse their connections.
+
+    :param size: The number of requests sent at the same time
+    """
+
+    with session_lock:
+        if size <= session_pool['size']:
+            return
+        adapter = HTTPAdapter(pool_maxsize=size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session_pool['size'] = size
+
+
+size_session_pool(DEFAULT_POOL_SIZE)
+
+
+def get_headers(token):
+    """
+    This function creates the headers for a request to the Microsoft Graph API.
+
+    :param token: The token to use for authenticating the request.
+    :return: The request headers.
+    """
+
+    return {'Content-Type': 'application/json',
+            'Authorization': 'Bearer {0}'.format(token['accessToken'])}
+
+
+def method_name(method):
+    """
+    This function gets the HTTP method of a requests function.
+
+    :param method: The session method.
+    :return: The HTTP method.
+    """
+
+    names = {session.get: 'GET', session.post: 'POST', session.patch: 'PATCH', session.put: 'PUT',
+             session.delete: 'DELETE'}
+    if isinstance(getattr(method, '__self__', None), requests.Session):
+        return method.__name__.upper()
+    return names.get(method, 'REQUEST')
+
+
+def timed_request(method, endpoint, token, **kwargs):
+    """
+    This function sends a request and records it in the run metrics and the cassette. When a cassette is replayed,
+    the recorded response is returned instead. When a response cache is open, cached responses are requested
+    conditionally, and resources that do not change are returned from the cache without sending a request.
+
+    :param method: The session method to send the request with.
+    :param endpoint: The endpoint to make the request to.
+    :param token: The token to use for authenticating the request.
+    :return: The response from the request.
+    """
+
+    name = method_name(method)
+    cached = None
+    if replaying():
+        start = time.perf_counter()
+        response = replay_request(name, endpoint, kwargs)
+    else:
+        cached = get_cached(name, endpoint, kwargs)
+        if cached is not None and is_immutable(endpoint):
+            return cached_response(cached)
+        headers = get_headers(token)
+        if cached is not None:
+            headers.update(conditional_headers(cached))
+        wait_for_rate_limit()
+        start = time.perf_counter()
+        response = method(graph_url(endpoint), headers=headers, **kwargs)
+        update_rate_limit(response.status_code, response.headers)
+    seconds = time.perf_counter() - start
+    record_exchange(name, endpoint, kwargs, response, seconds)
+
+    data = kwargs.get('data')
+    record_request(name, endpoint, response.status_code, seconds,
+                   bytes_sent=len(data) if isinstance(data, (str, bytes)) else 0,
+                   bytes_received=len(response.content) if isinstance(response.content, bytes) else 0)
+
+    return store_response(name, endpoint, kwargs, response, cached)
+
+
+def send_request(method, endpoint, token, **kwargs):
+    """
+    This function sends a request. If the access token is rejected, a new token is acquired and the request is
+    sent again. Throttled requests are sent again once the rate limiter allows it.
+
+    :param method: The session method to send the request with.
+    :param endpoint: The endpoint to make the request to.
+    :param token: The token to use for authenticating the request.
+    :return: The response from the request.
+    """
+
+    response = timed_request(method, endpoint, token, **kwargs)
+    if response.status_code == 401 and hasattr(token, 'invalidate'):
+        print('Access token was rejected, authenticating again...')
+        token.invalidate()
+        record_retry(method_name(method), endpoint)
+        response = timed_request(method, endpoint, token, **kwargs)
+
+    retries = 0
+    while response.status_code == 429 and retries < MAX_THROTTLE_RETRIES:
+        print(f'Request was throttled by Graph, trying again in {retry_after(response.headers):g} seconds...')
+        record_retry(method_name(method), endpoint)
+        retries += 1
+        response = timed_request(method, endpoint, token, **kwargs)
+
+    return response
 
 
 def makeapirequest(endpoint, token, q_param=None):
@@ -19,21 +177,25 @@ def makeapirequest(endpoint, token, q_param=None):
     :return: The response from the request.
     """
 
-    headers = {'Content-Type': 'application/json',
-               'Authorization': 'Bearer {0}'.format(token['accessToken'])}
+    if q_param is None and delta_supported(endpoint):
+        json_data = makeapirequest_delta(endpoint, token)
+        if json_data is not None:
+            return json_data
 
     if q_param is not None:
-        response = requests.get(endpoint, headers=headers, params=q_param)
+        response = send_request(session.get, endpoint, token, params=q_param)
         if response.status_code == 504 or response.status_code == 502 or response.status_code == 503:
             print('Ran into issues with Graph request, waiting 10 seconds and trying again...')
+            record_retry('GET', endpoint)
             time.sleep(10)
-            response = requests.get(endpoint, headers=headers)
+            response = send_request(session.get, endpoint, token)
     else:
-        response = requests.get(endpoint, headers=headers)
+        response = send_request(session.get, endpoint, token)
         if response.status_code == 504 or response.status_code == 502 or response.status_code == 503:
             print('Ran into issues with Graph request, waiting 10 seconds and trying again...')
+            record_retry('GET', endpoint)
             time.sleep(10)
-            response = requests.get(endpoint, headers=headers)
+            response = send_request(session.get, endpoint, token)
     if response.status_code == 200:
         json_data = json.loads(response.text)
 
@@ -56,6 +218,63 @@ def makeapirequest(endpoint, token, q_param=None):
                         response.text)
 
 
+def makeapirequest_delta(endpoint, token):
+    """
+    This function lists a collection with delta requests to the Microsoft Graph API. Only the objects that changed
+    since the last run are requested, and applied to the objects saved then.
+
+    :param endpoint: The endpoint of the collection.
+    :param token: The token to use for authenticating the request.
+    :return: The collection, or None if it could not be listed with delta.
+    """
+
+    url = delta_url(endpoint)
+    values = []
+    while url:
+        response = send_request(session.get, url, token)
+        if response.status_code != 200:
+            if delta_failed(endpoint, response.status_code):
+                return makeapirequest_delta(endpoint, token)
+            return None
+        json_data = json.loads(response.text)
+        values.extend(json_data.get('value', []))
+        url = json_data.get('@odata.nextLink')
+
+    return merge_delta(endpoint, values, json_data)
+
+
+def makeapirequest_pages(endpoint, token, q_param=None):
+    """
+    This function makes GET requests to the Microsoft Graph API and yields one page of results at a time.
+    Unlike makeapirequest, pages are not collected so memory usage stays the same regardless of collection size.
+
+    :param endpoint: The endpoint to make the request to.
+    :param token: The token to use for authenticating the request.
+    :param q_param: The query parameters to use for the first request.
+    :return: A generator yielding the list of values in each page.
+    """
+
+    while endpoint:
+        response = send_request(session.get, endpoint, token, params=q_param)
+        if response.status_code == 504 or response.status_code == 502 or response.status_code == 503:
+            print('Ran into issues with Graph request, waiting 10 seconds and trying again...')
+            record_retry('GET', endpoint)
+            time.sleep(10)
+            response = send_request(session.get, endpoint, token, params=q_param)
+        if response.status_code == 200:
+            json_data = json.loads(response.text)
+            yield json_data.get('value', [])
+            # The nextLink already contains the query parameters
+            endpoint = json_data.get('@odata.nextLink')
+            q_param = None
+        elif response.status_code == 404:
+            print("Resource not found in Microsoft Graph: " + endpoint)
+            return
+        else:
+            raise Exception('Request failed with ', response.status_code, ' - ',
+                            response.text)
+
+
 def makeapirequestPatch(patchEndpoint, token, q_param=None, jdata=None, status_code=200):
     """
     This function makes a PATCH request to the Microsoft Graph API.
@@ -67,13 +286,10 @@ def makeapirequestPatch(patchEndpoint, token, q_param=None, jdata=None, status_c
     :param status_code: The status code to expect from the request.
     """
 
-    headers = {'Content-Type': 'application/json',
-               'Authorization': 'Bearer {0}'.format(token['accessToken'])}
-
     if q_param is not None:
-        response = requests.patch(patchEndpoint, headers=headers, params=q_param, data=jdata)
+        response = send_request(session.patch, patchEndpoint, token, params=q_param, data=jdata)
     else:
-        response = requests.patch(patchEndpoint, headers=headers, data=jdata)
+        response = send_request(session.patch, patchEndpoint, token, data=jdata)
     if response.status_code == status_code:
         pass
     else:
@@ -92,13 +308,10 @@ def makeapirequestPost(patchEndpoint, token, q_param=None, jdata=None, status_co
     :param status_code: The status code to expect from the request.
     """
 
-    headers = {'Content-Type': 'application/json',
-               'Authorization': 'Bearer {0}'.format(token['accessToken'])}
-
     if q_param is not None:
-        response = requests.post(patchEndpoint, headers=headers, params=q_param, data=jdata)
+        response = send_request(session.post, patchEndpoint, token, params=q_param, data=jdata)
     else:
-        response = requests.post(patchEndpoint, headers=headers, data=jdata)
+        response = send_request(session.post, patchEndpoint, token, data=jdata)
     if response.status_code == status_code:
         if response.text:
             json_data = json.loads(response.text)
@@ -121,13 +334,10 @@ def makeapirequestPut(patchEndpoint, token, q_param=None, jdata=None, status_cod
     :param status_code: The status code to expect from the request.
     """
 
-    headers = {'Content-Type': 'application/json',
-               'Authorization': 'Bearer {0}'.format(token['accessToken'])}
-
     if q_param is not None:
-        response = requests.put(patchEndpoint, headers=headers, params=q_param, data=jdata)
+        response = send_request(session.put, patchEndpoint, token, params=q_param, data=jdata)
     else:
-        response = requests.put(patchEndpoint, headers=headers, data=jdata)
+        response = send_request(session.put, patchEndpoint, token, data=jdata)
     if response.status_code == status_code:
         pass
     else:
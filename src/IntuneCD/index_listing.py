@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to list objects with only the fields needed to match them with the backup. Update modules that
+request the details of matched objects anyway use these index listings instead of listing full objects.
+
+The bytes saved are estimated from the size of the details of the matched objects.
+"""
+
+import json
+import threading
+
+# Fields listed to match objects with the backup, @odata.type is always returned
+INDEX_FIELDS = ('id', 'lastModifiedDateTime')
+
+# Objects and bytes of index listings and details for each listed endpoint, since the last summary
+index_stats = {}
+lock = threading.Lock()
+
+
+def index_param(*match_fields):
+    """
+    This function creates the query parameters of an index listing.
+
+    :param match_fields: The fields the objects are matched on, displayName if not set
+    :return: Dict of query parameters
+    """
+
+    return {'$select': ','.join(INDEX_FIELDS + (match_fields or ('displayName',)))}
+
+
+def _stats(endpoint):
+    return index_stats.setdefault(endpoint.rstrip('/'), {'objects': 0, 'index_bytes': 0, 'details': 0,
+                                                         'detail_bytes': 0})
+
+
+def record_index(endpoint, data):
+    """
+    This function records the size of an index listing.
+
+    :param endpoint: The endpoint of the listed collection
+    :param data: The index listing
+    """
+
+    size = len(json.dumps(data))
+    with lock:
+        stats = _stats(endpoint)
+        stats['objects'] += len(data.get('value', []))
+        stats['index_bytes'] += size
+
+
+def record_details(endpoint, data):
+    """
+    This function records the size of the details of a matched object.
+
+    :param endpoint: The endpoint of the listed collection
+    :param data: The details of the object
+    """
+
+    size = len(json.dumps(data))
+    with lock:
+        stats = _stats(endpoint)
+        stats['details'] += 1
+        stats['detail_bytes'] += size
+
+
+def index_report():
+    """
+    This function estimates the bytes saved by index listings. Listing full objects is estimated to take the
+    average size of the details of the matched objects for each object listed.
+
+    :return: Dict of endpoint and objects, bytes listed and estimated bytes saved
+    """
+
+    report = {}
+    with lock:
+        for endpoint, stats in index_stats.items():
+            full_bytes = stats['detail_bytes'] / stats['details'] * stats['objects'] if stats['details'] else 0
+            report[endpoint] = {
+                'objects': stats['objects'],
+                'index_bytes': stats['index_bytes'],
+                'saved_bytes': max(0, round(full_bytes) - stats['index_bytes'])
+            }
+
+    return report
+
+
+def finish_index_listing():
+    """
+    This function prints the bytes saved by index listings and starts counting again.
+    """
+
+    report = index_report()
+    if report:
+        print(f"Index listings: {sum(stats['objects'] for stats in report.values())} objects listed in "
+              f"{sum(stats['index_bytes'] for stats in report.values())} bytes, about "
+              f"{sum(stats['saved_bytes'] for stats in report.values())} bytes saved")
+    with lock:
+        index_stats.clear()
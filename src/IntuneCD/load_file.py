@@ -5,7 +5,6 @@ This module is used to load a file into a dictionary.
 """
 
 import json
-import yaml
 
 
 def load_file(filename, file):
@@ -17,6 +16,9 @@ def load_file(filename, file):
     """
 
     if filename.endswith(".yaml"):
+        # Imported for the first YAML file, backups saved as JSON do not need it
+        import yaml
+
         data = json.dumps(yaml.safe_load(file))
         repo_data = json.loads(data)
 
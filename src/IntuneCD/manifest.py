@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to create a manifest of all objects written during a backup.
+"""
+
+import os
+import json
+import time
+import hashlib
+
+from contextlib import contextmanager
+from .archive_output import write_to_archive
+from .thread_state import ThreadState
+from .snapshot import category_done
+from .metrics import timed_category
+
+MANIFEST_NAME = "IntuneCD-manifest.json"
+
+# The manifest of the backup running in this thread, set by start_manifest
+manifest = ThreadState(root=None, category=None, objects=[], categories={})
+
+
+def start_manifest(path):
+    """
+    This function starts recording a manifest for a backup.
+
+    :param path: The path the backup is saved to
+    """
+
+    manifest['root'] = path
+    manifest['category'] = None
+    manifest['objects'] = []
+    manifest['categories'] = {}
+
+
+@contextmanager
+def manifest_category(name):
+    """
+    This function records objects saved in the block under a category, and the time the category took.
+    The time is also recorded in the run metrics.
+    When the block is done, the category is marked as done in the in-memory snapshot.
+    Fetch time is the wall time of the category minus the time spent saving its objects.
+
+    :param name: Name of the category
+    :return: The count of the category, configurations backed up are added to it
+    """
+
+    with timed_category("backup", name) as count:
+        if manifest['root'] is None:
+            yield count
+        else:
+            manifest['category'] = name
+            start = time.perf_counter()
+            try:
+                yield count
+            finally:
+                elapsed = time.perf_counter() - start
+                serialize = sum(obj['serialize_seconds'] for obj in manifest['objects'] if obj['category'] == name)
+                manifest['categories'][name] = {
+                    'wall_seconds': round(elapsed, 6),
+                    'fetch_seconds': round(max(elapsed - serialize, 0), 6),
+                    'serialize_seconds': round(serialize, 6)
+                }
+                manifest['category'] = None
+
+    # Update of the category can start when it is backed up to an in-memory snapshot
+    category_done(name)
+
+
+def record_object(configpath, filename, content, graph_id=None, serialize_seconds=0, sha256=None, size=None):
+    """
+    This function records a saved object in the manifest, if a manifest has been started.
+
+    :param configpath: The path the object was saved to
+    :param filename: The filename of the object
+    :param content: The saved content as str or bytes, or None if the content was streamed to the file
+    :param graph_id: The id of the object in Microsoft Graph
+    :param serialize_seconds: The time it took to serialize and save the object
+    :param sha256: The SHA-256 hex digest of streamed content
+    :param size: The size in bytes of streamed content
+    """
+
+    if manifest['root'] is None:
+        return
+
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    if content is not None:
+        sha256 = hashlib.sha256(content).hexdigest()
+        size = len(content)
+
+    relpath = os.path.relpath(os.path.join(configpath, filename), manifest['root'])
+    manifest['objects'].append({
+        'category': manifest['category'],
+        'id': graph_id,
+        'path': relpath.replace(os.sep, '/'),
+        'sha256': sha256,
+        'size': size,
+        'serialize_seconds': round(serialize_seconds, 6)
+    })
+
+
+def load_manifest(path):
+    """
+    This function loads the manifest of a backup.
+
+    :param path: The path the backup is saved to
+    :return: The manifest as a dict, or None if there is no manifest
+    """
+
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def diff_manifest(previous, current):
+    """
+    This function compares two manifests.
+
+    :param previous: The previous manifest
+    :param current: The current manifest
+    :return: Dict with lists of added, changed and removed paths
+    """
+
+    old = {obj['path']: obj['sha256'] for obj in previous['objects']} if previous else {}
+    new = {obj['path']: obj['sha256'] for obj in current['objects']}
+
+    return {
+        'added': sorted(path for path in new if path not in old),
+        'changed': sorted(path for path in new if path in old and old[path] != new[path]),
+        'removed': sorted(path for path in old if path not in new)
+    }
+
+
+def finish_manifest(output, config_count):
+    """
+    This function writes the manifest to the backup and stops recording.
+
+    :param output: The format the backup is saved as
+    :param config_count: The number of configurations backed up
+    :return: The manifest as a dict
+    """
+
+    root = manifest['root']
+    data = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        'config_count': config_count,
+        'categories': manifest['categories'],
+        'objects': sorted(manifest['objects'], key=lambda obj: obj['path'])
+    }
+
+    previous = load_manifest(root) if output != 'archive' else None
+    data['changes'] = diff_manifest(previous, data)
+
+    manifest['root'] = None
+    if output == 'archive':
+        write_to_archive(root, MANIFEST_NAME, json.dumps(data, indent=2))
+    else:
+        with open(os.path.join(root, MANIFEST_NAME), 'w') as f:
+            json.dump(data, f, indent=2)
+
+    return data
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+"""
+This module contains a Markdown writer that builds the table of contents while the document is written.
+The output is the same as running markdown_toclify with back_to_top=True on the finished document.
+"""
+
+import shutil
+import tempfile
+
+from markdown_toclify import dashify_headline
+
+BACK_TO_TOP = '[[back to top](#table-of-contents)]'
+REMOVE_LINES = ('[[back to top]', '<a class="mk-toclify"')
+
+
+class MarkdownWriter:
+    """
+    Streaming Markdown writer.
+
+    Text written is split into lines, headlines are tagged and collected for the table of contents and the body is
+    spooled to a temporary file. finish writes the header, table of contents and body to the output in one pass.
+    """
+
+    def __init__(self, outpath, exclude_h=None):
+        """
+        :param outpath: The path to save the Markdown document to
+        :param exclude_h: Headline levels to exclude from the table of contents
+        """
+
+        self.outpath = outpath
+        self.exclude_h = exclude_h or []
+        self.headlines = []
+        self.body = tempfile.TemporaryFile(mode='w+')
+        self.partial = ''
+        # The body is stripped like markdown_toclify does, so the last line and any blank lines
+        # after it are held back until more content is written
+        self.held = None
+        self.blank = 0
+
+    def write(self, text):
+        """
+        This function writes text to the document.
+
+        :param text: The text to write
+        """
+
+        lines = (self.partial + text).split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self._add_line(line)
+
+    def _add_line(self, line):
+        if line.startswith(REMOVE_LINES):
+            return
+
+        orig_len = len(line)
+        line = line.lstrip()
+        saw_headline = False
+
+        if line.startswith('#'):
+            # Lines starting with '#' that are not valid headlines are dropped, same as markdown_toclify
+            if not line.lstrip('#').startswith(' '):
+                return
+            if len(line) - len(line.lstrip('#')) > 6:
+                return
+            if orig_len - len(line) > 3:
+                return
+            if not set(line) - {'#', ' '}:
+                return
+
+            saw_headline = True
+            dashified = dashify_headline(line)
+
+            if dashified[-1] not in self.exclude_h:
+                self._emit('<a class="mk-toclify" id="%s"></a>' % (dashified[1]))
+                self.headlines.append(dashified)
+
+        self._emit(line)
+        if saw_headline:
+            self._emit(BACK_TO_TOP)
+
+    def _emit(self, line):
+        if not line:
+            # Leading blank lines are stripped
+            if self.held is not None:
+                self.blank += 1
+            return
+
+        if self.held is not None:
+            self.body.write(self.held + '\n' * (1 + self.blank))
+        self.held = line
+        self.blank = 0
+
+    def toc(self):
+        """
+        This function creates the table of contents from the collected headlines.
+
+        :return: The table of contents as a string
+        """
+
+        # If there are no level 1 headlines, move all headlines up one level
+        shift = 0 if any(headline[-1] == 1 for headline in self.headlines) else 1
+        lines = ['<a class="mk-toclify" id="table-of-contents"></a>\n', '# Table of Contents']
+        for headline in self.headlines:
+            lines.append('%s- [%s](#%s)' % ((headline[2] - shift - 1) * '    ', headline[0], headline[1]))
+        lines.append('\n')
+
+        return '\n'.join(lines)
+
+    def finish(self, header_lines):
+        """
+        This function writes the document to the output path.
+
+        :param header_lines: Lines to write at the top of the document, before the table of contents
+        """
+
+        self._add_line(self.partial)
+        self.partial = ''
+        if self.held is not None:
+            self.body.write(self.held.rstrip())
+            self.held = None
+
+        self.body.seek(0)
+        with open(self.outpath, 'w') as doc:
+            doc.writelines(header_lines)
+            doc.write(self.toc())
+            shutil.copyfileobj(self.body, doc)
+        self.body.close()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to record the requests sent to Microsoft Graph and the time spent on each category during a
+run, and to report them when the run is done.
+"""
+
+import re
+import json
+import time
+import threading
+
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from .thread_state import ThreadState
+from .progress import category_progress
+
+# Upper bounds in seconds of the latency histogram buckets, requests slower than the last bound are counted in "+Inf"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Requests in a batch are counted under this name, the batch request itself under POST /beta/$batch
+BATCH_ENDPOINT = 'BATCH requests'
+
+ID_PATTERN = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}(_.+)?$")
+
+# The metrics of the run, set by start_metrics. Shared by all threads of the run
+metrics = {'started': None, 'endpoints': {}, 'categories': {}}
+lock = threading.Lock()
+
+# The category running in this thread, requests are counted under it
+current = ThreadState(category=None)
+
+
+def start_metrics():
+    """
+    This function starts recording metrics for the run.
+    """
+
+    with lock:
+        metrics['started'] = time.perf_counter()
+        metrics['endpoints'] = {}
+        metrics['categories'] = {}
+
+
+def endpoint_name(method, url):
+    """
+    This function gets the name an endpoint is reported under. Object ids are replaced with {id} and the query is
+    removed, so requests for different objects of the same type are counted together.
+
+    :param method: The HTTP method
+    :param url: The URL of the request
+    :return: The method and path of the endpoint
+    """
+
+    parts = urlsplit(url).path.split('/')
+    return method + ' ' + '/'.join('{id}' if ID_PATTERN.match(part) else part for part in parts)
+
+
+def _new_endpoint():
+    return {
+        'requests': 0,
+        'statuses': {},
+        'retries': 0,
+        'throttled': 0,
+        'bytes_sent': 0,
+        'bytes_received': 0,
+        'seconds': 0.0,
+        'max_seconds': 0.0,
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1)
+    }
+
+
+def _new_category():
+    return {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'requests': 0, 'request_seconds': 0.0}
+
+
+def record_request(method, url, status_code, seconds, bytes_sent=0, bytes_received=0):
+    """
+    This function records a request sent to Microsoft Graph, if metrics are being recorded.
+
+    :param method: The HTTP method
+    :param url: The URL of the request
+    :param status_code: The status code of the response
+    :param seconds: The time the request took
+    :param bytes_sent: The size of the request body
+    :param bytes_received: The size of the response body
+    """
+
+    if metrics['started'] is None:
+        return
+
+    name = endpoint_name(method, url)
+    bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+    category = current['category']
+
+    with lock:
+        endpoint = metrics['endpoints'].setdefault(name, _new_endpoint())
+        endpoint['requests'] += 1
+        endpoint['statuses'][str(status_code)] = endpoint['statuses'].get(str(status_code), 0) + 1
+        if status_code == 429:
+            endpoint['throttled'] += 1
+        endpoint['bytes_sent'] += bytes_sent
+        endpoint['bytes_received'] += bytes_received
+        endpoint['seconds'] += seconds
+        endpoint['max_seconds'] = max(endpoint['max_seconds'], seconds)
+        endpoint['latency_buckets'][bucket] += 1
+
+        if category is not None:
+            stats = metrics['categories'].setdefault(category, _new_category())
+            stats['requests'] += 1
+            stats['request_seconds'] += seconds
+
+
+def record_retry(method, url):
+    """
+    This function records that a request is sent again, if metrics are being recorded.
+
+    :param method: The HTTP method
+    :param url: The URL of the request
+    """
+
+    if metrics['started'] is None:
+        return
+
+    with lock:
+        metrics['endpoints'].setdefault(endpoint_name(method, url), _new_endpoint())['retries'] += 1
+
+
+def record_batch(responses):
+    """
+    This function records the status of each request in a batch, if metrics are being recorded.
+    Requests in a batch are sent by Graph, so only the status is known.
+
+    :param responses: The responses of the batch request
+    """
+
+    if metrics['started'] is None:
+        return
+
+    with lock:
+        endpoint = metrics['endpoints'].setdefault(BATCH_ENDPOINT, _new_endpoint())
+        for response in responses:
+            status = str(response.get('status'))
+            endpoint['requests'] += 1
+            endpoint['statuses'][status] = endpoint['statuses'].get(status, 0) + 1
+            if status == '429':
+                endpoint['throttled'] += 1
+
+
+@contextmanager
+def timed_category(phase, name):
+    """
+    This function records the wall time and CPU time of the block and the requests sent in it under a category.
+    CPU time is counted for the current thread only. Progress events are sent when the category starts and is done.
+
+    :param phase: backup or update
+    :param name: Name of the category
+    :return: The count of the category, configurations backed up or updated are added to it
+    """
+
+    category = phase + ': ' + name
+    previous = current['category']
+    current['category'] = category
+    start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        with category_progress(phase, name) as count:
+            yield count
+    finally:
+        current['category'] = previous
+        if metrics['started'] is not None:
+            with lock:
+                stats = metrics['categories'].setdefault(category, _new_category())
+                stats['wall_seconds'] += time.perf_counter() - start
+                stats['cpu_seconds'] += time.thread_time() - cpu_start
+
+
+def metrics_report():
+    """
+    This function creates the report of the recorded metrics.
+
+    :return: The report as a dict
+    """
+
+    with lock:
+        endpoints = {}
+        for name, endpoint in sorted(metrics['endpoints'].items()):
+            report = dict(endpoint)
+            report['statuses'] = dict(sorted(endpoint['statuses'].items()))
+            report['seconds'] = round(endpoint['seconds'], 6)
+            report['max_seconds'] = round(endpoint['max_seconds'], 6)
+            requests = endpoint['requests']
+            report['mean_seconds'] = round(endpoint['seconds'] / requests, 6) if requests else 0
+            report['latency_buckets'] = dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'],
+                                                 endpoint['latency_buckets']))
+            endpoints[name] = report
+
+        categories = {
+            name: {key: round(value, 6) if isinstance(value, float) else value for key, value in stats.items()}
+            for name, stats in metrics['categories'].items()
+        }
+
+        wall_seconds = time.perf_counter() - metrics['started'] if metrics['started'] is not None else 0
+
+    return {
+        'wall_seconds': round(wall_seconds, 6),
+        'requests': sum(endpoint['requests'] for name, endpoint in endpoints.items() if name != BATCH_ENDPOINT),
+        'retries': sum(endpoint['retries'] for endpoint in endpoints.values()),
+        'throttled': sum(endpoint['throttled'] for endpoint in endpoints.values()),
+        'bytes_sent': sum(endpoint['bytes_sent'] for endpoint in endpoints.values()),
+        'bytes_received': sum(endpoint['bytes_received'] for endpoint in endpoints.values()),
+        'categories': categories,
+        'endpoints': endpoints
+    }
+
+
+def metrics_summary(report, top=10):
+    """
+    This function creates a summary of the report to print.
+
+    :param report: The report created by metrics_report
+    :param top: The number of categories and endpoints to list
+    :return: The summary as a string
+    """
+
+    lines = [
+        '-' * 90,
+        f"Run took {report['wall_seconds']:.1f}s: {report['requests']} requests, {report['retries']} retries, "
+        f"{report['throttled']} throttled, {report['bytes_sent']} bytes sent, "
+        f"{report['bytes_received']} bytes received",
+        "Slowest categories:"
+    ]
+    categories = sorted(report['categories'].items(), key=lambda item: item[1]['wall_seconds'], reverse=True)
+    for name, stats in categories[:top]:
+        lines.append(f"  {name}: {stats['wall_seconds']:.2f}s, {stats['cpu_seconds']:.2f}s CPU, "
+                     f"{stats['requests']} requests")
+
+    lines.append("Endpoints with the most time spent:")
+    endpoints = sorted(report['endpoints'].items(), key=lambda item: item[1]['seconds'], reverse=True)
+    for name, endpoint in endpoints[:top]:
+        lines.append(f"  {name}: {endpoint['requests']} requests, {endpoint['seconds']:.2f}s, "
+                     f"mean {endpoint['mean_seconds'] * 1000:.0f}ms, max {endpoint['max_seconds'] * 1000:.0f}ms")
+    lines.append('-' * 90)
+
+    return '\n'.join(lines)
+
+
+def finish_metrics(report_path):
+    """
+    This function saves the report as JSON, prints the summary and stops recording metrics.
+
+    :param report_path: The path to save the report to
+    :return: The report as a dict
+    """
+
+    report = metrics_report()
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(metrics_summary(report))
+    print(f"Run report saved to {report_path}")
+    metrics['started'] = None
+
+    return report
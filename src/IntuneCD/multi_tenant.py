@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to back up several tenants at the same time in one process.
+"""
+
+import io
+import os
+import sys
+import json
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from .get_authparams import getTenantAuth
+from .rate_limit import set_rate_limit
+
+
+class TenantOutput:
+    """
+    Replaces sys.stdout while tenants are backed up. Output of each tenant thread is kept apart and
+    printed in one block when the tenant is done, other output is written to the original stdout.
+    """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def start(self):
+        """
+        This function starts capturing the output of the current thread.
+        """
+
+        self.local.buffer = io.StringIO()
+
+    def finish(self, name):
+        """
+        This function stops capturing the output of the current thread and prints it.
+
+        :param name: Name of the tenant to print before the output
+        """
+
+        output = self.local.buffer.getvalue()
+        self.local.buffer = None
+        with self.lock:
+            self.stdout.write(f"{'=' * 30} {name} {'=' * 30}\n{output}")
+            self.stdout.flush()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is not None:
+            return buffer.write(text)
+        with self.lock:
+            return self.stdout.write(text)
+
+    def flush(self):
+        self.stdout.flush()
+
+
+def load_tenants(path, backup_path):
+    """
+    This function loads the list of tenants to back up.
+
+    Each tenant has params in the same format as the --localauth file in standalone mode, and optionally a
+    name, the path to save the backup to and the maximum number of requests per second:
+    [{"name": "contoso", "params": {"TENANT_NAME": "", "CLIENT_ID": "", "CLIENT_SECRET": ""},
+      "path": "", "ratelimit": 10}]
+
+    :param path: Path to the JSON file with the list of tenants
+    :param backup_path: The path backups are saved to, tenants without a path are saved to a folder per tenant
+    :return: List of tenants
+    """
+
+    with open(path) as f:
+        tenants = json.load(f)
+
+    names = set()
+    for tenant in tenants:
+        if 'params' not in tenant:
+            raise Exception("Tenant is missing params: " + json.dumps(tenant.get('name')))
+        tenant.setdefault('name', tenant['params'].get('TENANT_NAME'))
+        tenant.setdefault('path', os.path.join(backup_path, tenant['name']))
+        if tenant['name'] in names:
+            raise Exception("Tenant listed more than once: " + tenant['name'])
+        names.add(tenant['name'])
+
+    return tenants
+
+
+def run_tenants(tenants, backup, workers=4, connections=1):
+    """
+    This function backs up tenants in threads, each with its own token, rate limit and backup path. The tenants
+    share the connections to Graph.
+
+    :param tenants: List of tenants from load_tenants
+    :param backup: Function taking the backup path and token of a tenant, returning the number of configurations
+    :param workers: The number of tenants to back up at the same time
+    :param connections: The number of requests each tenant sends at the same time
+    :return: Dict of tenant name and the number of configurations backed up
+    """
+
+    # Imported here so the command does not import requests when it starts
+    from .graph_request import size_session_pool
+
+    size_session_pool(workers * connections)
+    output = TenantOutput(sys.stdout)
+
+    def run_tenant(tenant):
+        output.start()
+        try:
+            set_rate_limit(tenant.get('ratelimit'))
+            token = getTenantAuth(tenant['params'])
+            count = backup(tenant['path'], token)
+            print(f"Backed up {count} configurations to {tenant['path']}")
+            return count
+        except Exception as e:
+            print(f"Backup failed: {e}")
+            raise
+        finally:
+            set_rate_limit(None)
+            output.finish(tenant['name'])
+
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [(tenant['name'], executor.submit(run_tenant, tenant)) for tenant in tenants]
+            results = {}
+            failed = []
+            for name, future in futures:
+                try:
+                    results[name] = future.result()
+                except Exception:
+                    failed.append(name)
+    finally:
+        sys.stdout = output.stdout
+
+    if failed:
+        raise Exception("Backup failed for tenants: " + ", ".join(failed))
+
+    return results
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to report the progress of a run, with an event when each category starts and when it is done.
+"""
+
+import time
+
+from contextlib import contextmanager
+
+# The function progress events are sent to, set by set_progress_listener. Shared by all threads of the run
+progress = {'listener': None}
+
+
+class CategoryCount:
+    """
+    Number of configurations backed up or updated in a category, sent with the event when the category is done.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, count):
+        """
+        This function adds to the count of the category.
+
+        :param count: The number of configurations to add
+        :return: The number added, so the count of the run can be added to in the same statement
+        """
+
+        self.count += count
+        return count
+
+
+def set_progress_listener(listener):
+    """
+    This function sets the function progress events are sent to, or stops sending them.
+
+    :param listener: Function called with each event as a dict, or None
+    """
+
+    progress['listener'] = listener
+
+
+def _send_event(event):
+    listener = progress['listener']
+    if listener is not None:
+        listener(event)
+
+
+@contextmanager
+def category_progress(phase, name):
+    """
+    This function sends an event when the block starts, and an event with the status, the number of configurations
+    and the time taken when it is done or failed.
+
+    :param phase: backup or update
+    :param name: Name of the category
+    """
+
+    category = CategoryCount()
+    event = {'event': 'category', 'phase': phase, 'category': name}
+    _send_event({**event, 'status': 'started'})
+    start = time.perf_counter()
+    status = 'failed'
+    try:
+        yield category
+        status = 'done'
+    finally:
+        _send_event({**event, 'status': status, 'count': category.count,
+                     'seconds': round(time.perf_counter() - start, 3)})
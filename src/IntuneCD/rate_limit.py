@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to limit the rate of requests to the Microsoft Graph API.
+
+Every request waits for the rate limiter of its tenant. When Graph throttles a request, the limiter pauses all
+requests for the time Graph asks for. The rate is only lowered when throttling is sustained, not for an isolated
+throttled request, and it is raised again quickly once responses are healthy.
+"""
+
+import time
+import threading
+
+from collections import deque
+from .thread_state import ThreadState
+
+# Share of the rate kept when throttling is sustained
+BACKOFF = 0.5
+# Throttled responses among the last THROTTLE_WINDOW responses that make throttling sustained. A $batch counts
+# once, as the share of its requests that were throttled
+THROTTLE_BURST = 3
+THROTTLE_WINDOW = 20
+# Seconds of healthy responses in which the rate is doubled
+RAMP_UP = 1
+# Seconds after lowering the rate during which further throttled requests do not lower it again
+BACKOFF_INTERVAL = 1
+# The rate is never lowered below this share of the maximum rate, or of the rate requests were sent at when the
+# rate was first lowered, nor below MIN_RATE requests per second
+MIN_SHARE = 0.25
+MIN_RATE = 0.5
+# Seconds to wait when a throttled response has no Retry-After header
+DEFAULT_RETRY_AFTER = 5
+# Seconds of sent requests used to estimate the rate when no rate is set
+RATE_WINDOW = 10
+# Times a throttled request is sent again before it fails
+MAX_THROTTLE_RETRIES = 5
+
+
+class RateLimiter:
+    """
+    Spaces requests evenly so no more than the given number of requests are sent per second, and adapts the rate
+    to throttling by Graph.
+    """
+
+    def __init__(self, requests_per_second=None):
+        """
+        :param requests_per_second: The maximum number of requests per second, None for no limit until throttled
+        """
+
+        self.max_rate = requests_per_second
+        self.rate = requests_per_second
+        self.next_request = 0
+        self.blocked_until = 0
+        self.backoff_until = 0
+        self.raised = 0
+        self.floor = None
+        self.sent = deque()
+        self.responses = deque(maxlen=THROTTLE_WINDOW)
+        self.lock = threading.Lock()
+
+    @property
+    def interval(self):
+        return 1.0 / self.rate if self.rate else None
+
+    def wait(self):
+        """
+        This function waits until the next request can be sent. The rate is checked again after waiting, so
+        waiting requests are sent sooner when the rate is raised.
+        """
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                start = max(self.next_request if self.rate else 0, self.blocked_until)
+                if start <= now:
+                    if self.rate:
+                        self.next_request = max(now, self.next_request) + 1.0 / self.rate
+                    self.sent.append(now)
+                    while self.sent[0] < now - RATE_WINDOW:
+                        self.sent.popleft()
+                    return
+
+            time.sleep(start - now)
+
+    def sent_rate(self, now):
+        """
+        This function gets the rate requests were sent at recently.
+
+        :param now: The current time
+        :return: Requests per second
+        """
+
+        if not self.sent:
+            return MIN_RATE
+        return len(self.sent) / max(1.0, now - self.sent[0])
+
+    def throttled(self, retry_after, share=1.0):
+        """
+        This function pauses requests after a request was throttled, and lowers the rate if throttling is sustained.
+
+        :param retry_after: Seconds Graph asked to wait before sending requests again
+        :param share: The share of the requests in a $batch that were throttled, 1 for a single request
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            self.responses.append(share)
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            # Requests throttled while already backing off are part of the same burst and lower the rate once
+            if sum(self.responses) < THROTTLE_BURST or now < self.backoff_until:
+                return
+            # Without a rate set, back off from the rate requests were sent at
+            rate = self.rate or self.sent_rate(now)
+            if self.floor is None:
+                self.floor = max(MIN_RATE, (self.max_rate or rate) * MIN_SHARE)
+            self.rate = max(self.floor, rate * BACKOFF)
+            self.backoff_until = now + max(retry_after, BACKOFF_INTERVAL)
+            self.responses.clear()
+
+    def succeeded(self):
+        """
+        This function raises the rate after a healthy response. Without a maximum rate, requests are no longer
+        limited once the rate is well above the rate they are sent at.
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            self.responses.append(0.0)
+            if self.rate is None or self.rate == self.max_rate or now < self.backoff_until:
+                return
+            self.rate *= 2 ** ((now - max(self.raised, self.backoff_until)) / RAMP_UP)
+            self.raised = now
+            if self.max_rate is not None:
+                self.rate = min(self.rate, self.max_rate)
+            elif self.rate > 2 * self.sent_rate(now):
+                self.rate = None
+
+
+# Rate limiter of requests sent from threads without a rate limiter of their own
+default_limiter = RateLimiter()
+
+# The rate limiter of the tenant backed up in this thread, set by set_rate_limit
+rate_limit = ThreadState(limiter=None)
+
+
+def set_rate_limit(requests_per_second):
+    """
+    This function gives requests sent from this thread their own rate limiter.
+
+    :param requests_per_second: The maximum number of requests per second, None for no limit until throttled
+    """
+
+    rate_limit['limiter'] = RateLimiter(requests_per_second)
+
+
+def get_rate_limiter():
+    """
+    This function gets the rate limiter of requests sent from this thread.
+
+    :return: The rate limiter
+    """
+
+    return rate_limit['limiter'] or default_limiter
+
+
+def wait_for_rate_limit():
+    """
+    This function waits until a request can be sent from this thread without exceeding the rate limit.
+    """
+
+    get_rate_limiter().wait()
+
+
+def retry_after(headers):
+    """
+    This function gets the number of seconds Graph asked to wait before sending requests again.
+
+    :param headers: The headers of the throttled response
+    :return: Seconds to wait
+    """
+
+    try:
+        return max(0, float(headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+def update_rate_limit(status_code, headers):
+    """
+    This function adapts the rate limit of this thread to the response of a request.
+
+    :param status_code: The status code of the response
+    :param headers: The headers of the response
+    """
+
+    if status_code == 429:
+        get_rate_limiter().throttled(retry_after(headers))
+    elif status_code < 400:
+        get_rate_limiter().succeeded()
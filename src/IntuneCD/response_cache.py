@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to cache responses from the Microsoft Graph API on disk between runs.
+
+Responses with an ETag or a modification date are saved with them, and the next request for the same URL is sent
+as a conditional request. When Graph answers 304 Not Modified, the cached body is used. Resources that do not
+change, such as the categories and settings of Endpoint Security templates, are served from the cache without
+sending a request.
+
+The cache is not used while a cassette is recorded or replayed, so cassettes always contain the full responses.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+
+from email.utils import format_datetime
+from datetime import datetime, timezone
+from .cassette import cassette, ReplayResponse
+
+# Increase when the format of the cached entries changes so old entries are not used
+CACHE_VERSION = 1
+
+# Resources that do not change once created, relative to the Graph version
+IMMUTABLE = (
+    re.compile(r'^deviceManagement/templates/[^/?]+/categories$'),
+    re.compile(r'^deviceManagement/templates/[^/?]+/settings$'),
+    re.compile(r'^deviceManagement/templates/[^/?]+/categories/[^/?]+/settingDefinitions$'),
+    re.compile(r'^deviceManagement/settingDefinitions/[^/?]+$'),
+    re.compile(r'^deviceManagement/configurationSettings/[^/?]+$'),
+)
+
+# URLs of the requests in a $batch are relative to this URL
+BATCH_BASE_URL = 'https://graph.microsoft.com/beta/'
+
+# The response cache used for requests, set by open_response_cache
+response_cache = {'path': None, 'hits': 0, 'not_modified': 0, 'stored': 0}
+lock = threading.Lock()
+
+
+def open_response_cache(path):
+    """
+    This function starts caching responses in a directory.
+
+    :param path: The directory to save the cached responses in, created if it does not exist
+    """
+
+    os.makedirs(path, exist_ok=True)
+    with lock:
+        response_cache['path'] = path
+        response_cache['hits'] = 0
+        response_cache['not_modified'] = 0
+        response_cache['stored'] = 0
+
+
+def caching():
+    """
+    This function checks if responses are cached.
+
+    :return: True if a response cache is open and no cassette is recorded or replayed
+    """
+
+    return response_cache['path'] is not None and cassette['mode'] is None
+
+
+def is_immutable(url):
+    """
+    This function checks if a URL is for a resource that does not change.
+
+    :param url: The URL of the request
+    :return: True if the resource can be served from the cache without asking Graph
+    """
+
+    path = re.sub(r'^https://[^/]+/(beta|v1\.0)/', '', url)
+    return any(pattern.match(path) for pattern in IMMUTABLE)
+
+
+def _entry_path(url, params):
+    if params is not None and not isinstance(params, str):
+        params = json.dumps(params, sort_keys=True)
+    key = hashlib.sha256(json.dumps([url, params]).encode('utf-8')).hexdigest()
+    return os.path.join(response_cache['path'], key[:2], key + '.json')
+
+
+def get_cached(method, url, kwargs):
+    """
+    This function gets the cached response of a request.
+
+    :param method: The HTTP method
+    :param url: The URL of the request
+    :param kwargs: The arguments the request is sent with
+    :return: The cached entry, or None if the request is not cached
+    """
+
+    if method != 'GET' or not caching():
+        return None
+
+    try:
+        with open(_entry_path(url, kwargs.get('params'))) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if entry.get('version') != CACHE_VERSION or entry.get('url') != url:
+        return None
+    return entry
+
+
+def cached_response(entry):
+    """
+    This function gets a cached response to return in place of a response from Graph, and counts it as a hit.
+
+    :param entry: The cached entry
+    :return: The response
+    """
+
+    with lock:
+        response_cache['hits'] += 1
+    return ReplayResponse(entry)
+
+
+def conditional_headers(entry):
+    """
+    This function creates the headers to only get the response again if it changed since it was cached.
+
+    :param entry: The cached entry
+    :return: Dict of headers
+    """
+
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def _last_modified(response, body):
+    if response.headers.get('Last-Modified'):
+        return response.headers['Last-Modified']
+    # Single objects have their modification date in the body, HTTP dates have no fractions of a second
+    modified = body.get('lastModifiedDateTime') if isinstance(body, dict) and 'value' not in body else None
+    try:
+        date = datetime.strptime(modified[:19], '%Y-%m-%dT%H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+    return format_datetime(date.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def _etag(response, body):
+    if response.headers.get('ETag'):
+        return response.headers['ETag']
+    # Single objects can have their ETag in the body
+    return body.get('@odata.etag') if isinstance(body, dict) else None
+
+
+def store_response(method, url, kwargs, response, entry=None):
+    """
+    This function caches a response that can be requested conditionally or does not change, and turns a
+    304 Not Modified response into the cached response.
+
+    :param method: The HTTP method
+    :param url: The URL of the request
+    :param kwargs: The arguments the request was sent with
+    :param response: The response from Graph
+    :param entry: The cached entry the request was sent conditionally for, or None
+    :return: The response to use
+    """
+
+    # Delta responses are only valid once, the next request uses a new delta link
+    if method != 'GET' or not caching() or '/delta' in url:
+        return response
+
+    if response.status_code == 304 and entry is not None:
+        with lock:
+            response_cache['not_modified'] += 1
+        return ReplayResponse(entry)
+
+    if response.status_code != 200:
+        return response
+
+    try:
+        body = json.loads(response.text)
+    except ValueError:
+        return response
+
+    etag = _etag(response, body)
+    last_modified = _last_modified(response, body)
+    if etag or last_modified or is_immutable(url):
+        save_entry(url, kwargs.get('params'), response.text, etag, last_modified,
+                   response.headers.get('Content-Type'))
+
+    return response
+
+
+def save_entry(url, params, text, etag=None, last_modified=None, content_type=None):
+    """
+    This function saves a response body to the cache.
+
+    :param url: The URL of the request
+    :param params: The query parameters of the request
+    :param text: The body of the response
+    :param etag: The ETag of the response
+    :param last_modified: The date the resource was last modified, as an HTTP date
+    :param content_type: The content type of the response
+    """
+
+    entry = {
+        'version': CACHE_VERSION,
+        'url': url,
+        'status': 200,
+        'headers': {'Content-Type': content_type or 'application/json'},
+        'etag': etag,
+        'last_modified': last_modified,
+        'text': text
+    }
+    entry_path = _entry_path(url, params)
+    os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+    # Written to a temporary file first so other threads never read a partly written entry
+    temp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(entry, f)
+    os.replace(temp_path, entry_path)
+
+    with lock:
+        response_cache['stored'] += 1
+
+
+def cached_batch(query_data, done):
+    """
+    This function serves the requests in a batch for resources that do not change from the cache.
+
+    :param query_data: The body of the batch request
+    :param done: List the responses served from the cache are added to
+    :return: The body of a batch request with the requests that are not cached, or None if all are cached
+    """
+
+    if not caching():
+        return query_data
+
+    remaining = []
+    for request in query_data['requests']:
+        entry = None
+        if is_immutable(request['url']):
+            entry = get_cached(request.get('method', 'GET'), BATCH_BASE_URL + request['url'], {})
+        if entry is None:
+            remaining.append(request)
+            continue
+        with lock:
+            response_cache['hits'] += 1
+        done.append({'id': str(request['id']), 'status': 200, 'headers': {}, 'body': json.loads(entry['text'])})
+
+    return {'requests': remaining} if remaining else None
+
+
+def store_batch(query_data, responses):
+    """
+    This function caches the responses in a batch for resources that do not change.
+
+    :param query_data: The body of the batch request
+    :param responses: The responses of the requests in the batch
+    """
+
+    if not caching():
+        return
+
+    requests = {str(request['id']): request for request in query_data['requests']}
+    for response in responses:
+        request = requests.get(str(response['id']))
+        if (request and response['status'] == 200 and request.get('method', 'GET') == 'GET'
+                and is_immutable(request['url'])):
+            save_entry(BATCH_BASE_URL + request['url'], None, json.dumps(response['body']))
+
+
+def close_response_cache():
+    """
+    This function stops caching responses and prints how many requests the cache saved.
+    """
+
+    with lock:
+        if response_cache['path'] is not None:
+            print(f"Response cache: {response_cache['hits']} responses served from the cache, "
+                  f"{response_cache['not_modified']} not modified, {response_cache['stored']} saved")
+        response_cache['path'] = None
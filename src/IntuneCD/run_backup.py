@@ -4,25 +4,201 @@
 This module contains the functions to run the backup.
 """
 
+import io
 import os
-import sys
 import base64
 import argparse
+import contextlib
 
-from io import StringIO
 from .get_authparams import getAuth
-from .update_frontend import update_frontend
+from .archive_output import open_archive, close_archive, discard_archive
+from .manifest import start_manifest, manifest_category, finish_manifest
+from .multi_tenant import load_tenants, run_tenants
+from .rate_limit import set_rate_limit
+from .cassette import REPLAY_TOKEN, record_cassette, replay_cassette, finish_cassette
+from .response_cache import open_response_cache, close_response_cache
+from .delta import open_delta, close_delta
+from .metrics import start_metrics, finish_metrics
 
 REPO_DIR = os.environ.get("REPO_DIR")
 
 
+def run_backup(path, output, exclude, token, blobstore=False, record_manifest=False, autopilot=None,
+               autopilotformat="files", concurrency=None):
+    """
+    This function backs up all configurations that are not excluded.
+
+    :param path: Path to save the backup to
+    :param output: Format the backup will be saved as
+    :param exclude: List of objects to exclude from the backup
+    :param token: Token to use for authenticating the requests
+    :param blobstore: Save script content and mobileconfig payloads to the blob store
+    :param record_manifest: Save a manifest of the backup
+    :param autopilot: "True" to back up Autopilot devices
+    :param autopilotformat: The format the Autopilot devices are saved as
+    :param concurrency: Send the requests of categories that support it asynchronously, with up to this many
+                        requests in flight
+    :return: The number of configurations backed up
+    """
+
+    config_count = 0
+
+    if concurrency:
+        # Imported only when requests are sent asynchronously, so other runs start faster
+        from .graph_async import run_async
+
+    if record_manifest:
+        start_manifest(path)
+
+    if "AppConfigurations" not in exclude:
+        from .backup_appConfiguration import savebackup
+        with manifest_category("AppConfigurations") as category:
+            config_count += category.add(savebackup(path, output, exclude, token))
+
+    if "AppProtection" not in exclude:
+        from .backup_AppProtection import savebackup
+        with manifest_category("AppProtection") as category:
+            config_count += category.add(savebackup(path, output, exclude, token))
+
+    if "APNs" not in exclude:
+        from .backup_apns import savebackup
+        with manifest_category("APNs") as category:
+            config_count += category.add(savebackup(path, output, token))
+
+    if "VPP" not in exclude:
+        from .backup_vppTokens import savebackup
+        with manifest_category("VPP") as category:
+            config_count += category.add(savebackup(path, output, token))
+
+    if "Applications" not in exclude:
+        from .backup_applications import savebackup
+        with manifest_category("Applications") as category:
+            config_count += category.add(savebackup(path, output, exclude, token))
+
+    if "Compliance" not in exclude:
+        from .backup_compliance import savebackup
+        with manifest_category("Compliance") as category:
+            config_count += category.add(savebackup(path, output, exclude, token))
+
+    if "NotificationTemplate" not in exclude:
+        from .backup_notificationTemplate import savebackup
+        with manifest_category("NotificationTemplate") as category:
+            config_count += category.add(savebackup(path, output, token))
+
+    if "Profiles" not in exclude:
+        from .backup_profiles import savebackup
+        with manifest_category("Profiles") as category:
+            config_count += category.add(savebackup(path, output, exclude, token, blobstore))
+
+    if "GPOConfigurations" not in exclude:
+        from .backup_groupPolicyConfiguration import savebackup, savebackup_async
+        with manifest_category("GPOConfigurations") as category:
+            if concurrency:
+                config_count += category.add(run_async(savebackup_async, path, output, exclude, token=token,
+                                                       concurrency=concurrency))
+            else:
+                config_count += category.add(savebackup(path, output, exclude, token))
+
+    if "AppleEnrollmentProfile" not in exclude:
+        from .backup_appleEnrollmentProfile import savebackup
+        with manifest_category("AppleEnrollmentProfile") as category:
+            config_count += category.add(savebackup(path, output, token))
+
+    if "WindowsEnrollmentProfile" not in exclude:
+        from .backup_windowsEnrollmentProfile import savebackup
+        with manifest_category("WindowsEnrollmentProfile") as category:
+            config_count += category.add(savebackup(path, output, exclude, token))
+
+    if "EnrollmentStatusPage" not in exclude:
+        from .backup_enrollmentStatusPage import savebackup
+        with manifest_category("EnrollmentStatusPage") as category:
+            config_count += category.add(savebackup(path, output, exclude, token))
+
+    if autopilot == "True":
+        from .backup_autopilotDevices import savebackup
+        with manifest_category("AutopilotDevices"):
+            savebackup(path, output, token, autopilotformat)
+
+    if "Filters" not in exclude:
+        from .backup_assignmentFilters import savebackup
+        with manifest_category("Filters") as category:
+            config_count += category.add(savebackup(path, output, token))
+
+    if "ManagedGooglePlay" not in exclude:
+        from .backup_managedGPlay import savebackup
+        with manifest_category("ManagedGooglePlay") as category:
+            config_count += category.add(savebackup(path, output, token))
+
+    if "Intents" not in exclude:
+        from .backup_managementIntents import savebackup
+        with manifest_category("Intents") as category:
+            config_count += category.add(savebackup(path, output, exclude, token))
+
+    if "CompliancePartner" not in exclude:
+        from .backup_compliancePartner import savebackup
+        with manifest_category("CompliancePartner") as category:
+            config_count += category.add(savebackup(path, output, token))
+
+    if "ManagementPartner" not in exclude:
+        from .backup_managementPartner import savebackup
+        with manifest_category("ManagementPartner") as category:
+            config_count += category.add(savebackup(path, output, token))
+
+    if "RemoteAssistancePartner" not in exclude:
+        from .backup_remoteAssistancePartner import savebackup
+        with manifest_category("RemoteAssistancePartner") as category:
+            config_count += category.add(savebackup(path, output, token))
+
+    if "ProactiveRemediation" not in exclude:
+        from .backup_proactiveRemediation import savebackup, savebackup_async
+        with manifest_category("ProactiveRemediation") as category:
+            if concurrency:
+                config_count += category.add(run_async(savebackup_async, path, output, exclude, blobstore=blobstore,
+                                                       token=token, concurrency=concurrency))
+            else:
+                config_count += category.add(savebackup(path, output, exclude, token, blobstore))
+
+    if "PowershellScripts" not in exclude:
+        from .backup_powershellScripts import savebackup, savebackup_async
+        with manifest_category("PowershellScripts") as category:
+            if concurrency:
+                config_count += category.add(run_async(savebackup_async, path, output, exclude, blobstore=blobstore,
+                                                       token=token, concurrency=concurrency))
+            else:
+                config_count += category.add(savebackup(path, output, exclude, token, blobstore))
+
+    if "ShellScripts" not in exclude:
+        from .backup_shellScripts import savebackup, savebackup_async
+        with manifest_category("ShellScripts") as category:
+            if concurrency:
+                config_count += category.add(run_async(savebackup_async, path, output, exclude, blobstore=blobstore,
+                                                       token=token, concurrency=concurrency))
+            else:
+                config_count += category.add(savebackup(path, output, exclude, token, blobstore))
+
+    if "ConfigurationPolicies" not in exclude:
+        from .backup_configurationPolicies import savebackup, savebackup_async
+        with manifest_category("ConfigurationPolicies") as category:
+            if concurrency:
+                config_count += category.add(run_async(savebackup_async, path, output, exclude, token=token,
+                                                       concurrency=concurrency))
+            else:
+                config_count += category.add(savebackup(path, output, exclude, token))
+
+    if record_manifest:
+        finish_manifest(output, config_count)
+
+    return config_count
+
+
 def start():
     parser = argparse.ArgumentParser(
         description="Save backup of Intune configurations")
     parser.add_argument(
         "-o",
         "--output",
-        help='The format backups will be saved as, valid options are json or yaml. Default is json',
+        help=('The format backups will be saved as, valid options are json, yaml or archive. archive saves the '
+              'whole backup as JSON to a single IntuneCD-backup.tar.gz in the path. Default is json'),
         type=str,
         default="json",
     )
@@ -84,13 +260,119 @@ def start():
         "--frontend",
         help="Set the frontend URL to update with configuration count and backup stream",
         type=str)
+    parser.add_argument(
+        "--frontendstream",
+        help=("When this parameter is set with --frontend, the output is streamed to the frontend feed stream while "
+              "the run is going, with an event when each category starts and is done, instead of sent to the feed "
+              "in one request at the end"),
+        action="store_true")
+    parser.add_argument(
+        "-b", "--blobstore",
+        help=("When this parameter is set, script content and mobileconfig payloads are saved once to the Blobs "
+              "folder and referenced by hash from the configuration instead of being saved to Script Data and "
+              "mobileconfig"),
+        action="store_true")
+    parser.add_argument(
+        "--manifest",
+        help=("When this parameter is set, IntuneCD-manifest.json is saved to the backup path listing every saved "
+              "object with its Graph id, path, hash, size and timings, and what changed since the last manifest"),
+        action="store_true")
     parser.add_argument(
         "-ap", "--autopilot",
         help="If set to True, a record of autopilot devices will be saved"
     )
+    parser.add_argument(
+        "-apf", "--autopilotformat",
+        help=("The format the autopilot device record is saved as, 'files' saves one file per device, "
+              "'jsonl' saves all devices to a single JSON Lines file. Default is files"),
+        choices=["files", "jsonl"],
+        default="files"
+    )
+    parser.add_argument(
+        "-t", "--tenants",
+        help=("Path to a JSON file with a list of tenants to back up in one run. Each tenant has params in the same "
+              "format as the --localauth file in standalone mode and can set a name, path and ratelimit (requests "
+              "per second). Tenants without a path are saved to a folder per tenant in --path"),
+        type=str
+    )
+    parser.add_argument(
+        "--tenantworkers",
+        help="The number of tenants to back up at the same time when using --tenants. Default is 4",
+        type=int,
+        default=4
+    )
+    parser.add_argument(
+        "--ratelimit",
+        help=("When this parameter is set, provide the maximum number of requests per second sent to Graph. "
+              "The rate is lowered automatically when Graph throttles requests, and raised again up to this "
+              "maximum. Without it, requests are only slowed down once Graph throttles them"),
+        type=float)
+    parser.add_argument(
+        "--report",
+        help=("When this parameter is set, provide a path to save a JSON report of the run to. The report lists the "
+              "requests sent to each Graph endpoint with latency, bytes, retries and throttling, and the time spent "
+              "on each category. A summary is printed at the end of the run"),
+        type=str
+    )
+    parser.add_argument(
+        "--concurrency",
+        help=("When this parameter is set, provide the maximum number of requests in flight. Requests of "
+              "Settings Catalog, Group Policy Configurations, scripts and Proactive Remediations are sent "
+              "asynchronously, other categories are backed up as before"),
+        type=int)
+    parser.add_argument(
+        "--record",
+        help=("When this parameter is set, provide a path to save a cassette to. Every request to Graph and its "
+              "response is saved to the cassette, so the run can be replayed offline with --replay"),
+        type=str)
+    parser.add_argument(
+        "--replay",
+        help=("When this parameter is set, provide a path to a cassette saved with --record. Responses are read "
+              "from the cassette instead of sending requests to Graph, no authentication is needed"),
+        type=str)
+    parser.add_argument(
+        "--replaytiming",
+        help="When this parameter is set, replayed responses take as long as the recorded requests took",
+        action="store_true")
+    parser.add_argument(
+        "--cache",
+        help=("When this parameter is set, provide a path to a directory to cache responses from Graph in between "
+              "runs. Cached responses are only requested again if they changed, and resources that never change "
+              "are not requested again. Use one directory per tenant"),
+        type=str)
+    parser.add_argument(
+        "--delta",
+        help=("When this parameter is set, provide a path to a file to save delta links in between runs. "
+              "Collections are then listed with delta requests, so only objects that changed since the last run "
+              "are requested. Collections Graph does not support delta for are listed in full. Use one file per "
+              "tenant"),
+        type=str)
 
     args = parser.parse_args()
 
+    if args.output not in ('json', 'yaml', 'archive'):
+        print('Please enter a valid output format, json, yaml or archive')
+        return
+
+    if args.tenants:
+        if args.record or args.replay:
+            raise Exception("Recording or replaying a cassette is not supported when backing up several tenants")
+        if args.cache or args.delta:
+            raise Exception("Caching responses or delta links is not supported when backing up several tenants")
+        if args.frontend:
+            raise Exception("Updating the frontend is not supported when backing up several tenants")
+
+    if args.exclude:
+        exclude = args.exclude
+    else:
+        exclude = []
+
+    if args.report:
+        start_metrics()
+
+    if args.ratelimit:
+        set_rate_limit(args.ratelimit)
+
     def devtoprod():
         return "devtoprod"
 
@@ -106,124 +388,60 @@ def start():
         func = switcher.get(argument, "nothing")
         return func()
 
-    token = getAuth(selected_mode(args.mode), args.localauth, tenant="DEV")
-
-    def run_backup(path, output, exclude, token):
-
-        config_count = 0
-
-        if "AppConfigurations" not in exclude:
-            from .backup_appConfiguration import savebackup
-            config_count += savebackup(path, output, exclude, token)
-
-        if "AppProtection" not in exclude:
-            from .backup_AppProtection import savebackup
-            config_count += savebackup(path, output, exclude, token)
-
-        if "APNs" not in exclude:
-            from .backup_apns import savebackup
-            config_count += savebackup(path, output, token)
-
-        if "VPP" not in exclude:
-            from .backup_vppTokens import savebackup
-            config_count += savebackup(path, output, token)
-
-        if "Applications" not in exclude:
-            from .backup_applications import savebackup
-            config_count += savebackup(path, output, exclude, token)
-
-        if "Compliance" not in exclude:
-            from .backup_compliance import savebackup
-            config_count += savebackup(path, output, exclude, token)
-
-        if "NotificationTemplate" not in exclude:
-            from .backup_notificationTemplate import savebackup
-            config_count += savebackup(path, output, token)
-
-        if "Profiles" not in exclude:
-            from .backup_profiles import savebackup
-            config_count += savebackup(path, output, exclude, token)
-
-        if "GPOConfigurations" not in exclude:
-            from .backup_groupPolicyConfiguration import savebackup
-            config_count += savebackup(path, output, exclude, token)
-
-        if "AppleEnrollmentProfile" not in exclude:
-            from .backup_appleEnrollmentProfile import savebackup
-            config_count += savebackup(path, output, token)
-
-        if "WindowsEnrollmentProfile" not in exclude:
-            from .backup_windowsEnrollmentProfile import savebackup
-            config_count += savebackup(path, output, exclude, token)
-
-        if "EnrollmentStatusPage" not in exclude:
-            from .backup_enrollmentStatusPage import savebackup
-            config_count += savebackup(path, output, exclude, token)
-        
-        if args.autopilot == "True":
-            from .backup_autopilotDevices import savebackup
-            savebackup(path, output, token)
-
-        if "Filters" not in exclude:
-            from .backup_assignmentFilters import savebackup
-            config_count += savebackup(path, output, token)
-
-        if "ManagedGooglePlay" not in exclude:
-            from .backup_managedGPlay import savebackup
-            config_count += savebackup(path, output, token)
-
-        if "Intents" not in exclude:
-            from .backup_managementIntents import savebackup
-            config_count += savebackup(path, output, exclude, token)
-
-        if "CompliancePartner" not in exclude:
-            from .backup_compliancePartner import savebackup
-            config_count += savebackup(path, output, token)
-
-        if "ManagementPartner" not in exclude:
-            from .backup_managementPartner import savebackup
-            config_count += savebackup(path, output, token)
-
-        if "RemoteAssistancePartner" not in exclude:
-            from .backup_remoteAssistancePartner import savebackup
-            config_count += savebackup(path, output, token)
-
-        if "ProactiveRemediation" not in exclude:
-            from .backup_proactiveRemediation import savebackup
-            config_count += savebackup(path, output, exclude, token)
-
-        if "PowershellScripts" not in exclude:
-            from .backup_powershellScripts import savebackup
-            config_count += savebackup(path, output, exclude, token)
-
-        if "ShellScripts" not in exclude:
-            from .backup_shellScripts import savebackup
-            config_count += savebackup(path, output, exclude, token)
+    def backup_path(path, token):
+        if args.output == 'archive':
+            open_archive(path)
+        try:
+            count = run_backup(path, args.output, exclude, token, args.blobstore, args.manifest, args.autopilot,
+                               args.autopilotformat, args.concurrency)
+        except BaseException:
+            # A failed backup does not replace the last archive
+            if args.output == 'archive':
+                discard_archive()
+            raise
+        if args.output == 'archive':
+            close_archive()
+        return count
+
+    if args.tenants:
+        # Each tenant authenticates in its own thread
+        run_tenants(load_tenants(args.tenants, args.path), backup_path, args.tenantworkers,
+                    args.concurrency or 1)
+        if args.report:
+            finish_metrics(args.report)
+        return
+
+    if args.replay:
+        token = REPLAY_TOKEN
+    else:
+        token = getAuth(selected_mode(args.mode), args.localauth, tenant="DEV")
 
-        if "ConfigurationPolicies" not in exclude:
-            from .backup_configurationPolicies import savebackup
-            config_count += savebackup(path, output, exclude, token)
+    if token is None:
+        raise Exception(
+            "Token is empty, please check os.environ variables")
 
-        return config_count
+    if args.record:
+        record_cassette(args.record)
+    elif args.replay:
+        replay_cassette(args.replay, args.replaytiming)
 
-    if args.output == 'json' or args.output == 'yaml':
-        if token is None:
-            raise Exception(
-                "Token is empty, please check os.environ variables")
+    if args.cache:
+        open_response_cache(args.cache)
 
-        if args.exclude:
-            exclude = args.exclude
-        else:
-            exclude = []
+    if args.delta:
+        open_delta(args.delta)
 
+    try:
         if args.frontend:
+            from .update_frontend import update_frontend, stream_feed
 
-            old_stdout = sys.stdout
-            sys.stdout = feedstdout = StringIO()
-            count = run_backup(args.path, args.output, exclude, token)
-            sys.stdout = old_stdout
-            feed_bytes = feedstdout.getvalue().encode("utf-8")
-            out = base64.b64encode(feed_bytes).decode("utf-8")
+            if args.frontendstream:
+                # The output and progress of each category are streamed to the frontend while the run is going
+                with stream_feed(args.frontend, 'backup'):
+                    count = backup_path(args.path, token)
+            else:
+                with contextlib.redirect_stdout(io.StringIO()) as feed:
+                    count = backup_path(args.path, token)
 
             body = {
                 "type": "config_count",
@@ -231,17 +449,23 @@ def start():
             }
             update_frontend(f'{args.frontend}/api/overview/summary', body)
 
-            body = {
-                "type": "backup",
-                "feed": out
-            }
-            update_frontend(f'{args.frontend}/api/feed/update', body)
+            if not args.frontendstream:
+                body = {
+                    "type": "backup",
+                    "feed": base64.b64encode(feed.getvalue().encode("utf-8")).decode("utf-8")
+                }
+                update_frontend(f'{args.frontend}/api/feed/update', body)
 
         else:
-            run_backup(args.path, args.output, exclude, token)
+            backup_path(args.path, token)
 
-    else:
-        print('Please enter a valid output format, json or yaml')
+    finally:
+        finish_cassette()
+        close_response_cache()
+        close_delta()
+
+    if args.report:
+        finish_metrics(args.report)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+"""
+This module contains the functions to back up the DEV tenant and update the PROD tenant in one run.
+"""
+
+import os
+import argparse
+
+from concurrent.futures import ThreadPoolExecutor
+from .get_authparams import getAuth
+from .run_backup import run_backup
+from .run_update import run_update
+from .snapshot import open_snapshot, close_snapshot, finish_snapshot
+from .rate_limit import set_rate_limit
+from .metrics import start_metrics, finish_metrics
+from .index_listing import finish_index_listing
+
+REPO_DIR = os.environ.get("REPO_DIR")
+
+UPDATE_CATEGORIES = [
+    "AppConfigurations",
+    "AppProtection",
+    "Compliance",
+    "NotificationTemplate",
+    "Profiles",
+    "AppleEnrollmentProfile",
+    "WindowsEnrollmentProfile",
+    "EnrollmentStatusPage",
+    "Filters",
+    "Intents",
+    "ProactiveRemediation",
+    "PowershellScripts",
+    "ShellScripts",
+    "ConfigurationPolicies"]
+
+# Backed up to disk with --persist, but not used by the update
+BACKUP_ONLY_CATEGORIES = [
+    "APNs",
+    "VPP",
+    "Applications",
+    "GPOConfigurations",
+    "ManagedGooglePlay",
+    "CompliancePartner",
+    "ManagementPartner",
+    "RemoteAssistancePartner"]
+
+
+def run_devtoprod(path, output, exclude, dev_token, prod_token, assignment, persist=False):
+    """
+    This function backs up DEV and updates PROD at the same time. The backup is kept in memory and each category
+    is updated as soon as it is backed up, while the backup of the next category is running.
+
+    :param path: Path the backup is saved to
+    :param output: Format the backup is saved as
+    :param exclude: List of objects to exclude from the backup and update
+    :param dev_token: Token to use for authenticating the requests to DEV
+    :param prod_token: Token to use for authenticating the requests to PROD
+    :param assignment: Update assignments
+    :param persist: Also save the backup to disk
+    :return: The number of configurations backed up and the number of configurations with differences
+    """
+
+    backup_exclude = list(exclude)
+    if not persist:
+        backup_exclude += BACKUP_ONLY_CATEGORIES
+
+    def backup():
+        # DEV is throttled apart from PROD, so it gets its own rate limiter
+        set_rate_limit(None)
+        try:
+            count = run_backup(path, output, backup_exclude, dev_token)
+        except Exception as e:
+            finish_snapshot(e)
+            raise
+        finish_snapshot()
+        return count
+
+    open_snapshot(path, persist=persist)
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(backup)
+            diff_count = run_update(path, prod_token, assignment, exclude)
+            config_count = future.result()
+    finally:
+        close_snapshot()
+
+    return config_count, diff_count
+
+
+def start():
+    parser = argparse.ArgumentParser(
+        description="Back up Intune configurations from DEV and update PROD with them in one run")
+    parser.add_argument(
+        "-p",
+        "--path",
+        help='The path to which the configurations are saved. Default value is $(Build.SourcesDirectory)',
+        default=REPO_DIR,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="The format backups will be saved as, valid options are json or yaml. Default is json",
+        type=str,
+        default="json")
+    parser.add_argument(
+        "-a",
+        "--localauth",
+        help=(
+            "When this paramater is set, provide a path to a local dict file containing the following keys: "
+            "params:DEV_TENANT_NAME, DEV_CLIENT_ID, DEV_CLIENT_SECRET, PROD_TENANT_NAME, PROD_CLIENT_ID, "
+            "PROD_CLIENT_SECRET. If not set, the keys are read from os.environ"),
+        type=str)
+    parser.add_argument(
+        "-u",
+        help="When this parameter is set, assignments are updated for all configurations",
+        action="store_true")
+    parser.add_argument(
+        "-e",
+        "--exclude",
+        help="List of objects to exclude from the backup and update, separated by space.",
+        choices=["assignments"] + UPDATE_CATEGORIES,
+        nargs='+')
+    parser.add_argument(
+        "--persist",
+        help=("When this parameter is set, the backup is also saved to the path, including the configurations "
+              "that are not updated. Otherwise the backup is only kept in memory"),
+        action="store_true")
+    parser.add_argument(
+        "--report",
+        help=("When this parameter is set, provide a path to save a JSON report of the run to. The report lists the "
+              "requests sent to each Graph endpoint with latency, bytes, retries and throttling, and the time spent "
+              "on each category. A summary is printed at the end of the run"),
+        type=str)
+
+    args = parser.parse_args()
+
+    if args.report:
+        start_metrics()
+
+    dev_token = getAuth("devtoprod", args.localauth, tenant="DEV")
+    prod_token = getAuth("devtoprod", args.localauth, tenant="PROD")
+
+    if dev_token is None or prod_token is None:
+        raise Exception("Token is empty, please check os.environ variables")
+    else:
+
+        if args.exclude:
+            exclude = args.exclude
+        else:
+            exclude = []
+
+        config_count, diff_count = run_devtoprod(args.path, args.output, exclude, dev_token, prod_token, args.u,
+                                                 args.persist)
+        print(f"Backed up {config_count} configurations from DEV, {diff_count} configurations with differences in PROD")
+        finish_index_listing()
+
+        if args.report:
+            finish_metrics(args.report)
+
+
+if __name__ == "__main__":
+    start()
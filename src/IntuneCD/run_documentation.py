@@ -9,8 +9,13 @@ import json
 import argparse
 
 from datetime import datetime
-from markdown_toclify import markdown_toclify
-from .documentation_functions import document_configs, document_management_intents, md_file, get_md_files
+from concurrent.futures import ProcessPoolExecutor
+from .archive_output import open_backup
+from .scan_files import scan_backup
+from .documentation_functions import document_configs, document_management_intents, document_settings_catalog, \
+    md_file, get_md_files
+from .markdown_writer import MarkdownWriter
+from .doc_cache import start_doc_cache, finish_doc_cache
 
 REPO_DIR = os.environ.get("REPO_DIR")
 
@@ -19,7 +24,7 @@ def start():
     parser = argparse.ArgumentParser(description="Create markdown document from backup files")
     parser.add_argument(
         "-p", "--path",
-        help='Path to where the backup is saved, default is REPO_DIR',
+        help='Path to where the backup is saved, or to an IntuneCD-backup.tar.gz archive, default is REPO_DIR',
         default=REPO_DIR
     )
     parser.add_argument(
@@ -52,98 +57,124 @@ def start():
         help='Split the documentation into multiple files and create index.md in the configpath directory with a '
              'list of all files',
     )
+    parser.add_argument(
+        '-w', '--workers',
+        help='Number of processes to render the documentation with, default is to render in a single process',
+        type=int
+    )
+    parser.add_argument(
+        '--cache',
+        help='Save rendered configurations to .IntuneCD-doc-cache.json next to the documentation and only render '
+             'configurations that changed since the last run',
+        action='store_true'
+    )
 
     args = parser.parse_args()
 
-    def run_documentation(configpath, outpath, tenantname, jsondata,  maxlength, split):
+    def run_documentation(configpath, outpath, tenantname, jsondata,  maxlength, split, executor=None):
 
         now = datetime.now()
         current_date = now.strftime("%d/%m/%Y %H:%M:%S")
+        # Walk the backup once, each section gets its files from the scan
+        scan_backup(configpath)
 
-        if split == 'Y':
-            split = True
+        split = split == 'Y'
+        if split:
+            doc = outpath
         else:
-            md_file(outpath)
+            # Write the whole document through one handle, the table of contents is built while writing
+            doc = MarkdownWriter(outpath, exclude_h=[3])
+
+        if args.cache:
+            start_doc_cache(configpath if split else os.path.dirname(os.path.abspath(outpath)), configpath)
 
         # Document App Configuration
-        document_configs(f'{configpath}/App Configuration', outpath, 'App Configuration', maxlength, split)
+        document_configs(f'{configpath}/App Configuration', doc, 'App Configuration', maxlength, split, executor)
 
         # Document App Protection
-        document_configs(f'{configpath}/App Protection', outpath, 'App Protection', maxlength, split)
+        document_configs(f'{configpath}/App Protection', doc, 'App Protection', maxlength, split, executor)
 
         # Document Apple Push Notification
-        document_configs(f'{configpath}/Apple Push Notification', outpath, 'Apple Push Notification', maxlength, split)
+        document_configs(f'{configpath}/Apple Push Notification', doc, 'Apple Push Notification', maxlength,
+                         split, executor)
 
         # Document Apple VPP Tokens
-        document_configs(f'{configpath}/Apple VPP Tokens', outpath, 'Apple VPP Tokens', maxlength, split)
+        document_configs(f'{configpath}/Apple VPP Tokens', doc, 'Apple VPP Tokens', maxlength, split, executor)
 
         # Document iOS Applications
-        document_configs(f'{configpath}/Applications/iOS', outpath, 'iOS Applications', maxlength, split)
+        document_configs(f'{configpath}/Applications/iOS', doc, 'iOS Applications', maxlength, split, executor)
 
         # Document macOS Applications
-        document_configs(f'{configpath}/Applications/macOS', outpath, 'macOS Applications', maxlength, split)
+        document_configs(f'{configpath}/Applications/macOS', doc, 'macOS Applications', maxlength, split, executor)
 
         # Document Android Applications
-        document_configs(f'{configpath}/Applications/Android', outpath, 'Android Applications', maxlength, split)
+        document_configs(f'{configpath}/Applications/Android', doc, 'Android Applications', maxlength, split, executor)
 
         # Document Windows Applications
-        document_configs(f'{configpath}/Applications/Windows', outpath, 'Windows Applications', maxlength, split)
+        document_configs(f'{configpath}/Applications/Windows', doc, 'Windows Applications', maxlength, split, executor)
 
         # Document Web Apps
-        document_configs(f'{configpath}/Applications/Web App', outpath, 'Web Applications', maxlength, split)
+        document_configs(f'{configpath}/Applications/Web App', doc, 'Web Applications', maxlength, split, executor)
 
         # Document Office Suite apps
-        document_configs(f'{configpath}/Applications/Office Suite', outpath, 'Office Suite Applications', maxlength,
-                         split)
+        document_configs(f'{configpath}/Applications/Office Suite', doc, 'Office Suite Applications', maxlength,
+                         split, executor)
 
         # Document compliance
-        document_configs(f'{configpath}/Compliance Policies/Policies', outpath, 'Compliance Policies', maxlength, split)
+        document_configs(f'{configpath}/Compliance Policies/Policies', doc, 'Compliance Policies', maxlength,
+                         split, executor)
 
         # Message Templates
-        document_configs(f'{configpath}/Compliance Policies/Message Templates', outpath, 'Message Templates', maxlength,
-                         split)
+        document_configs(f'{configpath}/Compliance Policies/Message Templates', doc, 'Message Templates', maxlength,
+                         split, executor)
 
         # Document profiles
-        document_configs(f'{configpath}/Device Configurations', outpath, 'Configuration Profiles', maxlength, split)
+        document_configs(f'{configpath}/Device Configurations', doc, 'Configuration Profiles', maxlength,
+                         split, executor)
 
         # Document Group Policy Configurations
-        document_configs(f'{configpath}/Group Policy Configurations', outpath, 'Group Policy Configurations', maxlength,
-                         split)
+        document_configs(f'{configpath}/Group Policy Configurations', doc, 'Group Policy Configurations', maxlength,
+                         split, executor)
 
         # Document Apple Enrollment Profiles
-        document_configs(f'{configpath}/Enrollment Profiles/Apple', outpath, 'Apple Enrollment Profiles', maxlength,
-                         split)
+        document_configs(f'{configpath}/Enrollment Profiles/Apple', doc, 'Apple Enrollment Profiles', maxlength,
+                         split, executor)
 
         # Document Windows Enrollment Profiles
-        document_configs(f'{configpath}/Enrollment Profiles/Windows', outpath, 'Windows Enrollment Profiles', maxlength,
-                         split)
+        document_configs(f'{configpath}/Enrollment Profiles/Windows', doc, 'Windows Enrollment Profiles', maxlength,
+                         split, executor)
 
         # Document Enrollment Status Page profiles
-        document_configs(f'{configpath}/Enrollment Profiles/Windows/ESP', outpath, 'Enrollment Status Page', maxlength, split)
+        document_configs(f'{configpath}/Enrollment Profiles/Windows/ESP', doc, 'Enrollment Status Page', maxlength,
+                         split, executor)
 
         # Document filters
-        document_configs(f'{configpath}/Filters', outpath, 'Filters', maxlength, split)
+        document_configs(f'{configpath}/Filters', doc, 'Filters', maxlength, split, executor)
 
         # Managed Google Play
-        document_configs(f'{configpath}/Managed Google Play', outpath, 'Managed Google Play', maxlength, split)
+        document_configs(f'{configpath}/Managed Google Play', doc, 'Managed Google Play', maxlength, split, executor)
 
         # Document Intents
-        document_management_intents(f'{configpath}/Management Intents/', outpath, 'Management Intents', split)
+        document_management_intents(f'{configpath}/Management Intents/', doc, 'Management Intents', split, executor)
 
         # Document Partner Connections
-        document_configs(f'{configpath}/Partner Connections/', outpath, 'Partner Connections', maxlength, split)
+        document_configs(f'{configpath}/Partner Connections/', doc, 'Partner Connections', maxlength, split, executor)
 
         # Document Proactive Remediations
-        document_configs(f'{configpath}/Proactive Remediations', outpath, 'Proactive Remediations', maxlength, split)
+        document_configs(f'{configpath}/Proactive Remediations', doc, 'Proactive Remediations', maxlength,
+                         split, executor)
 
         # Document Shell Scripts
-        document_configs(f'{configpath}/Scripts/Shell', outpath, 'Shell Scripts', maxlength, split)
+        document_configs(f'{configpath}/Scripts/Shell', doc, 'Shell Scripts', maxlength, split, executor)
 
         # Document Powershell Scripts
-        document_configs(f'{configpath}/Scripts/Powershell', outpath, 'Powershell Scripts', maxlength, split)
+        document_configs(f'{configpath}/Scripts/Powershell', doc, 'Powershell Scripts', maxlength, split, executor)
 
         # Document Settings Catalog
-        document_configs(f'{configpath}/Settings Catalog', outpath, 'Settings Catalog', maxlength, split)
+        document_settings_catalog(f'{configpath}/Settings Catalog', doc, 'Settings Catalog', maxlength, split,
+                                  executor)
+
+        finish_doc_cache()
 
         if jsondata:
             json_dict = json.loads(jsondata)
@@ -185,15 +216,22 @@ def start():
                     doc.writelines(['[', str(file).split('/')[-1], '](', str(file).replace(" ", "%20"), ') \n\n'])
 
         else:
-            document = markdown_toclify(input_file=outpath, back_to_top=True, exclude_h=[3])
-            with open(outpath, 'w') as doc:
-                l1 = f'# {title} \n\n'
-                l2 = f'{intro} \n\n'
-                l3 = f'{tenant} \n\n'
-                l4 = f'{updated} {current_date} \n\n'
-                doc.writelines([l1, l2, l3, l4, document])
-
-    run_documentation(args.path, args.outpath, args.tenantname, args.jsondata, args.maxlength, args.split)
+            l1 = f'# {title} \n\n'
+            l2 = f'{intro} \n\n'
+            l3 = f'{tenant} \n\n'
+            l4 = f'{updated} {current_date} \n\n'
+            doc.finish([l1, l2, l3, l4])
+
+    with open_backup(args.path) as path:
+        if args.split == 'Y' and path != args.path:
+            raise Exception("Split documentation is not supported when documenting from an archive")
+        if args.workers and args.workers > 1:
+            # Configurations are rendered in worker processes and written in the same order as a serial run
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                run_documentation(path, args.outpath, args.tenantname, args.jsondata, args.maxlength, args.split,
+                                  executor)
+        else:
+            run_documentation(path, args.outpath, args.tenantname, args.jsondata, args.maxlength, args.split)
 
 
 if __name__ == '__main__':
@@ -4,25 +4,137 @@
 This module contains the functions to run the update.
 """
 
+import io
 import os
-import sys
 import base64
 import argparse
+import contextlib
 
-from io import StringIO
 from .get_authparams import getAuth
-from .update_frontend import update_frontend
+from .archive_output import open_backup
+from .scan_files import scan_backup
+from .snapshot import wait_for_category
+from .rate_limit import set_rate_limit
+from .cassette import REPLAY_TOKEN, record_cassette, replay_cassette, finish_cassette
+from .response_cache import open_response_cache, close_response_cache
+from .delta import open_delta, close_delta
+from .index_listing import finish_index_listing
+from .metrics import timed_category, start_metrics, finish_metrics
 
 REPO_DIR = os.environ.get("REPO_DIR")
 
 
+def run_update(path, token, assignment, exclude):
+    """
+    This function updates all configurations that are not excluded.
+    If the backup is kept in an in-memory snapshot, each category waits until it is backed up.
+
+    :param path: Path where the backup is saved
+    :param token: Token to use for authenticating the requests
+    :param assignment: Update assignments
+    :param exclude: List of objects to exclude from the update
+    :return: The number of configurations with differences
+    """
+
+    diff_count = 0
+    # Walk the backup once, each update module gets its files from the scan
+    scan_backup(path)
+
+    if "AppConfigurations" not in exclude:
+        wait_for_category("AppConfigurations")
+        with timed_category("update", "AppConfigurations") as category:
+            from .update_appConfiguration import update
+            diff_count += category.add(update(path, token, assignment))
+
+    if "AppProtection" not in exclude:
+        wait_for_category("AppProtection")
+        with timed_category("update", "AppProtection") as category:
+            from .update_appProtection import update
+            diff_count += category.add(update(path, token, assignment))
+
+    if "Compliance" not in exclude:
+        wait_for_category("Compliance")
+        with timed_category("update", "Compliance") as category:
+            from .update_compliance import update
+            diff_count += category.add(update(path, token, assignment))
+
+    if "NotificationTemplate" not in exclude:
+        wait_for_category("NotificationTemplate")
+        with timed_category("update", "NotificationTemplate") as category:
+            from .update_notificationTemplate import update
+            diff_count += category.add(update(path, token))
+
+    if "Profiles" not in exclude:
+        wait_for_category("Profiles")
+        with timed_category("update", "Profiles") as category:
+            from .update_profiles import update
+            diff_count += category.add(update(path, token, assignment))
+
+    if "AppleEnrollmentProfile" not in exclude:
+        wait_for_category("AppleEnrollmentProfile")
+        with timed_category("update", "AppleEnrollmentProfile") as category:
+            from .update_appleEnrollmentProfile import update
+            diff_count += category.add(update(path, token))
+
+    if "WindowsEnrollmentProfile" not in exclude:
+        wait_for_category("WindowsEnrollmentProfile")
+        with timed_category("update", "WindowsEnrollmentProfile") as category:
+            from .update_windowsEnrollmentProfile import update
+            diff_count += category.add(update(path, token, assignment))
+
+    if "EnrollmentStatusPage" not in exclude:
+        wait_for_category("EnrollmentStatusPage")
+        with timed_category("update", "EnrollmentStatusPage") as category:
+            from .update_enrollmentStatusPage import update
+            diff_count += category.add(update(path, token, assignment))
+
+    if "Filters" not in exclude:
+        wait_for_category("Filters")
+        with timed_category("update", "Filters") as category:
+            from .update_assignmentFilter import update
+            diff_count += category.add(update(path, token))
+
+    if "Intents" not in exclude:
+        wait_for_category("Intents")
+        with timed_category("update", "Intents") as category:
+            from .update_managementIntents import update
+            diff_count += category.add(update(path, token, assignment))
+
+    if "ProactiveRemediation" not in exclude:
+        wait_for_category("ProactiveRemediation")
+        with timed_category("update", "ProactiveRemediation") as category:
+            from .update_proactiveRemediation import update
+            diff_count += category.add(update(path, token, assignment))
+
+    if "PowershellScripts" not in exclude:
+        wait_for_category("PowershellScripts")
+        with timed_category("update", "PowershellScripts") as category:
+            from .update_powershellScripts import update
+            diff_count += category.add(update(path, token, assignment))
+
+    if "ShellScripts" not in exclude:
+        wait_for_category("ShellScripts")
+        with timed_category("update", "ShellScripts") as category:
+            from .update_shellScripts import update
+            diff_count += category.add(update(path, token, assignment))
+
+    if "ConfigurationPolicies" not in exclude:
+        wait_for_category("ConfigurationPolicies")
+        with timed_category("update", "ConfigurationPolicies") as category:
+            from .update_configurationPolicies import update
+            diff_count += category.add(update(path, token, assignment))
+
+    return diff_count
+
+
 def start():
     parser = argparse.ArgumentParser(
         description="Update Intune configurations with values from backup")
     parser.add_argument(
         "-p",
         "--path",
-        help='The path to which the configurations are saved. Default value is $(Build.SourcesDirectory)',
+        help=('The path to which the configurations are saved, or the path to an IntuneCD-backup.tar.gz archive. '
+              'Default value is $(Build.SourcesDirectory)'),
         default=REPO_DIR,
     )
     parser.add_argument(
@@ -51,6 +163,12 @@ def start():
         "--frontend",
         help="Set the frontend URL to update with configuration count and backup stream",
         type=str)
+    parser.add_argument(
+        "--frontendstream",
+        help=("When this parameter is set with --frontend, the output is streamed to the frontend feed stream while "
+              "the run is going, with an event when each category starts and is done, instead of sent to the feed "
+              "in one request at the end"),
+        action="store_true")
     parser.add_argument(
         "-e",
         "--exclude",
@@ -71,9 +189,54 @@ def start():
             "ShellScripts",
             "ConfigurationPolicies"],
         nargs='+')
+    parser.add_argument(
+        "--ratelimit",
+        help=("When this parameter is set, provide the maximum number of requests per second sent to Graph. "
+              "The rate is lowered automatically when Graph throttles requests, and raised again up to this "
+              "maximum. Without it, requests are only slowed down once Graph throttles them"),
+        type=float)
+    parser.add_argument(
+        "--report",
+        help=("When this parameter is set, provide a path to save a JSON report of the run to. The report lists the "
+              "requests sent to each Graph endpoint with latency, bytes, retries and throttling, and the time spent "
+              "on each category. A summary is printed at the end of the run"),
+        type=str)
+    parser.add_argument(
+        "--record",
+        help=("When this parameter is set, provide a path to save a cassette to. Every request to Graph and its "
+              "response is saved to the cassette, so the run can be replayed offline with --replay"),
+        type=str)
+    parser.add_argument(
+        "--replay",
+        help=("When this parameter is set, provide a path to a cassette saved with --record. Responses are read "
+              "from the cassette instead of sending requests to Graph, no authentication is needed"),
+        type=str)
+    parser.add_argument(
+        "--replaytiming",
+        help="When this parameter is set, replayed responses take as long as the recorded requests took",
+        action="store_true")
+    parser.add_argument(
+        "--cache",
+        help=("When this parameter is set, provide a path to a directory to cache responses from Graph in between "
+              "runs. Cached responses are only requested again if they changed, and resources that never change "
+              "are not requested again. Use one directory per tenant"),
+        type=str)
+    parser.add_argument(
+        "--delta",
+        help=("When this parameter is set, provide a path to a file to save delta links in between runs. "
+              "Collections are then listed with delta requests, so only objects that changed since the last run "
+              "are requested. Collections Graph does not support delta for are listed in full. Use one file per "
+              "tenant"),
+        type=str)
 
     args = parser.parse_args()
 
+    if args.report:
+        start_metrics()
+
+    if args.ratelimit:
+        set_rate_limit(args.ratelimit)
+
     def devtoprod():
         return "devtoprod"
 
@@ -89,87 +252,41 @@ def start():
         func = switcher.get(argument, "nothing")
         return func()
 
-    token = getAuth(selected_mode(args.mode), args.localauth, tenant="PROD")
-
-    def run_update(path, token, assignment, exclude):
-
-        diff_count = 0
-
-        if "AppConfigurations" not in exclude:
-            from .update_appConfiguration import update
-            diff_count += update(path, token, assignment)
-
-        if "AppProtection" not in exclude:
-            from .update_appProtection import update
-            diff_count += update(path, token, assignment)
-
-        if "Compliance" not in exclude:
-            from .update_compliance import update
-            diff_count += update(path, token, assignment)
-
-        if "NotificationTemplate" not in exclude:
-            from .update_notificationTemplate import update
-            diff_count += update(path, token)
-
-        if "Profiles" not in exclude:
-            from .update_profiles import update
-            diff_count += update(path, token, assignment)
-
-        if "AppleEnrollmentProfile" not in exclude:
-            from .update_appleEnrollmentProfile import update
-            diff_count += update(path, token)
-
-        if "WindowsEnrollmentProfile" not in exclude:
-            from .update_windowsEnrollmentProfile import update
-            diff_count += update(path, token, assignment)
-
-        if "EnrollmentStatusPage" not in exclude:
-            from .update_enrollmentStatusPage import update
-            diff_count += update(path, token, assignment)
-
-        if "Filters" not in exclude:
-            from .update_assignmentFilter import update
-            diff_count += update(path, token)
-
-        if "Intents" not in exclude:
-            from .update_managementIntents import update
-            diff_count += update(path, token, assignment)
-
-        if "ProactiveRemediation" not in exclude:
-            from .update_proactiveRemediation import update
-            diff_count += update(path, token, assignment)
-
-        if "PowershellScripts" not in exclude:
-            from .update_powershellScripts import update
-            diff_count += update(path, token, assignment)
-
-        if "ShellScripts" not in exclude:
-            from .update_shellScripts import update
-            diff_count += update(path, token, assignment)
-
-        if "ConfigurationPolicies" not in exclude:
-            from .update_configurationPolicies import update
-            diff_count += update(path, token, assignment)
-
-        return diff_count
+    if args.replay:
+        token = REPLAY_TOKEN
+    else:
+        token = getAuth(selected_mode(args.mode), args.localauth, tenant="PROD")
 
     if token is None:
         raise Exception("Token is empty, please check os.environ variables")
+
+    if args.exclude:
+        exclude = args.exclude
     else:
+        exclude = []
 
-        if args.exclude:
-            exclude = args.exclude
-        else:
-            exclude = []
+    if args.record:
+        record_cassette(args.record)
+    elif args.replay:
+        replay_cassette(args.replay, args.replaytiming)
+
+    if args.cache:
+        open_response_cache(args.cache)
+
+    if args.delta:
+        open_delta(args.delta)
 
+    try:
         if args.frontend:
+            from .update_frontend import update_frontend, stream_feed
 
-            old_stdout = sys.stdout
-            sys.stdout = feedstdout = StringIO()
-            count = run_update(args.path, token, args.u, exclude)
-            sys.stdout = old_stdout
-            feed_bytes = feedstdout.getvalue().encode("utf-8")
-            out = base64.b64encode(feed_bytes).decode("utf-8")
+            if args.frontendstream:
+                # The output and progress of each category are streamed to the frontend while the run is going
+                with stream_feed(args.frontend, 'update'), open_backup(args.path) as path:
+                    count = run_update(path, token, args.u, exclude)
+            else:
+                with contextlib.redirect_stdout(io.StringIO()) as feed, open_backup(args.path) as path:
+                    count = run_update(path, token, args.u, exclude)
 
             body = {
                 "type": "diff_count",
@@ -177,14 +294,26 @@ def start():
             }
             update_frontend(f'{args.frontend}/api/overview/summary', body)
 
-            body = {
-                "type": "update",
-                "feed": out
-            }
-            update_frontend(f'{args.frontend}/api/feed/update', body)
+            if not args.frontendstream:
+                body = {
+                    "type": "update",
+                    "feed": base64.b64encode(feed.getvalue().encode("utf-8")).decode("utf-8")
+                }
+                update_frontend(f'{args.frontend}/api/feed/update', body)
 
         else:
-            run_update(args.path, token, args.u, exclude)
+            with open_backup(args.path) as path:
+                run_update(path, token, args.u, exclude)
+
+    finally:
+        # The cassette, response cache, delta links, index listing summary and report are saved even if the
+        # update failed
+        finish_cassette()
+        close_response_cache()
+        close_delta()
+        finish_index_listing()
+        if args.report:
+            finish_metrics(args.report)
 
 
 if __name__ == "__main__":
@@ -6,29 +6,76 @@ This module is used to save the configuration to a file.
 
 import os
 import json
+import time
 import yaml
 
+from .archive_output import write_to_archive
+from .manifest import record_object
+from .snapshot import keep_in_snapshot
 
-def save_output(output, configpath, fname, data):
+
+def save_output(output, configpath, fname, data, graph_id=None):
     """
-    This function saves the configuration to a file in JSON or YAML format.
+    This function saves the configuration to a file in JSON or YAML format, or to the backup archive.
 
     :param output: The format the configuration will be saved as
     :param configpath: The path to save the configuration to
     :param fname: The filename of the configuration
     :param data: The configuration data
+    :param graph_id: The id of the configuration in Microsoft Graph, recorded in the backup manifest
     """
 
-    if not os.path.exists(configpath):
-        os.makedirs(configpath)
+    start = time.perf_counter()
 
     if output == 'yaml':
-        with open(configpath + fname + ".yaml", 'w') as yamlFile:
-            yaml.dump(data, yamlFile, sort_keys=False,
-                      default_flow_style=False)
-    elif output == 'json':
-        with open(configpath + fname + ".json", 'w') as jsonFile:
-            json.dump(data, jsonFile, indent=10)
+        filename = fname + ".yaml"
+        content = yaml.dump(data, sort_keys=False,
+                            default_flow_style=False)
+    elif output == 'json' or output == 'archive':
+        filename = fname + ".json"
+        content = json.dumps(data, indent=10)
 
     else:
         raise ValueError("Invalid output format")
+
+    # Files kept in the in-memory snapshot only are not saved
+    if keep_in_snapshot(configpath, filename, content):
+        pass
+    elif output == 'archive':
+        write_to_archive(configpath, filename, content)
+    else:
+        if not os.path.exists(configpath):
+            os.makedirs(configpath)
+
+        with open(configpath + filename, 'w') as outFile:
+            outFile.write(content)
+
+    record_object(configpath, filename, content, graph_id, time.perf_counter() - start)
+
+
+def save_text(output, configpath, fname, content):
+    """
+    This function saves text such as script data or a mobileconfig to a file, or to the backup archive.
+
+    :param output: The format the configuration will be saved as
+    :param configpath: The path to save the file to
+    :param fname: The filename including extension
+    :param content: The text to save, bytes are saved as is
+    """
+
+    start = time.perf_counter()
+
+    # Files kept in the in-memory snapshot only are not saved
+    if keep_in_snapshot(configpath, fname, content):
+        pass
+    elif output == 'archive':
+        write_to_archive(configpath, fname, content)
+    else:
+        if not os.path.exists(configpath):
+            os.makedirs(configpath)
+
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        with open(os.path.join(configpath, fname), mode) as f:
+            f.write(content)
+
+    record_object(configpath, fname, content, serialize_seconds=time.perf_counter() - start)
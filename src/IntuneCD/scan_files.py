@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to find the configuration files in a backup.
+The backup is walked once with os.scandir and the files of each folder are classified by format.
+"""
+
+import os
+
+from .snapshot import in_snapshot, snapshot_files
+
+CONFIG_FORMATS = ('json', 'yaml')
+FORMATS = {'.json': 'json', '.yaml': 'yaml', '.md': 'md'}
+
+# The scanned backup, set by scan_backup
+tree = {'root': None, 'dirs': {}}
+
+
+def file_format(filename):
+    """
+    This function gets the format of a file from its extension.
+
+    :param filename: The name of the file
+    :return: json, yaml or md, or None for other files
+    """
+
+    return FORMATS.get(os.path.splitext(filename)[1])
+
+
+def _scan(path, max_depth=None):
+    dirs = {}
+    stack = [(os.path.normpath(path), 0)]
+    while stack:
+        current, depth = stack.pop()
+        subdirs = []
+        files = []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    # Hidden files such as .DS_Store and caches are not part of the backup
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                        if max_depth is None or depth < max_depth:
+                            stack.append((entry.path, depth + 1))
+                    else:
+                        fmt = file_format(entry.name)
+                        if fmt:
+                            files.append((entry.name, fmt))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        dirs[current] = {'dirs': subdirs, 'files': files}
+
+    return dirs
+
+
+def scan_backup(path):
+    """
+    This function walks the backup once, later calls to get_files for folders in the backup use the result.
+    The scan is replaced by the next call to scan_backup.
+
+    :param path: The path where the backup is saved
+    :return: Dict of folder and the folders and files in it
+    """
+
+    tree['root'] = os.path.normpath(path)
+    tree['dirs'] = _scan(path)
+
+    return tree['dirs']
+
+
+def get_files(configpath, formats=CONFIG_FORMATS, subdirs=False):
+    """
+    This function gets the files of a configuration, sorted by path.
+
+    :param configpath: The path to the configuration folder
+    :param formats: The formats of the files to return
+    :param subdirs: Return the files in the sub folders of the configuration folder instead
+    :return: List of file paths
+    """
+
+    if in_snapshot(configpath):
+        files = snapshot_files(configpath, subdirs)
+        return sorted((file for file in files if file_format(file) in formats), key=str.casefold)
+
+    configpath = os.path.normpath(configpath)
+    root = tree['root']
+    if root is not None and (configpath == root or configpath.startswith(root + os.sep)):
+        dirs = tree['dirs']
+    else:
+        dirs = _scan(configpath, max_depth=1 if subdirs else 0)
+
+    if configpath not in dirs:
+        return []
+
+    if subdirs:
+        folders = [os.path.join(configpath, name) for name in dirs[configpath]['dirs']]
+    else:
+        folders = [configpath]
+
+    files = []
+    for folder in folders:
+        for name, fmt in dirs.get(folder, {'files': []})['files']:
+            if fmt in formats:
+                files.append(os.path.join(folder, name))
+
+    return sorted(files, key=str.casefold)
+
+
+def walk_files(path, formats=CONFIG_FORMATS, max_depth=None):
+    """
+    This function gets all files in a folder and its sub folders, sorted by depth and path.
+
+    :param path: The path to walk
+    :param formats: The formats of the files to return
+    :param max_depth: How many levels of sub folders to walk, default is all
+    :return: List of file paths
+    """
+
+    files = []
+    for folder, entry in _scan(path, max_depth=max_depth).items():
+        for name, fmt in entry['files']:
+            if fmt in formats:
+                files.append(os.path.join(folder, name))
+
+    return sorted(files, key=lambda file: (file.count(os.sep), file.casefold()))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to keep a backup in memory while it is being made, so it can be used to update another
+tenant without reading it from disk. Update can start on a category as soon as the backup of it is done.
+"""
+
+import io
+import os
+import threading
+
+# The backup kept in memory, set by open_snapshot. Shared by the backup and update threads
+snapshot = {'root': None, 'files': {}, 'persist': False, 'done': set(), 'finished': False, 'error': None}
+condition = threading.Condition()
+
+
+def open_snapshot(path, persist=False):
+    """
+    This function starts keeping files saved to the backup path in memory.
+
+    :param path: The path the backup is saved to
+    :param persist: Also save the files to disk
+    """
+
+    with condition:
+        snapshot['root'] = os.path.normpath(path)
+        snapshot['files'] = {}
+        snapshot['persist'] = persist
+        snapshot['done'] = set()
+        snapshot['finished'] = False
+        snapshot['error'] = None
+
+
+def close_snapshot():
+    """
+    This function stops using the snapshot and frees the memory.
+    """
+
+    with condition:
+        snapshot['root'] = None
+        snapshot['files'] = {}
+        snapshot['done'] = set()
+
+
+def in_snapshot(path):
+    """
+    This function checks if a path is part of the snapshot.
+
+    :param path: The path to check
+    :return: True if a snapshot is open and the path is in it
+    """
+
+    root = snapshot['root']
+    if root is None:
+        return False
+
+    path = os.path.normpath(path)
+    return path == root or path.startswith(root + os.sep)
+
+
+def keep_in_snapshot(configpath, filename, content):
+    """
+    This function saves a file to the snapshot, if the path is part of it.
+
+    :param configpath: The path the file is saved to
+    :param filename: The filename
+    :param content: The content as str or bytes
+    :return: True if the file is kept in memory only and should not be saved to disk
+    """
+
+    if not in_snapshot(configpath):
+        return False
+
+    with condition:
+        snapshot['files'][os.path.normpath(os.path.join(configpath, filename))] = content
+
+    return not snapshot['persist']
+
+
+def path_exists(path):
+    """
+    This function checks if a file or folder exists, in the snapshot or on disk.
+
+    :param path: The path to check
+    :return: True if the path exists
+    """
+
+    if not in_snapshot(path):
+        return os.path.exists(path)
+
+    path = os.path.normpath(path)
+    with condition:
+        return path in snapshot['files'] or any(name.startswith(path + os.sep) for name in snapshot['files'])
+
+
+def open_file(path, mode='r'):
+    """
+    This function opens a file, from the snapshot or from disk.
+
+    :param path: The path to the file
+    :param mode: 'r' to read text, 'rb' to read bytes
+    :return: The file object
+    """
+
+    if not in_snapshot(path):
+        return open(path, mode)
+
+    with condition:
+        content = snapshot['files'].get(os.path.normpath(path))
+    if content is None:
+        raise FileNotFoundError(path)
+
+    if 'b' in mode:
+        return io.BytesIO(content.encode('utf-8') if isinstance(content, str) else content)
+    return io.StringIO(content.decode('utf-8') if isinstance(content, bytes) else content)
+
+
+def snapshot_files(configpath, subdirs=False):
+    """
+    This function gets the paths of the files saved to a folder in the snapshot.
+
+    :param configpath: The path to the folder
+    :param subdirs: Return the files in the sub folders of the folder instead
+    :return: List of file paths
+    """
+
+    configpath = os.path.normpath(configpath)
+    depth = 2 if subdirs else 1
+    with condition:
+        names = list(snapshot['files'])
+
+    files = []
+    for name in names:
+        if not name.startswith(configpath + os.sep):
+            continue
+        if name[len(configpath) + 1:].count(os.sep) == depth - 1:
+            files.append(name)
+
+    return files
+
+
+def category_done(name):
+    """
+    This function marks a category as done, update of the category can start.
+
+    :param name: Name of the category
+    """
+
+    with condition:
+        snapshot['done'].add(name)
+        condition.notify_all()
+
+
+def finish_snapshot(error=None):
+    """
+    This function marks the backup as finished, all categories that were not backed up are treated as empty.
+
+    :param error: The exception the backup failed with, if it failed
+    """
+
+    with condition:
+        snapshot['finished'] = True
+        snapshot['error'] = error
+        condition.notify_all()
+
+
+def wait_for_category(name):
+    """
+    This function waits until the backup of a category is done, if a snapshot is open.
+
+    :param name: Name of the category
+    """
+
+    if snapshot['root'] is None:
+        return
+
+    with condition:
+        condition.wait_for(lambda: name in snapshot['done'] or snapshot['finished'])
+        if snapshot['error'] is not None:
+            raise Exception("Backup failed, not updating " + name) from snapshot['error']
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+
+"""
+This module is used to keep module state per thread, so several tenants can be backed up in one process.
+"""
+
+import copy
+import threading
+
+
+class ThreadState(threading.local):
+    """
+    Dict like state with separate values in every thread. Each thread starts with a copy of the defaults.
+    """
+
+    def __init__(self, **defaults):
+        self.__dict__.update(copy.deepcopy(defaults))
+
+    def __getitem__(self, key):
+        return self.__dict__[key]
+
+    def __setitem__(self, key, value):
+        self.__dict__[key] = value
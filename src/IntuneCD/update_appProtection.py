@@ -13,7 +13,8 @@ from .graph_batch import batch_assignment, get_object_assignment
 from .update_assignment import update_assignment, post_assignment_update
 from .remove_keys import remove_keys
 from .get_diff_output import get_diff_output
-from .check_file import check_file
+from .scan_files import get_files
+from .snapshot import open_file, path_exists
 from .load_file import load_file
 
 # Set MS Graph endpoint
@@ -34,7 +35,7 @@ def update(path, token, assignment=False):
     # Set App Protection path
     configpath = path + "/" + "App Protection/"
     # If App Configuration path exists, continue
-    if os.path.exists(configpath):
+    if path_exists(configpath):
 
         # Get App Protections
         mem_data = makeapirequest(f'{ENDPOINT}managedAppPolicies', token)
@@ -46,13 +47,11 @@ def update(path, token, assignment=False):
             token,
             app_protection=True)
 
-        for filename in os.listdir(configpath):
-            file = check_file(configpath, filename)
-            if file is False:
-                continue
+        for file in get_files(configpath):
+            filename = os.path.basename(file)
             # Check which format the file is saved as then open file, load data
             # and set query parameter
-            with open(file) as f:
+            with open_file(file) as f:
                 repo_data = load_file(filename, f)
 
                 if repo_data:
@@ -10,7 +10,8 @@ import os
 from deepdiff import DeepDiff
 from .graph_request import makeapirequest, makeapirequestPatch
 from .remove_keys import remove_keys
-from .check_file import check_file
+from .scan_files import get_files
+from .snapshot import open_file, path_exists
 from .load_file import load_file
 from .get_diff_output import get_diff_output
 
@@ -31,7 +32,7 @@ def update(path, token):
     # Set Apple Enrollment Profile path
     configpath = path + "/" + "Enrollment Profiles/Apple/"
     # If Apple Enrollment Profile path exists, continue
-    if os.path.exists(configpath):
+    if path_exists(configpath):
         # Get IDs of all Apple Enrollment Profiles and add them to a list
         ids = []
         mem_data_accounts = makeapirequest(ENDPOINT, token)
@@ -39,13 +40,11 @@ def update(path, token):
             ids.append(id['id'])
 
         for profile in ids:
-            for filename in os.listdir(configpath):
-                file = check_file(configpath, filename)
-                if file is False:
-                    continue
+            for file in get_files(configpath):
+                filename = os.path.basename(file)
                 # Check which format the file is saved as then open file, load
                 # data and set query parameter
-                with open(file) as f:
+                with open_file(file) as f:
                     repo_data = load_file(filename, f)
                     q_param = {"$filter": "displayName eq " +
                                "'" + repo_data['displayName'] + "'"}
@@ -11,7 +11,8 @@ from deepdiff import DeepDiff
 from .graph_request import makeapirequest, makeapirequestPatch, makeapirequestPost
 from .remove_keys import remove_keys
 from .load_file import load_file
-from .check_file import check_file
+from .scan_files import get_files
+from .snapshot import open_file, path_exists
 from .get_diff_output import get_diff_output
 
 
@@ -31,17 +32,15 @@ def update(path, token):
     # Set Filters path
     configpath = path + "/" + "Filters"
     # If App Configuration path exists, continue
-    if os.path.exists(configpath):
+    if path_exists(configpath):
         # get all filters
         mem_data = makeapirequest(ENDPOINT, token)
 
-        for filename in os.listdir(configpath):
-            file = check_file(configpath, filename)
-            if file is False:
-                continue
+        for file in get_files(configpath):
+            filename = os.path.basename(file)
             # Check which format the file is saved as then open file, load data
             # and set query parameter
-            with open(file) as f:
+            with open_file(file) as f:
                 repo_data = load_file(filename, f)
 
                 filter_value = {}
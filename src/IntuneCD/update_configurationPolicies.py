@@ -9,9 +9,11 @@ import os
 
 from deepdiff import DeepDiff
 from .graph_request import makeapirequest, makeapirequestPut, makeapirequestPost
+from .index_listing import index_param, record_index, record_details
 from .graph_batch import batch_assignment, get_object_assignment
 from .update_assignment import update_assignment, post_assignment_update
-from .check_file import check_file
+from .scan_files import get_files
+from .snapshot import open_file, path_exists
 from .load_file import load_file
 from .get_diff_output import get_diff_output
 
@@ -33,9 +35,11 @@ def update(path, token, assignment=False):
     # Set Settings Catalog path
     configpath = path + "/" + "Settings Catalog/"
 
-    if os.path.exists(configpath):
-        # Get configurations policies
-        mem_data = makeapirequest(ENDPOINT, token)
+    if path_exists(configpath):
+        # Get configurations policies, only with the fields to match them as the details of matched policies are
+        # requested later
+        mem_data = makeapirequest(ENDPOINT, token, index_param('name'))
+        record_index(ENDPOINT, mem_data)
         # Get current assignments
         mem_assignments = batch_assignment(
             mem_data,
@@ -43,14 +47,12 @@ def update(path, token, assignment=False):
             '/assignments',
             token)
 
-        for filename in os.listdir(configpath):
-            file = check_file(configpath, filename)
-            if file is False:
-                continue
+        for file in get_files(configpath):
+            filename = os.path.basename(file)
             (name, ext) = os.path.splitext(filename)
             # Check which format the file is saved as then open file, load data
             # and set query parameter
-            with open(file) as f:
+            with open_file(file) as f:
                 repo_data = load_file(filename, f)
 
                 # Create object to pass in to assignment function
@@ -71,6 +73,7 @@ def update(path, token, assignment=False):
                     # Get Filter data from Intune
                     mem_policy_data = makeapirequest(
                         ENDPOINT + "/" + data['value']['id'], token)
+                    record_details(ENDPOINT, mem_policy_data)
                     # Get Filter settings from Intune
                     mem_policy_settings = makeapirequest(
                         ENDPOINT + "/" + data['value']['id'] + "/settings", token)
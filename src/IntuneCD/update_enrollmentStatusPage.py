@@ -12,7 +12,8 @@ from deepdiff import DeepDiff
 from .graph_request import makeapirequest, makeapirequestPatch, makeapirequestPost
 from .graph_batch import batch_assignment, get_object_assignment
 from .update_assignment import update_assignment, post_assignment_update
-from .check_file import check_file
+from .scan_files import get_files
+from .snapshot import open_file, path_exists
 from .load_file import load_file
 from .remove_keys import remove_keys
 from .get_diff_output import get_diff_output
@@ -36,7 +37,7 @@ def update(path, token, assignment=False):
     # Set Windows Enrollment Status Page Profile path
     configpath = path + "/" + "Enrollment Profiles/Windows/ESP/"
     # If Windows Enrollment Profile path exists, continue
-    if os.path.exists(configpath):
+    if path_exists(configpath):
         # Get enrollment profiles
         mem_data = makeapirequest(ENDPOINT, token)
         # Get current assignment
@@ -46,13 +47,11 @@ def update(path, token, assignment=False):
             '/assignments',
             token)
 
-        for filename in os.listdir(configpath):
-            file = check_file(configpath, filename)
-            if file is False:
-                continue
+        for file in get_files(configpath):
+            filename = os.path.basename(file)
             # Check which format the file is saved as then open file, load data
             # and set query parameter
-            with open(file) as f:
+            with open_file(file) as f:
                 repo_data = load_file(filename, f)
 
                 # Create object to pass in to assignment function
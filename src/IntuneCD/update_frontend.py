@@ -1,11 +1,29 @@
 #!/usr/bin/env python3
 
 """
-This module is used to update the IntuneCD frontend.
+This module is used to update the IntuneCD frontend, and to stream the output and progress of a run to the frontend.
 """
 
+import io
 import os
+import time
+import queue
+import base64
 import requests
+import threading
+import contextlib
+
+from .progress import set_progress_listener
+
+# Characters of output sent to the frontend feed in one chunk
+FEED_CHUNK_SIZE = 64 * 1024
+# Chunks that can wait to be sent before writing to the feed blocks
+FEED_MAX_CHUNKS = 16
+# Seconds after which output is sent to the feed even if the chunk is not full
+FEED_INTERVAL = 5
+# Times a chunk is sent again if it fails, and seconds to wait before the first retry
+FEED_RETRIES = 3
+FEED_RETRY_DELAY = 1
 
 
 def update_frontend(frontend, data):
@@ -26,3 +44,159 @@ def update_frontend(frontend, data):
 
         if response.status_code != 200:
             raise Exception(f"Error updating frontend, {response.text}")
+
+
+class FeedStream(io.TextIOBase):
+    """
+    Stream that sends everything written to it to the frontend feed stream while the run is going, instead of at the
+    end.
+
+    Output is sent in chunks, each as an output event with the feed type, the base64 encoded output, a sequence number
+    so the frontend can append the chunks in order and if it is the final chunk. Progress events are sent with the
+    same sequence numbers, after the output written before them. Chunks are sent from a background thread, and
+    writing blocks when too many chunks are waiting so the memory used stays the same however long the run is.
+    Failed chunks are sent again, if a chunk still fails the error is raised when the stream is closed.
+
+    The stream is used as a context manager:
+        with FeedStream(f'{frontend}/api/feed/stream', 'backup') as feed, contextlib.redirect_stdout(feed):
+            run_backup(...)
+    """
+
+    def __init__(self, frontend, feed_type, chunk_size=FEED_CHUNK_SIZE, max_chunks=FEED_MAX_CHUNKS,
+                 interval=FEED_INTERVAL, retries=FEED_RETRIES, retry_delay=FEED_RETRY_DELAY):
+        """
+        :param frontend: The URL of the feed stream endpoint of the frontend
+        :param feed_type: The type of the feed, backup or update
+        :param chunk_size: The number of characters sent in one chunk
+        :param max_chunks: The number of chunks that can wait to be sent before writing blocks
+        :param interval: Seconds after which output is sent even if the chunk is not full
+        :param retries: The number of times a chunk is sent again if it fails
+        :param retry_delay: Seconds to wait before sending a chunk again, doubled after each attempt
+        """
+
+        super().__init__()
+        self.frontend = frontend
+        self.feed_type = feed_type
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.buffer = []
+        self.buffered = 0
+        self.sequence = 0
+        self.error = None
+        self.lock = threading.Lock()
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.thread = threading.Thread(target=self._send_chunks, daemon=True)
+        self.thread.start()
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        with self.lock:
+            self.buffer.append(s)
+            self.buffered += len(s)
+            if self.buffered >= self.chunk_size:
+                self._queue_chunk()
+        return len(s)
+
+    def event(self, event):
+        """
+        This function sends a progress event, after the output written before it.
+
+        :param event: The event as a dict, the feed type and sequence number are added to it
+        """
+
+        with self.lock:
+            self._queue_chunk()
+            self._queue({'type': self.feed_type, **event, 'final': False})
+
+    def _queue(self, chunk, block=True):
+        # Called with the lock held, so chunks are queued in the order they are numbered
+        try:
+            self.chunks.put({**chunk, 'sequence': self.sequence}, block=block)
+        except queue.Full:
+            return False
+        self.sequence += 1
+        return True
+
+    def _queue_chunk(self, final=False, block=True):
+        if not self.buffer and not final:
+            return
+        chunk = {
+            'type': self.feed_type,
+            'event': 'output',
+            'feed': base64.b64encode(''.join(self.buffer).encode('utf-8')).decode('utf-8'),
+            'final': final
+        }
+        # If the queue is full, the output stays in the buffer and is sent with the next chunk
+        if self._queue(chunk, block):
+            self.buffer = []
+            self.buffered = 0
+
+    def _send_chunks(self):
+        while True:
+            try:
+                chunk = self.chunks.get(timeout=self.interval)
+            except queue.Empty:
+                # Send the output written so far, so the frontend shows progress when little is printed. This
+                # thread is the only one taking chunks from the queue, so it must not wait for room in it
+                with self.lock:
+                    self._queue_chunk(block=False)
+                continue
+
+            # After a chunk failed, the rest of the feed is dropped so the run is not slowed down
+            if self.error is None:
+                self._send(chunk)
+            if chunk['final']:
+                return
+
+    def _send(self, chunk):
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                update_frontend(self.frontend, chunk)
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    self.error = e
+                    return
+            time.sleep(delay)
+            delay *= 2
+
+    def close(self):
+        """
+        This function sends the output not sent yet as the final chunk and waits until all chunks are sent.
+        """
+
+        if self.closed:
+            return
+        with self.lock:
+            self._queue_chunk(final=True)
+        self.thread.join()
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        # An error of the run is raised rather than an error sending the feed
+        if exc_type is None and self.error is not None:
+            raise Exception(f"Error updating frontend feed, {self.error}")
+
+
+@contextlib.contextmanager
+def stream_feed(frontend, feed_type):
+    """
+    This function streams the output of the block to the frontend feed stream, with an event when each category
+    starts and when it is done.
+
+    :param frontend: The URL of the frontend
+    :param feed_type: The type of the feed, backup or update
+    """
+
+    with FeedStream(f'{frontend}/api/feed/stream', feed_type) as feed, contextlib.redirect_stdout(feed):
+        set_progress_listener(feed.event)
+        try:
+            yield feed
+        finally:
+            set_progress_listener(None)
@@ -5,13 +5,13 @@ This module is used to update all Endpoint Security configurations (intents) in
 """
 
 import json
-import os
-import glob
 
 from deepdiff import DeepDiff
 from .graph_request import makeapirequest, makeapirequestPost
 from .graph_batch import batch_intents, batch_assignment, get_object_assignment
 from .update_assignment import update_assignment, post_assignment_update
+from .scan_files import get_files
+from .snapshot import open_file, path_exists
 from .load_file import load_file
 from .get_diff_output import get_diff_output
 
@@ -33,7 +33,7 @@ def update(path, token, assignment=False):
     # Set Intent path
     configpath = path + "/" + "Management Intents/"
     # If Intents path exists, continue
-    if os.path.exists(configpath):
+    if path_exists(configpath):
         # Get intents
         intents = makeapirequest(BASE_ENDPOINT + "/intents", token)
         intent_responses = batch_intents(intents, token)
@@ -41,20 +41,11 @@ def update(path, token, assignment=False):
         mem_assignments = batch_assignment(
             intents, 'deviceManagement/intents/', '/assignments', token)
 
-        # Set glob pattern
-        pattern = configpath + "*/*"
-        for filename in glob.glob(pattern, recursive=True):
-
-            # If file is .DS_Store, skip
-            if filename == ".DS_Store":
-                continue
-            # If file is .md, skip
-            if filename.endswith(".md"):
-                continue
+        for filename in get_files(configpath, subdirs=True):
 
             # Check which format the file is saved as then open file, load data
             # and set query parameter
-            with open(filename) as f:
+            with open_file(filename) as f:
                 repo_data = load_file(filename, f)
 
                 # Create object to pass in to assignment function
@@ -9,7 +9,9 @@ import os
 
 from deepdiff import DeepDiff
 from .graph_request import makeapirequest, makeapirequestPatch, makeapirequestPost
-from .check_file import check_file
+from .index_listing import index_param, record_index, record_details
+from .scan_files import get_files
+from .snapshot import open_file, path_exists
 from .load_file import load_file
 from .remove_keys import remove_keys
 from .get_diff_output import get_diff_output
@@ -31,18 +33,18 @@ def update(path, token):
     # Set Notification Template path
     configpath = path + "/" + "Compliance Policies/Message Templates/"
     # If Notification Template path exists, continue
-    if os.path.exists(configpath):
+    if path_exists(configpath):
 
-        # Get notification templates
-        mem_data = makeapirequest(ENDPOINT, token)
+        # Get notification templates, only with the fields to match them as the details of matched templates are
+        # requested later
+        mem_data = makeapirequest(ENDPOINT, token, index_param())
+        record_index(ENDPOINT, mem_data)
 
-        for filename in os.listdir(configpath):
-            file = check_file(configpath, filename)
-            if file is False:
-                continue
+        for file in get_files(configpath):
+            filename = os.path.basename(file)
             # Check which format the file is saved as then open file, load data
             # and set query parameter
-            with open(file) as f:
+            with open_file(file) as f:
                 repo_data = load_file(filename, f)
 
                 data = {'value': ''}
@@ -58,6 +60,7 @@ def update(path, token):
                     q_param = "?$expand=localizedNotificationMessages"
                     mem_template_data = makeapirequest(
                         ENDPOINT + "/" + data['value']['id'], token, q_param)
+                    record_details(ENDPOINT, mem_template_data)
                     # Create dict to compare Intune data with JSON/YAML data
                     repo_template_data = {
                         "displayName": repo_data['displayName'],
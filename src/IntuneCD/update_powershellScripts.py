@@ -10,12 +10,15 @@ import base64
 
 from deepdiff import DeepDiff
 from .graph_request import makeapirequest, makeapirequestPatch, makeapirequestPost
+from .index_listing import index_param, record_index, record_details
 from .graph_batch import batch_assignment, get_object_assignment
 from .update_assignment import update_assignment, post_assignment_update
-from .check_file import check_file
+from .scan_files import get_files
+from .snapshot import open_file, path_exists
 from .load_file import load_file
 from .remove_keys import remove_keys
 from .get_diff_output import get_diff_output
+from .blob_store import resolve_blobs, get_repo_content
 
 # Set MS Graph endpoint
 ENDPOINT = "https://graph.microsoft.com/beta/deviceManagement/deviceManagementScripts"
@@ -35,9 +38,10 @@ def update(path, token, assignment=False):
     # Set Powershell script path
     configpath = path + "/" + "Scripts/Powershell"
     # If Powershell script path exists, continue
-    if os.path.exists(configpath):
-        # Get scripts
-        mem_powershellScript = makeapirequest(ENDPOINT, token)
+    if path_exists(configpath):
+        # Get scripts, only with the fields to match them as the details of matched scripts are requested later
+        mem_powershellScript = makeapirequest(ENDPOINT, token, index_param())
+        record_index(ENDPOINT, mem_powershellScript)
         # Get current assignment
         mem_assignments = batch_assignment(
             mem_powershellScript,
@@ -45,14 +49,14 @@ def update(path, token, assignment=False):
             '/assignments',
             token)
 
-        for filename in os.listdir(configpath):
-            file = check_file(configpath, filename)
-            if file is False:
-                continue
+        for file in get_files(configpath):
+            filename = os.path.basename(file)
             # Check which format the file is saved as then open file, load data
             # and set query parameter
-            with open(file) as f:
+            with open_file(file) as f:
                 repo_data = load_file(filename, f)
+                # Replace any blob store references with the content
+                blobs = resolve_blobs(path, repo_data)
 
                 # Create object to pass in to assignment function
                 assign_obj = {}
@@ -72,18 +76,15 @@ def update(path, token, assignment=False):
                     # Get Powershell script details
                     mem_data = makeapirequest(
                         ENDPOINT + "/" + data['value']['id'], token)
+                    record_details(ENDPOINT, mem_data)
                     mem_id = mem_data['id']
                     # Remove keys before using DeepDiff
                     mem_data = remove_keys(mem_data)
 
                     # Check if script data is saved and read the file
-                    if os.path.exists(
-                        configpath +
-                        "/Script Data/" +
-                            repo_data['fileName']):
-                        with open(configpath + "/Script Data/" + repo_data['fileName'], 'r') as f:
-                            repo_payload_config = f.read()
-
+                    repo_payload_config = get_repo_content(
+                        configpath + "/Script Data/" + repo_data['fileName'], blobs, 'scriptContent')
+                    if repo_payload_config is not None:
                         mem_payload_config = base64.b64decode(
                             mem_data['scriptContent']).decode('utf-8')
 
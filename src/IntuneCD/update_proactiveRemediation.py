@@ -10,12 +10,15 @@ import base64
 
 from deepdiff import DeepDiff
 from .graph_request import makeapirequest, makeapirequestPatch, makeapirequestPost
+from .index_listing import index_param, record_index, record_details
 from .graph_batch import batch_assignment, get_object_assignment
 from .update_assignment import update_assignment, post_assignment_update
-from .check_file import check_file
+from .scan_files import get_files
+from .snapshot import open_file, path_exists
 from .load_file import load_file
 from .remove_keys import remove_keys
 from .get_diff_output import get_diff_output
+from .blob_store import resolve_blobs, get_repo_content
 
 # Set MS Graph endpoint
 ENDPOINT = "https://graph.microsoft.com/beta/deviceManagement/deviceHealthScripts"
@@ -35,9 +38,11 @@ def update(path, token, assignment=False):
     # Set Powershell script path
     configpath = f'{path}/Proactive Remediations'
     # If Powershell script path exists, continue
-    if os.path.exists(configpath):
-        # Get Proactive remediation's
-        mem_proactiveRemediation = makeapirequest(ENDPOINT, token)
+    if path_exists(configpath):
+        # Get Proactive remediation's, only with the fields to match them as the details of matched Proactive
+        # Remediations are requested later
+        mem_proactiveRemediation = makeapirequest(ENDPOINT, token, index_param())
+        record_index(ENDPOINT, mem_proactiveRemediation)
         # Get current assignment
         mem_assignments = batch_assignment(
             mem_proactiveRemediation,
@@ -45,14 +50,14 @@ def update(path, token, assignment=False):
             '/assignments',
             token)
 
-        for filename in os.listdir(configpath):
-            file = check_file(configpath, filename)
-            if file is False:
-                continue
+        for file in get_files(configpath):
+            filename = os.path.basename(file)
             # Check which format the file is saved as then open file, load data
             # and set query parameter
-            with open(file) as f:
+            with open_file(file) as f:
                 repo_data = load_file(filename, f)
+                # Replace any blob store references with the content
+                blobs = resolve_blobs(path, repo_data)
 
                 # Create object to pass in to assignment function
                 assign_obj = {}
@@ -73,6 +78,7 @@ def update(path, token, assignment=False):
                     # Get Powershell script details
                     mem_data = makeapirequest(
                         ENDPOINT + "/" + data['value']['id'], token, q_param)
+                    record_details(ENDPOINT, mem_data)
                     mem_id = data['value']['id']
                     # Remove keys before using DeepDiff
                     mem_data = remove_keys(mem_data)
@@ -80,13 +86,10 @@ def update(path, token, assignment=False):
                     # Check if script data is saved and read the file
                     detection_script_name = f"{configpath}/Script Data/{repo_data['displayName']}_DetectionScript.ps1"
                     remediation_script_name = f"{configpath}/Script Data/{repo_data['displayName']}_RemediationScript.ps1"
-                    if os.path.exists(detection_script_name) and os.path.exists(
-                            remediation_script_name):
-                        with open(detection_script_name, 'r') as df:
-                            repo_detection_config = df.read()
-                        with open(remediation_script_name, 'r') as rf:
-                            repo_remediation_config = rf.read()
-
+                    repo_detection_config = get_repo_content(detection_script_name, blobs, 'detectionScriptContent')
+                    repo_remediation_config = get_repo_content(
+                        remediation_script_name, blobs, 'remediationScriptContent')
+                    if repo_detection_config is not None and repo_remediation_config is not None:
                         mem_detection_config = base64.b64decode(
                             mem_data['detectionScriptContent']).decode('utf-8')
                         mem_remediation_config = base64.b64decode(
@@ -7,21 +7,116 @@ This module is used to update all Device Configuration Profiles in Intune.
 import json
 import os
 import base64
+import hashlib
 import plistlib
 
 from deepdiff import DeepDiff
 from .graph_request import makeapirequest, makeapirequestPatch, makeapirequestPost
 from .graph_batch import batch_assignment, get_object_assignment
 from .update_assignment import update_assignment, post_assignment_update
-from .check_file import check_file
+from .scan_files import get_files
+from .snapshot import open_file, path_exists
 from .load_file import load_file
 from .remove_keys import remove_keys
 from .get_diff_output import get_diff_output
+from .blob_store import resolve_blobs
 
 # Set MS Graph endpoint
 ENDPOINT = "https://graph.microsoft.com/beta/deviceManagement/deviceConfigurations"
 
 
+def payload_hash(payload):
+    """
+    This function returns a hash of a parsed mobileconfig payload.
+    Keys are sorted so the same payload always gives the same hash regardless of key order.
+
+    :param payload: The parsed mobileconfig payload
+    :return: The SHA-256 hex digest of the payload
+    """
+
+    canonical = json.dumps(payload, sort_keys=True, default=repr)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def update_mobileconfig(configpath, mem_id, mem_data, repo_data, blobs, token):
+    """
+    This function updates a custom macOS or iOS profile in Intune if its settings or .mobileconfig payload
+    differ from the backup.
+
+    :param configpath: Path to the Device Configurations in the backup
+    :param mem_id: The ID of the profile in Intune
+    :param mem_data: The profile in Intune
+    :param repo_data: The profile in the backup
+    :param blobs: The blob store content of the profile
+    :param token: Token to use for authenticating the request
+    :return: The number of differences found
+    """
+
+    diff_count = 0
+    repo_payload_config = None
+    if 'payload' in blobs:
+        repo_payload_config = plistlib.loads(blobs['payload'])
+    elif path_exists(configpath + "mobileconfig/" + repo_data['payloadFileName']):
+        with open_file(configpath + "mobileconfig/" + repo_data['payloadFileName'], 'rb') as f:
+            repo_payload_config = plistlib.load(f)
+
+    if repo_payload_config is not None:
+        decoded = base64.b64decode(mem_data['payload'])
+        mem_payload_config = plistlib.loads(decoded)
+
+        # Only run DeepDiff on the payload if the hashes differ
+        pdiff = {}
+        if payload_hash(mem_payload_config) != payload_hash(repo_payload_config):
+            pdiff = DeepDiff(
+                mem_payload_config,
+                repo_payload_config,
+                ignore_order=True).get(
+                'values_changed',
+                {})
+        cdiff = DeepDiff(
+            mem_data,
+            repo_data,
+            ignore_order=True,
+            exclude_paths="root['payload']").get(
+            'values_changed',
+            {})
+
+        # If any changed values are found, push them to Intune
+        if pdiff or cdiff:
+            print(
+                "Updating profile: " +
+                repo_data['displayName'] +
+                ", values changed:")
+            if pdiff:
+                diff_count += 1
+                values = get_diff_output(pdiff)
+                for value in values:
+                    print(value)
+            if cdiff:
+                diff_count += 1
+                values = get_diff_output(cdiff)
+                for value in values:
+                    print(value)
+            payload = plistlib.dumps(
+                repo_payload_config)
+            repo_data['payload'] = str(
+                base64.b64encode(payload), 'utf-8')
+            request_data = json.dumps(repo_data)
+            q_param = None
+            makeapirequestPatch(
+                ENDPOINT + "/" + mem_id, token, q_param, request_data, status_code=204)
+        else:
+            print(
+                'No difference found for profile: ' +
+                repo_data['displayName'])
+
+    else:
+        print("No mobileconfig found for profile: " +
+              repo_data['displayName'])
+
+    return diff_count
+
+
 def update(path, token, assignment=False):
     """
     This function updates all Device Configurations in Intune,
@@ -36,7 +131,7 @@ def update(path, token, assignment=False):
     # Set Device Configurations path
     configpath = path + "/" + "Device Configurations/"
     # If Device Configurations path exists, continue
-    if os.path.exists(configpath):
+    if path_exists(configpath):
         # Get profiles
         mem_data = makeapirequest(ENDPOINT, token)
         # Get current assignment
@@ -46,12 +141,12 @@ def update(path, token, assignment=False):
             '/assignments',
             token)
 
-        for filename in os.listdir(configpath):
-            file = check_file(configpath, filename)
-            if file is False:
-                continue
-            with open(file) as f:
+        for file in get_files(configpath):
+            filename = os.path.basename(file)
+            with open_file(file) as f:
                 repo_data = load_file(filename, f)
+                # Replace any blob store references with the content
+                blobs = resolve_blobs(path, repo_data)
 
                 # Create object to pass in to assignment function
                 assign_obj = {}
@@ -82,69 +177,7 @@ def update(path, token, assignment=False):
                     # the .mobileconfig
                     if ((repo_data['@odata.type'] == "#microsoft.graph.macOSCustomConfiguration") or (
                             repo_data['@odata.type'] == "#microsoft.graph.iosCustomConfiguration")):
-                        if os.path.exists(
-                            configpath +
-                            "mobileconfig/" +
-                                repo_data['payloadFileName']):
-                            with open(configpath + "mobileconfig/" + repo_data['payloadFileName'], 'rb') as f:
-                                repo_payload_config = plistlib.load(f)
-
-                            decoded = base64.b64decode(
-                                data['value']['payload']).decode('utf-8')
-                            f = open(configpath + 'temp.mobileconfig', 'w')
-                            f.write(decoded)
-                            with open(configpath + 'temp.mobileconfig', 'rb') as f:
-                                mem_payload_config = plistlib.load(f)
-
-                            pdiff = DeepDiff(
-                                mem_payload_config,
-                                repo_payload_config,
-                                ignore_order=True).get(
-                                'values_changed',
-                                {})
-                            cdiff = DeepDiff(
-                                data['value'],
-                                repo_data,
-                                ignore_order=True,
-                                exclude_paths="root['payload']").get(
-                                'values_changed',
-                                {})
-
-                            # If any changed values are found, push them to
-                            # Intune
-                            if pdiff or cdiff:
-                                print(
-                                    "Updating profile: " +
-                                    repo_data['displayName'] +
-                                    ", values changed:")
-                                if pdiff:
-                                    diff_count += 1
-                                    values = get_diff_output(pdiff)
-                                    for value in values:
-                                        print(value)
-                                if cdiff:
-                                    diff_count += 1
-                                    values = get_diff_output(cdiff)
-                                    for value in values:
-                                        print(value)
-                                payload = plistlib.dumps(
-                                    repo_payload_config)
-                                repo_data['payload'] = str(
-                                    base64.b64encode(payload), 'utf-8')
-                                request_data = json.dumps(repo_data)
-                                q_param = None
-                                makeapirequestPatch(
-                                    ENDPOINT + "/" + mem_id, token, q_param, request_data, status_code=204)
-                            else:
-                                print(
-                                    'No difference found for profile: ' +
-                                    repo_data['displayName'])
-
-                            os.remove(configpath + 'temp.mobileconfig')
-
-                        else:
-                            print("No mobileconfig found for profile: " +
-                                  repo_data['displayName'])
+                        diff_count += update_mobileconfig(configpath, mem_id, data['value'], repo_data, blobs, token)
 
                     # If Device Configuration is custom Win10, compare the OMA
                     # settings
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""This module tests backing up Autopilot devices."""
+
+import json
+import hashlib
+import unittest
+
+from pathlib import Path
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from src.IntuneCD.backup_autopilotDevices import savebackup
+from src.IntuneCD.manifest import manifest, start_manifest
+
+PAGES = [
+    [{"id": "0", "serialNumber": "1"}],
+    [{"id": "1", "serialNumber": "2"}]]
+
+
+@patch("src.IntuneCD.backup_autopilotDevices.makeapirequest_pages",
+       side_effect=lambda *args, **kwargs: iter(PAGES))
+class TestBackupAutopilotDevices(unittest.TestCase):
+    """Test class for backup_autopilotDevices."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.token = 'token'
+        self.saved_path = f"{self.directory.path}/Autopilot Devices/"
+
+    def tearDown(self):
+        manifest['root'] = None
+        self.directory.cleanup()
+
+    def test_backup_files(self, mock_makeapirequest):
+        """One file per device should be created and the count should be 2."""
+
+        self.count = savebackup(self.directory.path, 'json', self.token)
+
+        with open(self.saved_path + '1.json', 'r') as f:
+            self.saved_data = json.load(f)
+
+        self.assertTrue(Path(self.saved_path + '0.json').exists())
+        self.assertEqual({"id": "1", "serialNumber": "2"}, self.saved_data)
+        self.assertEqual(2, self.count)
+
+    def test_backup_jsonl(self, mock_makeapirequest):
+        """All devices should be saved to a single JSON Lines file and the count should be 2."""
+
+        self.count = savebackup(self.directory.path, 'json', self.token, record_format='jsonl')
+
+        with open(self.saved_path + 'devices.jsonl', 'r') as f:
+            self.saved_data = [json.loads(line) for line in f]
+
+        self.assertEqual([device for page in PAGES for device in page], self.saved_data)
+        self.assertFalse(Path(self.saved_path + '0.json').exists())
+        self.assertFalse(Path(self.saved_path + 'devices.jsonl.tmp').exists())
+        self.assertEqual(2, self.count)
+
+    @patch("src.IntuneCD.backup_autopilotDevices.add_file_to_archive")
+    def test_backup_jsonl_archive(self, mock_add_file_to_archive, mock_makeapirequest):
+        """The JSON Lines file should be added to the archive from a temporary file that is removed after."""
+
+        def add_file(configpath, filename, local_path):
+            with open(local_path, 'r') as f:
+                self.saved_data = [json.loads(line) for line in f]
+            self.local_path = local_path
+
+        mock_add_file_to_archive.side_effect = add_file
+
+        self.count = savebackup(self.directory.path, 'archive', self.token, record_format='jsonl')
+
+        mock_add_file_to_archive.assert_called_once_with(self.saved_path, "devices.jsonl", self.local_path)
+        self.assertEqual([device for page in PAGES for device in page], self.saved_data)
+        self.assertFalse(Path(self.local_path).exists())
+        self.assertFalse(Path(self.saved_path).exists())
+        self.assertEqual(2, self.count)
+
+    def test_backup_jsonl_manifest(self, mock_makeapirequest):
+        """The JSON Lines file should be recorded in the manifest."""
+
+        start_manifest(self.directory.path)
+        savebackup(self.directory.path, 'json', self.token, record_format='jsonl')
+
+        with open(self.saved_path + 'devices.jsonl', 'rb') as f:
+            self.content = f.read()
+
+        self.assertEqual(len(manifest['objects']), 1)
+        self.assertEqual(manifest['objects'][0]['path'], "Autopilot Devices/devices.jsonl")
+        self.assertEqual(manifest['objects'][0]['sha256'], hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(manifest['objects'][0]['size'], len(self.content))
+
+    def test_backup_invalid_format(self, mock_makeapirequest):
+        """A ValueError should be raised for an unknown format."""
+
+        with self.assertRaises(ValueError):
+            savebackup(self.directory.path, 'json', self.token, record_format='csv')
+
+
+if __name__ == '__main__':
+    unittest.main()
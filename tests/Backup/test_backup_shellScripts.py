@@ -2,6 +2,7 @@
 
 """This module tests backing up Shell Scripts."""
 
+import os
 import json
 import yaml
 import unittest
@@ -124,6 +125,25 @@ class TestBackupShellScript(unittest.TestCase):
         self.assertTrue(self.script_content_path)
         self.assertEqual(1, self.count)
 
+    def test_backup_blobstore(self):
+        """The script content should be saved to the blob store and referenced by hash in the configuration."""
+
+        self.count = savebackup(
+            self.directory.path,
+            'json',
+            self.exclude,
+            self.token,
+            blobstore=True)
+
+        with open(self.saved_path + 'json', 'r') as f:
+            self.saved_data = json.load(f)
+
+        self.digest = self.saved_data['scriptContent'].split(':')[1]
+        with open(f'{self.directory.path}/Blobs/{self.digest}', 'r') as f:
+            self.assertEqual(f.read(), 'You found a secret message, hooray!')
+        self.assertFalse(os.path.exists(f'{self.directory.path}/Scripts/Shell/Script Data'))
+        self.assertEqual(1, self.count)
+
     def test_backup_with_no_returned_data(self):
         """The count should be 0 if no data is returned."""
 
@@ -2,11 +2,12 @@
 
 """This module tests updating Profiles."""
 
+import os
 import unittest
 
 from testfixtures import TempDirectory
 from unittest.mock import patch
-from src.IntuneCD.update_profiles import update
+from src.IntuneCD.update_profiles import update, payload_hash
 
 
 class TestUpdateCompliance(unittest.TestCase):
@@ -94,7 +95,8 @@ class TestUpdateCompliance(unittest.TestCase):
         self.repo_payload = {'PayloadContent': [{'test': 'test1'}]}
         self.mem_payload = {'PayloadContent': [{'test': 'test'}]}
 
-        self.plistlib.load.side_effect = self.repo_payload, self.mem_payload
+        self.plistlib.load.return_value = self.repo_payload
+        self.plistlib.loads.return_value = self.mem_payload
 
         self.mem_data_base["value"][0]["@odata.type"] = "#microsoft.graph.macOSCustomConfiguration"
         self.mem_data_base["value"][0]["payload"] = "T29vIHllYWgsIGl0J3MgZ29ubmEgd29yaywgSSBwcm9taXNl"
@@ -116,7 +118,8 @@ class TestUpdateCompliance(unittest.TestCase):
         self.repo_payload = {'PayloadContent': [{'test': 'test1'}]}
         self.mem_payload = {'PayloadContent': [{'test': 'test'}]}
 
-        self.plistlib.load.side_effect = self.repo_payload, self.mem_payload
+        self.plistlib.load.return_value = self.repo_payload
+        self.plistlib.loads.return_value = self.mem_payload
 
         self.mem_data_base["value"][0]["@odata.type"] = "#microsoft.graph.macOSCustomConfiguration"
         self.mem_data_base["value"][0]["payload"] = "T29vIHllYWgsIGl0J3MgZ29ubmEgd29yaywgSSBwcm9taXNl"
@@ -140,7 +143,8 @@ class TestUpdateCompliance(unittest.TestCase):
         self.mem_payload = {'PayloadContent': [{'test': 'test'}]}
         self.repo_data_base["testvalue"] = "test"
 
-        self.plistlib.load.side_effect = self.repo_payload, self.mem_payload
+        self.plistlib.load.return_value = self.repo_payload
+        self.plistlib.loads.return_value = self.mem_payload
 
         self.mem_data_base["value"][0]["@odata.type"] = "#microsoft.graph.macOSCustomConfiguration"
         self.mem_data_base["value"][0]["payload"] = "T29vIHllYWgsIGl0J3MgZ29ubmEgd29yaywgSSBwcm9taXNl"
@@ -163,7 +167,8 @@ class TestUpdateCompliance(unittest.TestCase):
         self.mem_payload = {'PayloadContent': [{'test': 'test'}]}
         self.repo_data_base["testvalue"] = "test"
 
-        self.plistlib.load.side_effect = self.repo_payload, self.mem_payload
+        self.plistlib.load.return_value = self.repo_payload
+        self.plistlib.loads.return_value = self.mem_payload
 
         self.mem_data_base["value"][0]["@odata.type"] = "#microsoft.graph.macOSCustomConfiguration"
         self.mem_data_base["value"][0]["payload"] = "T29vIHllYWgsIGl0J3MgZ29ubmEgd29yaywgSSBwcm9taXNl"
@@ -185,7 +190,8 @@ class TestUpdateCompliance(unittest.TestCase):
         self.repo_payload = {'PayloadContent': [{'test': 'test1'}]}
         self.mem_payload = {'PayloadContent': [{'test': 'test'}]}
 
-        self.plistlib.load.side_effect = self.repo_payload, self.mem_payload
+        self.plistlib.load.return_value = self.repo_payload
+        self.plistlib.loads.return_value = self.mem_payload
 
         self.mem_data_base["value"][0]["@odata.type"] = "#microsoft.graph.iosCustomConfiguration"
         self.mem_data_base["value"][0]["payload"] = "T29vIHllYWgsIGl0J3MgZ29ubmEgd29yaywgSSBwcm9taXNl"
@@ -207,7 +213,8 @@ class TestUpdateCompliance(unittest.TestCase):
         self.repo_payload = {'PayloadContent': [{'test': 'test1'}]}
         self.mem_payload = {'PayloadContent': [{'test': 'test'}]}
 
-        self.plistlib.load.side_effect = self.repo_payload, self.mem_payload
+        self.plistlib.load.return_value = self.repo_payload
+        self.plistlib.loads.return_value = self.mem_payload
 
         self.mem_data_base["value"][0]["@odata.type"] = "#microsoft.graph.iosCustomConfiguration"
         self.mem_data_base["value"][0]["payload"] = "T29vIHllYWgsIGl0J3MgZ29ubmEgd29yaywgSSBwcm9taXNl"
@@ -231,7 +238,8 @@ class TestUpdateCompliance(unittest.TestCase):
         self.mem_payload = {'PayloadContent': [{'test': 'test'}]}
         self.repo_data_base["testvalue"] = "test"
 
-        self.plistlib.load.side_effect = self.repo_payload, self.mem_payload
+        self.plistlib.load.return_value = self.repo_payload
+        self.plistlib.loads.return_value = self.mem_payload
 
         self.mem_data_base["value"][0]["@odata.type"] = "#microsoft.graph.iosCustomConfiguration"
         self.mem_data_base["value"][0]["payload"] = "T29vIHllYWgsIGl0J3MgZ29ubmEgd29yaywgSSBwcm9taXNl"
@@ -254,7 +262,8 @@ class TestUpdateCompliance(unittest.TestCase):
         self.mem_payload = {'PayloadContent': [{'test': 'test'}]}
         self.repo_data_base["testvalue"] = "test"
 
-        self.plistlib.load.side_effect = self.repo_payload, self.mem_payload
+        self.plistlib.load.return_value = self.repo_payload
+        self.plistlib.loads.return_value = self.mem_payload
 
         self.mem_data_base["value"][0]["@odata.type"] = "#microsoft.graph.iosCustomConfiguration"
         self.mem_data_base["value"][0]["payload"] = "T29vIHllYWgsIGl0J3MgZ29ubmEgd29yaywgSSBwcm9taXNl"
@@ -513,6 +522,43 @@ class TestUpdateCompliance(unittest.TestCase):
         self.assertEqual(self.makeapirequestPost.call_count, 1)
         self.assertEqual(self.post_assignment_update.call_count, 1)
 
+    def test_update_custom_macOS_no_temp_file(self):
+        """The payload should be compared in memory without writing a temp.mobileconfig file."""
+
+        self.repo_payload = {'PayloadContent': [{'test': 'test1'}]}
+        self.mem_payload = {'PayloadContent': [{'test': 'test'}]}
+
+        self.plistlib.load.return_value = self.repo_payload
+        self.plistlib.loads.return_value = self.mem_payload
+
+        self.mem_data_base["value"][0]["@odata.type"] = "#microsoft.graph.macOSCustomConfiguration"
+        self.mem_data_base["value"][0]["payload"] = "T29vIHllYWgsIGl0J3MgZ29ubmEgd29yaywgSSBwcm9taXNl"
+        self.mem_data_base["value"][0]["payloadFileName"] = "test.mobileconfig"
+
+        self.repo_data_base["@odata.type"] = "#microsoft.graph.macOSCustomConfiguration"
+        self.repo_data_base["payload"] = "T29vIHllYWgsIGl0J3MgZ29ubmEgd29yaywgSSBwcm9taXNl"
+        self.repo_data_base["payloadFileName"] = "test.mobileconfig"
+
+        update(self.directory.path, self.token, assignment=False)
+
+        self.plistlib.loads.assert_called_once_with(b"Ooo yeah, it's gonna work, I promise")
+        self.assertFalse(os.path.exists(self.directory.path + "/Device Configurations/temp.mobileconfig"))
+
+
+class TestPayloadHash(unittest.TestCase):
+    """Test class for payload_hash."""
+
+    def test_payload_hash_key_order(self):
+        """The hash should be the same regardless of key order."""
+
+        self.assertEqual(payload_hash({'a': 1, 'b': [{'c': 2, 'd': 3}]}),
+                         payload_hash({'b': [{'d': 3, 'c': 2}], 'a': 1}))
+
+    def test_payload_hash_different_values(self):
+        """The hash should differ when a value differs."""
+
+        self.assertNotEqual(payload_hash({'a': 1}), payload_hash({'a': 2}))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the archive_output module.
+"""
+
+import io
+import os
+import json
+import tarfile
+import contextlib
+import unittest
+
+from pathlib import Path
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from src.IntuneCD.archive_output import (open_archive, close_archive, discard_archive, extract_archive, open_backup,
+                                         ARCHIVE_NAME)
+from src.IntuneCD.delta import delta_state
+from src.IntuneCD.run_backup import start
+from src.IntuneCD.save_output import save_output, save_text
+
+
+class TestArchiveOutput(unittest.TestCase):
+    """Test class for archive_output."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.path = self.directory.path
+        self.archive_path = f"{self.path}/{ARCHIVE_NAME}"
+
+    def tearDown(self):
+        close_archive()
+        self.directory.cleanup()
+
+    def test_archive_roundtrip(self):
+        """Files saved to the archive should be extracted to the same layout as a directory backup."""
+        open_archive(self.path)
+        save_output('archive', f"{self.path}/Device Configurations/", "test", {"displayName": "test"})
+        save_text('archive', f"{self.path}/Device Configurations/mobileconfig/", "test.mobileconfig", "payload")
+        close_archive()
+
+        self.assertTrue(Path(self.archive_path).exists())
+        self.assertFalse(Path(f"{self.path}/Device Configurations").exists())
+
+        with open_backup(self.archive_path) as backup_path:
+            with open(f"{backup_path}/Device Configurations/test.json") as f:
+                self.assertEqual(json.load(f), {"displayName": "test"})
+            with open(f"{backup_path}/Device Configurations/mobileconfig/test.mobileconfig") as f:
+                self.assertEqual(f.read(), "payload")
+
+        self.assertFalse(Path(backup_path).exists())
+
+    def test_discard_archive(self):
+        """A discarded archive should be removed and the last archive kept."""
+        open_archive(self.path)
+        save_output('archive', f"{self.path}/Device Configurations/", "test", {"displayName": "test"})
+        close_archive()
+        open_archive(self.path)
+        discard_archive()
+
+        self.assertEqual(os.listdir(self.path), [ARCHIVE_NAME])
+
+    @patch("src.IntuneCD.run_backup.getAuth", return_value={"accessToken": "token"})
+    @patch("src.IntuneCD.run_backup.run_backup", side_effect=Exception("backup failed"))
+    def test_failed_backup(self, mock_run_backup, mock_getAuth):
+        """A failed backup should remove its archive and close the resources opened for the run."""
+        argv = ["IntuneCD-startbackup", "-o", "archive", "-p", self.path, "--delta", f"{self.path}/delta.json"]
+
+        with patch("sys.argv", argv), contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(Exception):
+                start()
+
+        self.assertEqual(os.listdir(self.path), ["delta.json"])
+        self.assertIsNone(delta_state['path'])
+
+    @patch("src.IntuneCD.run_backup.open_delta")
+    def test_invalid_output(self, mock_open_delta):
+        """An invalid output format should be reported before any resources are opened."""
+        argv = ["IntuneCD-startbackup", "-o", "csv", "-p", self.path, "--delta", f"{self.path}/delta.json"]
+
+        with patch("sys.argv", argv), contextlib.redirect_stdout(io.StringIO()) as output:
+            start()
+
+        self.assertIn("Please enter a valid output format", output.getvalue())
+        self.assertEqual(mock_open_delta.call_count, 0)
+
+    def test_open_backup_directory(self):
+        """A directory should be returned as is."""
+        with open_backup(self.path) as backup_path:
+            self.assertEqual(backup_path, self.path)
+
+    def test_save_output_no_archive_open(self):
+        """An exception should be raised if no archive is open."""
+        with self.assertRaises(Exception):
+            save_output('archive', f"{self.path}/Filters/", "test", {})
+
+    def test_extract_archive_unsafe_path(self):
+        """An exception should be raised if the archive contains paths outside the target directory."""
+        with tarfile.open(self.archive_path, mode='w:gz') as tar:
+            info = tarfile.TarInfo("../evil.json")
+            info.size = 2
+            tar.addfile(info, io.BytesIO(b"{}"))
+
+        with self.assertRaises(Exception):
+            extract_archive(self.archive_path, f"{self.path}/extract")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+"""
+This module tests comparing benchmark results with a baseline.
+"""
+
+import unittest
+
+from benchmarks.suite import compare_results
+
+
+def _results(wall_seconds, requests):
+    return {'results': [{'size': 100, 'phase': 'backup', 'wall_seconds': wall_seconds, 'cpu_seconds': 1.0,
+                         'peak_rss_kb': 1000, 'requests': requests}]}
+
+
+class TestCompareResults(unittest.TestCase):
+    """Test class for compare_results."""
+
+    def test_no_regression(self):
+        """Measurements within the tolerance should not be reported."""
+        self.regressions = compare_results(_results(1.1, 50), _results(1.0, 50))
+
+        self.assertEqual(self.regressions, [])
+
+    def test_regression(self):
+        """Measurements higher than the tolerance should be reported."""
+        self.regressions = compare_results(_results(2.0, 60), _results(1.0, 50), tolerance=0.1)
+
+        self.assertEqual(len(self.regressions), 2)
+        self.assertTrue(self.regressions[0].startswith("100 backup: wall_seconds"))
+
+    def test_size_not_in_baseline(self):
+        """Results without a baseline should not be compared."""
+        self.baseline = {'results': []}
+
+        self.assertEqual(compare_results(_results(2.0, 60), self.baseline), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
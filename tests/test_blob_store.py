@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the blob_store module.
+"""
+
+import os
+import unittest
+
+from testfixtures import TempDirectory
+from src.IntuneCD.blob_store import save_blob, load_blob, resolve_blobs, get_repo_content, is_blob_reference
+
+
+class TestBlobStore(unittest.TestCase):
+    """Test class for blob_store."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.path = self.directory.path
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_blob_dedupe(self):
+        """The same content should be saved once and return the same reference."""
+        self.ref1 = save_blob('json', self.path, 'Write-Host "test"')
+        self.ref2 = save_blob('json', self.path, b'Write-Host "test"')
+
+        self.assertEqual(self.ref1, self.ref2)
+        self.assertTrue(is_blob_reference(self.ref1))
+        self.assertEqual(len(os.listdir(f'{self.path}/Blobs')), 1)
+        self.assertEqual(load_blob(self.path, self.ref1), b'Write-Host "test"')
+
+    def test_load_blob_hash_mismatch(self):
+        """An exception should be raised if the blob content does not match the hash."""
+        self.ref = save_blob('json', self.path, 'test')
+        self.directory.write(f"Blobs/{self.ref.split(':')[1]}", 'changed', encoding='utf-8')
+
+        with self.assertRaises(Exception):
+            load_blob(self.path, self.ref)
+
+    def test_resolve_blobs(self):
+        """Blob references should be replaced with the base64 encoded content."""
+        self.data = {'displayName': 'test', 'scriptContent': save_blob('json', self.path, 'test')}
+
+        self.blobs = resolve_blobs(self.path, self.data)
+
+        self.assertEqual(self.data, {'displayName': 'test', 'scriptContent': 'dGVzdA=='})
+        self.assertEqual(self.blobs, {'scriptContent': b'test'})
+
+    def test_get_repo_content(self):
+        """Content should be read from the blob if resolved, else from the file, else None."""
+        self.directory.write('Script Data/test.ps1', 'from file', encoding='utf-8')
+
+        self.assertEqual(get_repo_content('missing', {'scriptContent': b'from blob'}, 'scriptContent'), 'from blob')
+        self.assertEqual(get_repo_content(f'{self.path}/Script Data/test.ps1', {}, 'scriptContent'), 'from file')
+        self.assertIsNone(get_repo_content(f'{self.path}/Script Data/missing.ps1', {}, 'scriptContent'))
+
+    def test_is_blob_reference(self):
+        """Only sha256 references should be recognised."""
+        self.assertFalse(is_blob_reference('sha256:test'))
+        self.assertFalse(is_blob_reference({'value': 'test'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
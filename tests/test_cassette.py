@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""
+This module tests recording and replaying Graph traffic with a cassette.
+"""
+
+import io
+import os
+import gzip
+import json
+import contextlib
+import unittest
+
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from benchmarks.tenant import generate_tenant
+from benchmarks.graph_server import GraphServer
+from src.IntuneCD.graph_request import makeapirequest, set_graph_url
+from src.IntuneCD.cassette import record_cassette, replay_cassette, finish_cassette
+from src.IntuneCD.run_backup import run_backup
+from src.IntuneCD.run_update import start as start_update
+
+TOKEN = {"accessToken": "token"}
+FILTERS = "https://graph.microsoft.com/beta/deviceManagement/assignmentFilters"
+
+
+def read_backup(path):
+    files = {}
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            with open(os.path.join(root, name)) as f:
+                files[os.path.relpath(os.path.join(root, name), path)] = f.read()
+    return files
+
+
+class TestCassette(unittest.TestCase):
+    """Test class for cassette."""
+
+    def setUp(self):
+        # Requests are sent for real, restore functions left patched by other test modules
+        patch.stopall()
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.cassette = os.path.join(self.directory.path, 'cassette.jsonl.gz')
+        self.tenant = generate_tenant(50, seed=2)
+        self.server = GraphServer(self.tenant, page_size=10)
+        set_graph_url(self.server.start())
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            finish_cassette()
+        set_graph_url(None)
+        self.server.stop()
+        self.directory.cleanup()
+
+    def record(self, func):
+        record_cassette(self.cassette)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+            finish_cassette()
+        return result
+
+    def test_replay_request(self):
+        """A replayed request should get the recorded response without sending a request."""
+        self.recorded = self.record(lambda: makeapirequest(FILTERS, TOKEN))
+        self.server.stop()
+
+        replay_cassette(self.cassette)
+        self.replayed = makeapirequest(FILTERS, TOKEN)
+
+        self.assertEqual(self.replayed, self.recorded)
+
+    def test_replay_in_order(self):
+        """Identical requests should get their responses in the order they were recorded."""
+        def changed():
+            first = makeapirequest(FILTERS, TOKEN)
+            self.tenant.remove('deviceManagement/assignmentFilters/' + first['value'][0]['id'])
+            return first, makeapirequest(FILTERS, TOKEN)
+
+        self.first, self.second = self.record(changed)
+
+        replay_cassette(self.cassette)
+
+        self.assertEqual(makeapirequest(FILTERS, TOKEN), self.first)
+        self.assertEqual(makeapirequest(FILTERS, TOKEN), self.second)
+        self.assertEqual(makeapirequest(FILTERS, TOKEN), self.second)
+
+    def test_request_not_recorded(self):
+        """A request missing from the cassette should raise."""
+        self.record(lambda: makeapirequest(FILTERS, TOKEN))
+
+        replay_cassette(self.cassette)
+
+        with self.assertRaises(Exception) as context:
+            makeapirequest(FILTERS, TOKEN, {"$select": "displayName"})
+
+        self.assertIn("Request not found in cassette", str(context.exception))
+
+    def test_unsupported_version(self):
+        """A cassette with another version should not be replayed."""
+        self.record(lambda: None)
+        with open(self.cassette, 'rb') as f:
+            lines = gzip.decompress(f.read()).decode().splitlines()
+        lines[0] = json.dumps({'version': 0})
+        with open(self.cassette, 'wb') as f:
+            f.write(gzip.compress('\n'.join(lines).encode()))
+
+        with self.assertRaises(ValueError):
+            replay_cassette(self.cassette)
+
+    def test_replay_backup(self):
+        """A replayed backup should save the same files as the recorded backup."""
+        self.recorded_path = os.path.join(self.directory.path, 'recorded')
+        self.replayed_path = os.path.join(self.directory.path, 'replayed')
+        self.record(lambda: run_backup(self.recorded_path, 'json', [], TOKEN))
+        self.server.stop()
+
+        replay_cassette(self.cassette)
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_backup(self.replayed_path, 'json', [], TOKEN)
+
+        self.assertEqual(read_backup(self.replayed_path), read_backup(self.recorded_path))
+
+    def test_record_failed_update(self):
+        """The requests of an update that failed should be saved to the cassette."""
+        def failed_update(*args):
+            self.recorded = makeapirequest(FILTERS, TOKEN)
+            raise Exception("update failed")
+
+        argv = ["IntuneCD-startupdate", "-p", self.directory.path, "--record", self.cassette]
+        with patch("sys.argv", argv), patch("src.IntuneCD.run_update.getAuth", return_value=TOKEN), \
+                patch("src.IntuneCD.run_update.run_update", side_effect=failed_update), \
+                contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(Exception):
+                start_update()
+        self.server.stop()
+
+        replay_cassette(self.cassette)
+
+        self.assertEqual(makeapirequest(FILTERS, TOKEN), self.recorded)
+
+
+if __name__ == '__main__':
+    unittest.main()
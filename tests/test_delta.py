@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+"""
+This module tests listing collections with delta requests.
+"""
+
+import io
+import os
+import contextlib
+import unittest
+
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from benchmarks.tenant import generate_tenant
+from benchmarks.graph_server import GraphServer
+from src.IntuneCD.graph_request import makeapirequest, set_graph_url
+from src.IntuneCD.graph_async import run_async
+from src.IntuneCD.delta import open_delta, close_delta, delta_state
+from src.IntuneCD.run_backup import run_backup
+from src.IntuneCD.run_update import start as start_update
+
+TOKEN = {"accessToken": "token"}
+PROFILES = "https://graph.microsoft.com/beta/deviceManagement/deviceConfigurations"
+APNS = "https://graph.microsoft.com/beta/deviceManagement/applePushNotificationCertificate"
+
+
+def read_backup(path):
+    files = {}
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            with open(os.path.join(root, name)) as f:
+                files[os.path.relpath(os.path.join(root, name), path)] = f.read()
+    return files
+
+
+class TestDelta(unittest.TestCase):
+    """Test class for delta."""
+
+    def setUp(self):
+        # Requests are sent for real, restore functions left patched by other test modules
+        patch.stopall()
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.state = os.path.join(self.directory.path, 'delta.json')
+        self.tenant = generate_tenant(100, seed=5)
+        self.server = GraphServer(self.tenant, page_size=10)
+        set_graph_url(self.server.start())
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            close_delta()
+        set_graph_url(None)
+        self.server.stop()
+        self.directory.cleanup()
+
+    def next_run(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            close_delta()
+        open_delta(self.state)
+
+    def test_delta(self):
+        """Changed, added and removed objects should be applied to the collection listed in the last run."""
+        open_delta(self.state)
+        self.first = makeapirequest(PROFILES, TOKEN)
+        self.tenant.remove('deviceManagement/deviceConfigurations/' + self.first['value'][0]['id'])
+        self.tenant.get_object('deviceManagement/deviceConfigurations/' + self.first['value'][1]['id'])[
+            'displayName'] = 'Changed'
+        self.tenant.touch('deviceManagement/deviceConfigurations/' + self.first['value'][1]['id'])
+        self.tenant.add('deviceManagement/deviceConfigurations', {'displayName': 'Added'})
+
+        self.next_run()
+        self.requests = self.server.stats['requests']
+        self.second = makeapirequest(PROFILES, TOKEN)
+        self.requests = self.server.stats['requests'] - self.requests
+
+        self.assertEqual(self.second['value'], makeapirequest(PROFILES + '?$top=100', TOKEN)['value'])
+        self.assertEqual(self.requests, 1)
+
+    def test_unsupported(self):
+        """Collections without delta support should be listed in full and not requested with delta again."""
+        open_delta(self.state)
+        with contextlib.redirect_stdout(io.StringIO()):
+            makeapirequest(APNS, TOKEN)
+
+        self.next_run()
+        self.requests = self.server.stats['requests']
+        with contextlib.redirect_stdout(io.StringIO()):
+            makeapirequest(APNS, TOKEN)
+
+        self.assertEqual(delta_state['collections'][APNS], {'supported': False})
+        self.assertEqual(self.server.stats['requests'] - self.requests, 1)
+
+    def test_expired(self):
+        """A delta link Graph no longer accepts should be replaced by listing the collection with delta."""
+        open_delta(self.state)
+        self.first = makeapirequest(PROFILES, TOKEN)
+        delta_state['collections'][PROFILES]['deltaLink'] = PROFILES + '/delta?$deltatoken=invalid'
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.second = makeapirequest(PROFILES, TOKEN)
+
+        self.assertEqual(self.second, self.first)
+
+    def test_async(self):
+        """The asyncio client should list collections with delta, the same as makeapirequest."""
+        open_delta(self.state)
+        self.first = makeapirequest(PROFILES, TOKEN)
+        self.tenant.remove('deviceManagement/deviceConfigurations/' + self.first['value'][0]['id'])
+
+        async def get(client):
+            return await client.makeapirequest(PROFILES)
+
+        self.next_run()
+        self.second = run_async(get, token=TOKEN)
+
+        self.assertEqual(self.second['value'], self.first['value'][1:])
+
+    def test_backup(self):
+        """A backup listing collections with delta should save the same files as a full backup."""
+        self.full_path = os.path.join(self.directory.path, 'full')
+        self.delta_path = os.path.join(self.directory.path, 'delta')
+        open_delta(self.state)
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_backup(os.path.join(self.directory.path, 'first'), 'json', [], TOKEN)
+            for collection in ('deviceManagement/deviceConfigurations', 'deviceManagement/configurationPolicies'):
+                self.tenant.remove(f"{collection}/{self.tenant.collections[collection][0]['id']}")
+            self.next_run()
+            run_backup(self.delta_path, 'json', [], TOKEN, concurrency=4)
+            close_delta()
+            run_backup(self.full_path, 'json', [], TOKEN)
+
+        self.assertEqual(read_backup(self.delta_path), read_backup(self.full_path))
+
+    def test_failed_update(self):
+        """The delta links of an update that failed should be saved for the next run."""
+        def failed_update(*args):
+            makeapirequest(PROFILES, TOKEN)
+            raise Exception("update failed")
+
+        argv = ["IntuneCD-startupdate", "-p", self.directory.path, "--delta", self.state]
+        with patch("sys.argv", argv), patch("src.IntuneCD.run_update.getAuth", return_value=TOKEN), \
+                patch("src.IntuneCD.run_update.run_update", side_effect=failed_update), \
+                contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(Exception):
+                start_update()
+
+        open_delta(self.state)
+        self.assertIn('deltaLink', delta_state['collections'][PROFILES])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the documentation cache.
+"""
+
+import os
+import json
+import unittest
+
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from src.IntuneCD.doc_cache import start_doc_cache, finish_doc_cache, DOC_CACHE_NAME
+from src.IntuneCD.documentation_functions import document_configs, render_config
+
+
+class TestDocCache(unittest.TestCase):
+    """Test class for the documentation cache."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.path = self.directory.path
+        self.directory.write("backup/Filters/a.json", '{"displayName": "a", "value": "1"}', encoding="utf-8")
+        self.directory.write("backup/Filters/b.json", '{"displayName": "b", "value": "2"}', encoding="utf-8")
+
+    def tearDown(self):
+        finish_doc_cache()
+        self.directory.cleanup()
+
+    def document(self, max_length=None):
+        start_doc_cache(self.path, f"{self.path}/backup")
+        with patch("src.IntuneCD.documentation_functions.render_config", wraps=render_config) as render:
+            document_configs(f"{self.path}/backup/Filters", f"{self.path}/README.md", "Filters", max_length, False)
+        finish_doc_cache()
+        with open(f"{self.path}/README.md") as f:
+            content = f.read()
+        os.remove(f"{self.path}/README.md")
+        return render, content
+
+    def test_unchanged_files_are_not_rendered(self):
+        """Files that did not change should be taken from the cache."""
+        self.render, self.first = self.document()
+        self.render, self.second = self.document()
+
+        self.assertEqual(self.render.call_count, 0)
+        self.assertEqual(self.first, self.second)
+
+    def test_changed_file_is_rendered(self):
+        """Only the changed file should be rendered again."""
+        self.document()
+        self.directory.write("backup/Filters/b.json", '{"displayName": "b", "value": "3"}', encoding="utf-8")
+        self.render, self.content = self.document()
+
+        self.assertEqual(self.render.call_count, 1)
+        self.assertIn("|value      |3    |", self.content)
+
+    def test_options_change_renders_all(self):
+        """Fragments rendered with other options should not be used."""
+        self.document()
+        self.render, self.content = self.document(max_length=100)
+
+        self.assertEqual(self.render.call_count, 2)
+
+    def test_removed_files_are_dropped(self):
+        """Files that are no longer in the backup should be removed from the cache."""
+        self.document()
+        os.remove(f"{self.path}/backup/Filters/b.json")
+        self.document()
+
+        with open(f"{self.path}/{DOC_CACHE_NAME}") as f:
+            self.cache = json.load(f)
+
+        self.assertEqual(list(self.cache['fragments']), ["Filters/a.json"])
+
+    def test_invalid_cache(self):
+        """An invalid cache file should be ignored."""
+        self.directory.write(DOC_CACHE_NAME, "not json", encoding="utf-8")
+        self.render, self.content = self.document()
+
+        self.assertEqual(self.render.call_count, 2)
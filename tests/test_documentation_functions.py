@@ -1,4 +1,7 @@
+import os
 import unittest
+
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from testfixtures import TempDirectory
@@ -9,7 +12,11 @@ from src.IntuneCD.documentation_functions import md_file, \
     clean_list, \
     document_configs, \
     document_management_intents, \
-    get_md_files
+    get_md_files, \
+    get_config_files, \
+    render_config, \
+    render_settings_catalog, \
+    settings_catalog_rows
 
 
 class TestDocumentationFunctions(unittest.TestCase):
@@ -100,6 +107,21 @@ class TestDocumentationFunctions(unittest.TestCase):
 
         self.assertEqual(self.result, self.expected_list)
 
+    def test_clean_list_list_of_dicts(self):
+        """Only the last dict in a list should be displayed and the data should not be changed."""
+        self.data = [[{"a": "1"}, {"b": "x" * 201}, "text"]]
+
+        self.result = clean_list(self.data)
+
+        self.assertEqual(self.result, ['b: <details><summary>Click to expand...</summary>' + "x" * 201 + '</details>'])
+        self.assertEqual(self.data[0][1], {"b": "x" * 201})
+
+    def test_clean_list_list_of_lists(self):
+        """Nested lists should be displayed comma separated."""
+        self.result = clean_list([[["a", "b"]]])
+
+        self.assertEqual(self.result, ['a,b,'])
+
     def test_document_configs(self):
         """The list should be returned."""
         self.directory.write(
@@ -138,3 +160,112 @@ class TestDocumentationFunctions(unittest.TestCase):
             self.result = ''.join([line.strip() for line in self.data])
 
         self.assertEqual(self.result, self.expected_data)
+
+    def test_document_configs_executor(self):
+        """The output should be the same when rendering in worker processes."""
+        for i in range(5):
+            self.directory.write(
+                f"config/test_{i}.json",
+                '{"name": "test%s", "description": "test", "value": "%s"}' % (i, "x" * i * 4),
+                encoding="utf-8")
+
+        document_configs(f"{self.directory.path}/config", f"{self.directory.path}/serial.md", 'test', 10,
+                         split=False)
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            document_configs(f"{self.directory.path}/config", f"{self.directory.path}/parallel.md", 'test', 10,
+                             split=False, executor=executor)
+
+        with open(f"{self.directory.path}/serial.md", "r") as f:
+            serial = f.read()
+        with open(f"{self.directory.path}/parallel.md", "r") as f:
+            parallel = f.read()
+
+        self.assertEqual(serial, parallel)
+        self.assertLess(serial.index('## test0'), serial.index('## test4'))
+
+    def test_get_config_files(self):
+        """Only JSON and YAML files should be returned, sorted."""
+        self.directory.write("config/b.yaml", "name: b", encoding="utf-8")
+        self.directory.write("config/A.json", '{"name": "a"}', encoding="utf-8")
+        self.directory.write("config/script.ps1", "test", encoding="utf-8")
+        self.directory.write("config/test.md", "test", encoding="utf-8")
+
+        files = get_config_files(f"{self.directory.path}/config")
+
+        self.assertEqual([Path(f).name for f in files], ['A.json', 'b.yaml'])
+
+    def test_render_config(self):
+        """The Markdown for the configuration should be returned."""
+        self.directory.write("config/test.json", '{"name": "test", "value": "too long value"}', encoding="utf-8")
+
+        result = render_config(f"{self.directory.path}/config/test.json", max_length=5)
+
+        self.assertTrue(result.startswith('## test\n'))
+        self.assertIn('Value too long to display', result)
+
+    def test_document_configs_split_unchanged(self):
+        """The split file should not be written again if the content did not change."""
+        self.directory.write("config/test.json", '{"name": "test"}', encoding="utf-8")
+
+        document_configs(f"{self.directory.path}/config", None, 'test', None, split=True)
+        os.utime(f"{self.directory.path}/config/test.md", (0, 0))
+        document_configs(f"{self.directory.path}/config", None, 'test', None, split=True)
+
+        self.assertEqual(os.path.getmtime(f"{self.directory.path}/config/test.md"), 0)
+
+    def test_get_md_files(self):
+        """Markdown files one to three folders down from the current directory should be returned."""
+        self.directory.write("index.md", "test", encoding="utf-8")
+        self.directory.write("config/config.md", "test", encoding="utf-8")
+        self.directory.write("intent/test/intent.md", "test", encoding="utf-8")
+        self.directory.write("a/b/c/d/deep.md", "test", encoding="utf-8")
+
+        cwd = os.getcwd()
+        os.chdir(self.directory.path)
+        try:
+            self.files = get_md_files()
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(self.files, ['./config/config.md', './intent/test/intent.md'])
+
+    def test_settings_catalog_rows(self):
+        """Each setting should be one row, children should follow their parent."""
+        self.settings = [
+            {'id': '0', 'settingInstance': {
+                '@odata.type': '#microsoft.graph.deviceManagementConfigurationChoiceSettingInstance',
+                'settingDefinitionId': 'choice',
+                'choiceSettingValue': {'value': 'choice_1', 'children': [
+                    {'settingDefinitionId': 'child', 'simpleSettingValue': {'value': 5}}]}}},
+            {'id': '1', 'settingInstance': {
+                'settingDefinitionId': 'group',
+                'groupSettingCollectionValue': [{'children': [
+                    {'settingDefinitionId': 'collection', 'simpleSettingCollectionValue': [
+                        {'value': 'a'}, {'value': 'b'}]}]}]}}]
+
+        self.rows = settings_catalog_rows(self.settings)
+
+        self.assertEqual(self.rows, [['choice', '1'], ['child', '5'], ['collection', 'a, b']])
+
+    def test_settings_catalog_rows_deep(self):
+        """Deeply nested settings should not hit the recursion limit."""
+        instance = {'settingDefinitionId': 'leaf', 'simpleSettingValue': {'value': 'x'}}
+        for i in range(5000):
+            instance = {'settingDefinitionId': f'group{i}', 'groupSettingValue': {'children': [instance]}}
+
+        self.rows = settings_catalog_rows([{'settingInstance': instance}])
+
+        self.assertEqual(self.rows, [['leaf', 'x']])
+
+    def test_render_settings_catalog(self):
+        """The settings should be written as rows of the configuration table."""
+        self.directory.write(
+            "config/test.json",
+            '{"name": "test", "settings": [{"settingInstance": {"settingDefinitionId": "setting", '
+            '"choiceSettingValue": {"value": "setting_true", "children": []}}}]}',
+            encoding="utf-8")
+
+        self.result = render_settings_catalog(f"{self.directory.path}/config/test.json")
+        self.result = ''.join(self.result.split())
+
+        self.assertEqual(self.result, '##test|setting|value||-------|-----||name|test||setting|true|')
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the get_accesstoken module.
+"""
+
+import os
+import stat
+import unittest
+import threading
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from src.IntuneCD import get_accesstoken
+from src.IntuneCD.get_accesstoken import obtain_accesstoken
+
+
+def _token(name, expires_in=3600, tenant='tenant'):
+    return {
+        'tokenType': 'Bearer',
+        'accessToken': name,
+        'expiresIn': expires_in,
+        'expiresOn': str(datetime.now() + timedelta(seconds=expires_in)),
+        'resource': 'https://graph.microsoft.com',
+        '_clientId': 'client',
+        '_authority': f'https://login.microsoftonline.com/{tenant}'
+    }
+
+
+@patch("adal.AuthenticationContext.acquire_token_with_client_credentials")
+class TestTokenProvider(unittest.TestCase):
+    """Test class for TokenProvider."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        get_accesstoken.token_caches.clear()
+
+    def tearDown(self):
+        get_accesstoken.token_caches.clear()
+        self.directory.cleanup()
+
+    def test_token_is_reused(self, mock_acquire):
+        """The token should only be acquired once while it is valid."""
+        mock_acquire.return_value = _token("first")
+
+        self.token = obtain_accesstoken("tenant", "client", "secret", "https://graph.microsoft.com")
+
+        self.assertEqual(self.token['accessToken'], "first")
+        self.assertEqual(self.token['accessToken'], "first")
+        self.assertEqual(mock_acquire.call_count, 1)
+
+    def test_token_is_refreshed_before_expiry(self, mock_acquire):
+        """A token that expires within the refresh margin should be refreshed."""
+        mock_acquire.side_effect = [_token("first", expires_in=60), _token("second")]
+
+        self.token = obtain_accesstoken("tenant", "client", "secret", "https://graph.microsoft.com")
+
+        self.assertEqual(self.token['accessToken'], "second")
+        self.assertEqual(mock_acquire.call_count, 2)
+
+    def test_invalidate(self, mock_acquire):
+        """An invalidated token should be acquired again."""
+        mock_acquire.side_effect = [_token("first"), _token("second")]
+
+        self.token = obtain_accesstoken("tenant", "client", "secret", "https://graph.microsoft.com")
+        self.token.invalidate()
+
+        self.assertEqual(self.token['accessToken'], "second")
+
+    def test_invalidate_shared_cache(self, mock_acquire):
+        """Invalidating the token of a tenant should keep the tokens of other tenants using the same app."""
+        cache_path = f"{self.directory.path}/token_cache.json"
+        cache = get_accesstoken.load_token_cache(cache_path)
+        cache.add([_token("first", tenant="first"), _token("second", tenant="second")])
+        mock_acquire.return_value = _token("first")
+
+        self.token = obtain_accesstoken("first", "client", "secret", "https://graph.microsoft.com", cache_path)
+        self.token.invalidate()
+
+        self.assertEqual([entry['accessToken'] for entry in cache.find({'_clientId': 'client'})], ["second"])
+
+    def test_token_cache_saved_in_parallel(self, mock_acquire):
+        """Tenants saving the same token cache at the same time should all save it."""
+        cache_path = f"{self.directory.path}/token_cache.json"
+        cache = get_accesstoken.load_token_cache(cache_path)
+        errors = []
+
+        def save():
+            try:
+                for i in range(20):
+                    get_accesstoken.save_token_cache(cache_path, cache)
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.directory.path), ["token_cache.json"])
+
+    def test_token_cache_on_disk(self, mock_acquire):
+        """The token cache should be saved readable only by the user and loaded by the next run."""
+        cache_path = f"{self.directory.path}/token_cache.json"
+        cache = get_accesstoken.load_token_cache(cache_path)
+
+        def acquire(**kwargs):
+            # ADAL adds new tokens to the cache of the authentication context
+            cache.add([_token("cached")])
+            return _token("cached")
+
+        mock_acquire.side_effect = acquire
+        obtain_accesstoken("tenant", "client", "secret", "https://graph.microsoft.com", cache_path)
+        get_accesstoken.token_caches.clear()
+
+        self.assertEqual(stat.S_IMODE(os.stat(cache_path).st_mode), 0o600)
+        self.assertEqual(len(get_accesstoken.load_token_cache(cache_path).find({'_clientId': 'client'})), 1)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the asyncio Graph client.
+"""
+
+import io
+import os
+import time
+import asyncio
+import threading
+import contextlib
+import unittest
+
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from benchmarks.tenant import generate_tenant
+from benchmarks.graph_server import GraphServer
+from src.IntuneCD.graph_request import makeapirequest, set_graph_url
+from src.IntuneCD.graph_batch import batch_request, batch_assignment
+from src.IntuneCD.graph_async import run_async
+from src.IntuneCD.run_backup import run_backup
+
+TOKEN = {"accessToken": "token"}
+POLICIES = "https://graph.microsoft.com/beta/deviceManagement/configurationPolicies"
+
+
+def read_backup(path):
+    files = {}
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            with open(os.path.join(root, name)) as f:
+                files[os.path.relpath(os.path.join(root, name), path)] = f.read()
+    return files
+
+
+class TestGraphAsync(unittest.TestCase):
+    """Test class for graph_async."""
+
+    def setUp(self):
+        # Requests are sent for real, restore functions left patched by other test modules
+        patch.stopall()
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.tenant = generate_tenant(100, seed=4)
+        self.server = GraphServer(self.tenant, page_size=10)
+        set_graph_url(self.server.start())
+
+    def tearDown(self):
+        set_graph_url(None)
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_makeapirequest(self):
+        """All pages should be returned, the same as makeapirequest."""
+        async def get(client):
+            return await client.makeapirequest(POLICIES)
+
+        self.data = run_async(get, token=TOKEN)
+
+        self.assertEqual(self.data, makeapirequest(POLICIES, TOKEN))
+
+    def test_batch_request(self):
+        """The responses should be in the order requested, the same as batch_request."""
+        self.ids = [obj['id'] for obj in self.tenant.collections['deviceManagement/configurationPolicies']]
+
+        async def get(client):
+            return await client.batch_request(self.ids, 'deviceManagement/configurationPolicies/', '/settings')
+
+        self.responses = run_async(get, token=TOKEN)
+
+        self.assertEqual(self.responses,
+                         batch_request(self.ids, 'deviceManagement/configurationPolicies/', '/settings', TOKEN))
+
+    def test_batch_assignment(self):
+        """Assignments should have the names of groups, the same as batch_assignment."""
+        self.data = makeapirequest(POLICIES, TOKEN)
+
+        async def get(client):
+            return await client.batch_assignment(self.data, 'deviceManagement/configurationPolicies/',
+                                                 '/assignments')
+
+        self.responses = run_async(get, token=TOKEN)
+
+        self.assertEqual(self.responses,
+                         batch_assignment(self.data, 'deviceManagement/configurationPolicies/', '/assignments',
+                                          TOKEN))
+
+    def test_concurrency(self):
+        """No more than the given number of requests should be in flight."""
+        self.in_flight = 0
+        self.max_in_flight = 0
+        lock = threading.Lock()
+
+        def send(method, endpoint, category, kwargs):
+            with lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            time.sleep(0.01)
+            with lock:
+                self.in_flight -= 1
+
+        async def get(client):
+            client._send = send
+            await asyncio.gather(*[client.request('GET', POLICIES) for i in range(20)])
+
+        run_async(get, token=TOKEN, concurrency=3)
+
+        self.assertEqual(self.max_in_flight, 3)
+
+    def test_connections(self):
+        """Connections should be shared with the synchronous requests instead of opened for each request."""
+        async def get(client):
+            await asyncio.gather(*[client.makeapirequest(POLICIES) for i in range(8)])
+
+        run_async(get, token=TOKEN, concurrency=4)
+        makeapirequest(POLICIES, TOKEN)
+
+        self.assertGreater(self.server.stats['requests'], 10)
+        self.assertLessEqual(self.server.stats['connections'], 4)
+
+    def test_backup(self):
+        """A backup with requests sent asynchronously should save the same files."""
+        self.sync_path = os.path.join(self.directory.path, 'sync')
+        self.async_path = os.path.join(self.directory.path, 'async')
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.sync_count = run_backup(self.sync_path, 'json', [], TOKEN)
+            self.async_count = run_backup(self.async_path, 'json', [], TOKEN, concurrency=8)
+
+        self.assertEqual(self.async_count, self.sync_count)
+        self.assertEqual(read_backup(self.async_path), read_backup(self.sync_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
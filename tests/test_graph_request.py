@@ -8,7 +8,8 @@ import unittest
 
 from unittest import mock
 from unittest.mock import patch
-from src.IntuneCD.graph_request import makeapirequest, makeapirequestPost, makeapirequestPut, makeapirequestPatch
+from src.IntuneCD.graph_request import makeapirequest, makeapirequestPost, makeapirequestPut, makeapirequestPatch, \
+    makeapirequest_pages
 
 
 def _mock_response(
@@ -32,7 +33,7 @@ def _mock_response(
 
 
 @patch("src.IntuneCD.graph_request.makeapirequest")
-@patch("requests.get")
+@patch("src.IntuneCD.graph_request.session.get")
 @patch("time.sleep", return_value=None)
 class TestGraphRequestGet(unittest.TestCase):
     """Test class for graph_request."""
@@ -185,8 +186,45 @@ class TestGraphRequestGet(unittest.TestCase):
         self.assertEqual(1, mock_get.call_count)
 
 
+@patch("src.IntuneCD.graph_request.session.get")
+@patch("time.sleep", return_value=None)
+class TestGraphRequestPages(unittest.TestCase):
+    """Test class for makeapirequest_pages."""
+
+    def setUp(self):
+        self.token = {"accessToken": "token"}
+
+    def test_makeapirequest_pages_nextlink(self, mock_sleep, mock_get):
+        """Each page should be yielded separately and the next link followed."""
+        mock_get.side_effect = [
+            _mock_response(self, status=200,
+                           content='{"value": [{"id": "0"}], "@odata.nextLink": "https://endpoint/next"}'),
+            _mock_response(self, status=200, content='{"value": [{"id": "1"}]}')]
+
+        self.result = list(makeapirequest_pages("https://endpoint", self.token, q_param={"$top": "1"}))
+
+        self.assertEqual(self.result, [[{"id": "0"}], [{"id": "1"}]])
+        self.assertEqual(mock_get.call_args_list[1][0][0], "https://endpoint/next")
+        self.assertIsNone(mock_get.call_args_list[1][1]['params'])
+
+    def test_makeapirequest_pages_status_502(self, mock_sleep, mock_get):
+        """The request should be made twice and exception should be raised."""
+        mock_get.return_value = _mock_response(self, status=502, content='request timeout')
+
+        with self.assertRaises(Exception):
+            list(makeapirequest_pages("https://endpoint", self.token))
+
+        self.assertEqual(2, mock_get.call_count)
+
+    def test_makeapirequest_pages_status_404(self, mock_sleep, mock_get):
+        """No pages should be yielded."""
+        mock_get.return_value = _mock_response(self, status=404, content='not found')
+
+        self.assertEqual(list(makeapirequest_pages("https://endpoint", self.token)), [])
+
+
 @patch("src.IntuneCD.graph_request.makeapirequestPatch")
-@patch("requests.patch")
+@patch("src.IntuneCD.graph_request.session.patch")
 class TestGraphRequestPatch(unittest.TestCase):
 
     def setUp(self):
@@ -238,7 +276,7 @@ class TestGraphRequestPatch(unittest.TestCase):
 
 
 @patch("src.IntuneCD.graph_request.makeapirequestPost")
-@patch("requests.post")
+@patch("src.IntuneCD.graph_request.session.post")
 class TestGraphRequestPost(unittest.TestCase):
 
     def setUp(self):
@@ -293,7 +331,7 @@ class TestGraphRequestPost(unittest.TestCase):
 
 
 @patch("src.IntuneCD.graph_request.makeapirequestPut")
-@patch("requests.put")
+@patch("src.IntuneCD.graph_request.session.put")
 class TestGraphRequestPut(unittest.TestCase):
 
     def setUp(self):
@@ -344,5 +382,34 @@ class TestGraphRequestPut(unittest.TestCase):
         self.assertEqual(1, mock_patch.call_count)
 
 
+@patch("src.IntuneCD.graph_request.session.get")
+class TestGraphRequestAuth(unittest.TestCase):
+    """Test class for re-authenticating when the token is rejected."""
+
+    def setUp(self):
+        self.token = mock.MagicMock()
+        self.token.__getitem__.side_effect = ["old", "new"]
+
+    def test_makeapirequest_401(self, mock_get):
+        """The token should be invalidated and the request sent again with a new token."""
+        mock_get.side_effect = [_mock_response(self, status=401, content="unauthorized"),
+                                _mock_response(self, status=200, content='{"value": []}')]
+
+        self.result = makeapirequest("https://endpoint", self.token)
+
+        self.assertEqual(self.result, {"value": []})
+        self.assertEqual(self.token.invalidate.call_count, 1)
+        self.assertEqual(mock_get.call_args_list[1][1]['headers']['Authorization'], "Bearer new")
+
+    def test_makeapirequest_401_dict_token(self, mock_get):
+        """A static token cannot be refreshed, the request should fail."""
+        mock_get.return_value = _mock_response(self, status=401, content="unauthorized")
+
+        with self.assertRaises(Exception):
+            makeapirequest("https://endpoint", {"accessToken": "token"})
+
+        self.assertEqual(mock_get.call_count, 1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the local Graph stand-in used for benchmarking.
+"""
+
+import io
+import os
+import contextlib
+import unittest
+
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from benchmarks.tenant import generate_tenant
+from benchmarks.graph_server import GraphServer
+from src.IntuneCD.graph_request import makeapirequest, set_graph_url
+from src.IntuneCD.graph_batch import batch_request
+from src.IntuneCD.run_backup import run_backup
+from src.IntuneCD.rate_limit import MAX_THROTTLE_RETRIES, set_rate_limit, rate_limit
+
+TOKEN = {"accessToken": "token"}
+FILTERS = "https://graph.microsoft.com/beta/deviceManagement/assignmentFilters"
+
+
+class TestGraphServer(unittest.TestCase):
+    """Test class for graph_server."""
+
+    def setUp(self):
+        # Requests are sent for real, restore functions left patched by other test modules
+        patch.stopall()
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.tenant = generate_tenant(100, seed=1)
+        self.server = GraphServer(self.tenant, page_size=10)
+        set_graph_url(self.server.start())
+        set_rate_limit(None)
+
+    def tearDown(self):
+        rate_limit['limiter'] = None
+        set_graph_url(None)
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_generate_tenant_seeded(self):
+        """The same size and seed should give the same tenant."""
+        self.other = generate_tenant(100, seed=1)
+
+        self.assertEqual(self.other.collections, self.tenant.collections)
+
+    def test_paging(self):
+        """All pages of a collection should be returned."""
+        self.data = makeapirequest(FILTERS, TOKEN)
+
+        self.assertEqual(len(self.data['value']), self.tenant.count()['deviceManagement/assignmentFilters'])
+
+    def test_select(self):
+        """Only the selected fields should be returned."""
+        self.data = makeapirequest(FILTERS, TOKEN, {"$select": "displayName"})
+
+        self.assertEqual(set(self.data['value'][0]), {"id", "displayName"})
+
+    def test_batch(self):
+        """Each request in the batch should be answered, with assignments matched by id."""
+        self.ids = [obj['id'] for obj in self.tenant.collections['deviceManagement/configurationPolicies'][:3]]
+
+        self.responses = batch_request(self.ids, 'deviceManagement/configurationPolicies/', '/assignments', TOKEN)
+
+        self.assertEqual(len(self.responses), 3)
+        self.assertIn(self.ids[0], self.responses[0]['@odata.context'])
+
+    def test_throttle(self):
+        """Throttled requests should be answered with 429."""
+        self.server.throttle = 1.0
+        self.server.retry_after = 0
+        set_rate_limit(1000)
+
+        with contextlib.redirect_stdout(io.StringIO()), self.assertRaises(Exception) as context:
+            makeapirequest(FILTERS, TOKEN)
+
+        self.assertIn(429, context.exception.args)
+        self.assertEqual(self.server.stats['throttled'], 1 + MAX_THROTTLE_RETRIES)
+
+    def test_backup(self):
+        """All generated objects should be backed up."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.count = run_backup(self.directory.path, 'json', [], TOKEN)
+
+        self.assertGreaterEqual(self.count, sum(self.tenant.count().values()))
+
+    def test_backup_throttled(self):
+        """Throttled requests, also in batches, should be sent again so the backup is complete."""
+        self.server.throttle = 0.05
+        self.server.retry_after = 0
+        set_rate_limit(1000)
+        self.expected = os.path.join(self.directory.path, 'expected')
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.count = run_backup(self.directory.path, 'json', [], TOKEN)
+        self.server.throttle = 0.0
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.expected_count = run_backup(self.expected, 'json', [], TOKEN)
+
+        self.assertGreater(self.server.stats['throttled'], 0)
+        self.assertEqual(self.count, self.expected_count)
+
+    def test_backup_sparse_throttling(self):
+        """A few requests throttled at random should not lower the rate of the backup."""
+        self.server.throttle = 0.03
+        self.server.retry_after = 0
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.count = run_backup(self.directory.path, 'json', [], TOKEN)
+
+        self.assertGreater(self.server.stats['throttled'], 0)
+        self.assertIsNone(rate_limit['limiter'].rate)
+        self.assertIsNone(rate_limit['limiter'].floor)
+
+    def test_limit(self):
+        """Requests above the limit should be throttled, and sent again until they succeed."""
+        self.server.limit = 20
+        self.server.retry_after = 0.5
+        set_rate_limit(None)
+        self.filter = self.tenant.collections['deviceManagement/assignmentFilters'][0]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.data = [makeapirequest(f"{FILTERS}/{self.filter['id']}", TOKEN) for i in range(30)]
+
+        self.assertEqual(self.data[-1]['id'], self.filter['id'])
+        self.assertGreater(self.server.stats['throttled'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+This module tests listing objects with only the fields needed to match them with the backup.
+"""
+
+import io
+import contextlib
+import unittest
+
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from benchmarks.tenant import generate_tenant
+from benchmarks.graph_server import GraphServer
+from src.IntuneCD.graph_request import makeapirequest, set_graph_url
+from src.IntuneCD.index_listing import (index_param, record_index, record_details, index_report,
+                                        finish_index_listing)
+from src.IntuneCD.run_backup import run_backup
+from src.IntuneCD.update_powershellScripts import update
+
+TOKEN = {"accessToken": "token"}
+SCRIPTS = "https://graph.microsoft.com/beta/deviceManagement/deviceManagementScripts"
+
+
+class TestIndexListing(unittest.TestCase):
+    """Test class for index_listing."""
+
+    def setUp(self):
+        # Requests are sent for real, restore functions left patched by other test modules
+        patch.stopall()
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.tenant = generate_tenant(100, seed=6)
+        self.server = GraphServer(self.tenant, page_size=10)
+        set_graph_url(self.server.start())
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            finish_index_listing()
+        set_graph_url(None)
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_index_param(self):
+        """The index listing should select the fields to match on."""
+        self.assertEqual(index_param(), {'$select': 'id,lastModifiedDateTime,displayName'})
+        self.assertEqual(index_param('name'), {'$select': 'id,lastModifiedDateTime,name'})
+
+    def test_index_report(self):
+        """The bytes saved should be estimated from the size of the details of the matched objects."""
+        record_index(SCRIPTS, {'value': [{'id': '0'}, {'id': '1'}, {'id': '2'}, {'id': '3'}]})
+        record_details(SCRIPTS, {'id': '0', 'displayName': 'script', 'scriptContent': 'x' * 100})
+
+        self.report = index_report()[SCRIPTS]
+
+        self.assertEqual(self.report['objects'], 4)
+        self.assertEqual(self.report['saved_bytes'],
+                         4 * len('{"id": "0", "displayName": "script", "scriptContent": ""}') + 400
+                         - len('{"value": [{"id": "0"}, {"id": "1"}, {"id": "2"}, {"id": "3"}]}'))
+
+    def test_index_listing(self):
+        """The index listing should only have the selected fields."""
+        self.data = makeapirequest(SCRIPTS, TOKEN, index_param())
+
+        self.assertEqual(set(self.data['value'][0]), {'id', '@odata.type', 'displayName', 'lastModifiedDateTime'})
+
+    def test_update(self):
+        """Updating from a backup of the same tenant should find no differences and report the bytes saved."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_backup(self.directory.path, 'json', [], TOKEN)
+            self.diff_count = update(self.directory.path, TOKEN)
+
+        self.report = index_report()[SCRIPTS]
+
+        self.assertEqual(self.diff_count, 0)
+        self.assertEqual(self.report['objects'],
+                         len(self.tenant.collections['deviceManagement/deviceManagementScripts']))
+        self.assertGreater(self.report['saved_bytes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
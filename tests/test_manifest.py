@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the manifest module.
+"""
+
+import hashlib
+import unittest
+
+from testfixtures import TempDirectory
+from src.IntuneCD.manifest import start_manifest, manifest_category, finish_manifest, load_manifest, \
+    diff_manifest
+from src.IntuneCD.save_output import save_output, save_text
+
+
+class TestManifest(unittest.TestCase):
+    """Test class for manifest."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.path = self.directory.path
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def backup(self, value):
+        start_manifest(self.path)
+        with manifest_category("Filters"):
+            save_output('json', f"{self.path}/Filters/", "test", {"displayName": value}, graph_id="0")
+            save_text('json', f"{self.path}/Filters/Script Data/", "test.ps1", "script")
+        return finish_manifest('json', 1)
+
+    def test_manifest_objects(self):
+        """Every saved object should be recorded with its category, id, path, hash and size."""
+        self.manifest = self.backup("test")
+
+        with open(f"{self.path}/Filters/test.json", 'rb') as f:
+            self.content = f.read()
+
+        self.assertEqual(self.manifest, load_manifest(self.path))
+        self.assertEqual(self.manifest['config_count'], 1)
+        self.assertIn('Filters', self.manifest['categories'])
+        self.assertEqual(self.manifest['objects'][1]['path'], "Filters/test.json")
+        self.assertEqual(self.manifest['objects'][1]['id'], "0")
+        self.assertEqual(self.manifest['objects'][1]['category'], "Filters")
+        self.assertEqual(self.manifest['objects'][1]['sha256'], hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(self.manifest['objects'][1]['size'], len(self.content))
+        self.assertEqual(self.manifest['objects'][0]['path'], "Filters/Script Data/test.ps1")
+
+    def test_manifest_changes(self):
+        """Changes since the previous manifest should be listed."""
+        self.backup("test")
+        self.manifest = self.backup("test1")
+
+        self.assertEqual(self.manifest['changes'], {'added': [], 'changed': ["Filters/test.json"], 'removed': []})
+
+    def test_no_manifest_started(self):
+        """Nothing should be recorded if no manifest has been started."""
+        save_output('json', f"{self.path}/Filters/", "test", {"displayName": "test"})
+
+        self.assertIsNone(load_manifest(self.path))
+
+    def test_diff_manifest(self):
+        """Added, changed and removed paths should be returned."""
+        self.previous = {'objects': [{'path': 'a', 'sha256': '1'}, {'path': 'b', 'sha256': '1'}]}
+        self.current = {'objects': [{'path': 'b', 'sha256': '2'}, {'path': 'c', 'sha256': '1'}]}
+
+        self.assertEqual(diff_manifest(self.previous, self.current),
+                         {'added': ['c'], 'changed': ['b'], 'removed': ['a']})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the MarkdownWriter class.
+"""
+
+import unittest
+
+from testfixtures import TempDirectory
+from markdown_toclify import markdown_toclify
+from src.IntuneCD.markdown_writer import MarkdownWriter
+
+DOCUMENT = [
+    '\n\n# App Configuration\n',
+    '## Policy #1 / v1.0 & more\n',
+    'Description:   # not a header\n    leading spaces\n',
+    '### Assignments \n',
+    '|target|filter type|\n|---|---|\n|All Devices|none|\n',
+    '#nospace\n',
+    '####### seven hashes\n',
+    '    # indented too far\n',
+    '## \n',
+    '[[back to top](#table-of-contents)]\n',
+    '# Filters\n## filter\n',
+    '|setting|value|\n\n  \n'
+]
+
+
+class TestMarkdownWriter(unittest.TestCase):
+    """Test class for MarkdownWriter."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.header = ['# MEM Documentation \n\n', 'intro \n\n']
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def toclify(self, chunks):
+        with open(f"{self.directory.path}/toclify.md", 'w') as f:
+            f.write(''.join(chunks))
+        document = markdown_toclify(input_file=f"{self.directory.path}/toclify.md", back_to_top=True,
+                                    exclude_h=[3])
+        return ''.join(self.header) + document
+
+    def write(self, chunks):
+        writer = MarkdownWriter(f"{self.directory.path}/writer.md", exclude_h=[3])
+        for chunk in chunks:
+            writer.write(chunk)
+        writer.finish(self.header)
+        with open(f"{self.directory.path}/writer.md") as f:
+            return f.read()
+
+    def test_same_as_markdown_toclify(self):
+        """The document should be identical to running markdown_toclify on the written document."""
+        self.assertEqual(self.write(DOCUMENT), self.toclify(DOCUMENT))
+
+    def test_same_as_markdown_toclify_split_lines(self):
+        """Lines split across writes should give the same document."""
+        self.chunks = [char for chunk in DOCUMENT for char in chunk]
+
+        self.assertEqual(self.write(self.chunks), self.toclify(DOCUMENT))
+
+    def test_no_level_one_headlines(self):
+        """Headlines should be moved up one level if there are no level 1 headlines."""
+        self.chunks = ['## first\n', '### excluded\n', '#### third\n']
+
+        self.assertEqual(self.write(self.chunks), self.toclify(self.chunks))
+
+    def test_empty_document(self):
+        """An empty document should only contain the header and table of contents heading."""
+        self.assertEqual(self.write([]), self.toclify([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+"""
+This module tests recording and reporting run metrics.
+"""
+
+import json
+import unittest
+
+from unittest import mock
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from src.IntuneCD.graph_request import makeapirequest, makeapirequestPost
+from src.IntuneCD.graph_batch import batch_request
+from src.IntuneCD.metrics import (start_metrics, finish_metrics, metrics_report, endpoint_name, timed_category,
+                                  metrics)
+from src.IntuneCD.rate_limit import set_rate_limit, rate_limit
+
+
+def _mock_response(status=200, content='{"value": []}'):
+    """Mock the response from the requests library."""
+
+    mock_resp = mock.Mock()
+    mock_resp.status_code = status
+    mock_resp.text = content
+    mock_resp.content = content.encode("utf-8")
+
+    return mock_resp
+
+
+@patch("time.sleep", return_value=None)
+class TestMetrics(unittest.TestCase):
+    """Test class for metrics."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.token = {"accessToken": "token"}
+        start_metrics()
+        set_rate_limit(None)
+
+    def tearDown(self):
+        metrics['started'] = None
+        rate_limit['limiter'] = None
+        self.directory.cleanup()
+
+    def test_endpoint_name(self, mock_sleep):
+        """Ids and the query should be removed from the endpoint."""
+        self.name = endpoint_name(
+            "GET", "https://graph.microsoft.com/beta/deviceManagement/intents/"
+                   "0f2b5d70-d4e9-4156-8c16-1397eb6c54a5/settings?$filter=test")
+
+        self.assertEqual(self.name, "GET /beta/deviceManagement/intents/{id}/settings")
+
+    @patch("src.IntuneCD.graph_request.session.get")
+    def test_record_request(self, mock_get, mock_sleep):
+        """Requests, statuses, retries and bytes should be recorded per endpoint and category."""
+        mock_get.side_effect = [_mock_response(status=503, content="unavailable"), _mock_response()]
+
+        with timed_category("backup", "Filters"):
+            makeapirequest("https://graph.microsoft.com/beta/deviceManagement/assignmentFilters", self.token)
+
+        self.report = metrics_report()
+        self.endpoint = self.report['endpoints']["GET /beta/deviceManagement/assignmentFilters"]
+        self.assertEqual(self.report['requests'], 2)
+        self.assertEqual(self.endpoint['statuses'], {"200": 1, "503": 1})
+        self.assertEqual(self.endpoint['retries'], 1)
+        self.assertEqual(self.endpoint['bytes_received'], len("unavailable") + len('{"value": []}'))
+        self.assertEqual(sum(self.endpoint['latency_buckets'].values()), 2)
+        self.assertEqual(self.report['categories']["backup: Filters"]['requests'], 2)
+
+    @patch("src.IntuneCD.graph_batch.makeapirequestPost")
+    def test_record_batch(self, mock_post, mock_sleep):
+        """Each request in a batch should be recorded with its status, throttled requests counted."""
+        mock_post.side_effect = [
+            {"responses": [{"id": 1, "status": 200, "body": {"id": "0"}},
+                           {"id": 2, "status": 429, "headers": {"Retry-After": "0"}, "body": {}}]},
+            {"responses": [{"id": 2, "status": 200, "body": {"id": "1"}}]}]
+
+        with patch("sys.stdout"):
+            batch_request(["0", "1"], "deviceManagement/intents/", "", self.token)
+
+        self.report = metrics_report()
+        self.assertEqual(self.report['requests'], 0)
+        self.assertEqual(self.report['throttled'], 1)
+        self.assertEqual(self.report['endpoints']["BATCH requests"]['statuses'], {"200": 2, "429": 1})
+
+    @patch("src.IntuneCD.graph_request.session.post")
+    def test_record_bytes_sent(self, mock_post, mock_sleep):
+        """The size of the request body should be recorded."""
+        mock_post.return_value = _mock_response(content="")
+
+        makeapirequestPost("https://graph.microsoft.com/beta/$batch", self.token, jdata='{"requests": []}')
+
+        self.assertEqual(metrics_report()['endpoints']["POST /beta/$batch"]['bytes_sent'], len('{"requests": []}'))
+
+    @patch("src.IntuneCD.graph_request.session.post")
+    def test_not_recording(self, mock_post, mock_sleep):
+        """Nothing should be recorded when metrics are not started."""
+        metrics['started'] = None
+        mock_post.return_value = _mock_response(content="")
+
+        makeapirequestPost("https://graph.microsoft.com/beta/test", self.token)
+
+        self.assertEqual(metrics['endpoints'], {})
+
+    def test_finish_metrics(self, mock_sleep):
+        """The report should be saved as JSON and metrics should stop being recorded."""
+        with timed_category("update", "Filters"):
+            pass
+
+        finish_metrics(f"{self.directory.path}/report.json")
+
+        with open(f"{self.directory.path}/report.json") as f:
+            self.report = json.load(f)
+        self.assertIn("update: Filters", self.report['categories'])
+        self.assertIsNone(metrics['started'])
+
+
+if __name__ == '__main__':
+    unittest.main()
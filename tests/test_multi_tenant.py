@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""
+This module tests backing up several tenants in one process.
+"""
+
+import io
+import os
+import json
+import tarfile
+import threading
+import contextlib
+import unittest
+
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from benchmarks.tenant import generate_tenant
+from benchmarks.graph_server import GraphServer
+from src.IntuneCD.graph_request import makeapirequest, set_graph_url
+from src.IntuneCD.multi_tenant import load_tenants, run_tenants
+from src.IntuneCD.archive_output import open_archive, close_archive, ARCHIVE_NAME
+from src.IntuneCD.rate_limit import rate_limit
+from src.IntuneCD.save_output import save_output
+
+
+@patch("src.IntuneCD.multi_tenant.getTenantAuth", side_effect=lambda params: {"accessToken": params['TENANT_NAME']})
+class TestMultiTenant(unittest.TestCase):
+    """Test class for multi_tenant."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.path = self.directory.path
+        self.directory.write("tenants.json", json.dumps([
+            {"params": {"TENANT_NAME": "tenant1", "CLIENT_ID": "id", "CLIENT_SECRET": "secret"}, "ratelimit": 5},
+            {"name": "second", "params": {"TENANT_NAME": "tenant2", "CLIENT_ID": "id", "CLIENT_SECRET": "secret"},
+             "path": f"{self.path}/custom"}]), encoding="utf-8")
+        self.tenants = load_tenants(f"{self.path}/tenants.json", f"{self.path}/backup")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load_tenants(self, mock_auth):
+        """Tenants without name or path should get defaults."""
+        self.assertEqual(self.tenants[0]['name'], "tenant1")
+        self.assertEqual(self.tenants[0]['path'], f"{self.path}/backup/tenant1")
+        self.assertEqual(self.tenants[1]['path'], f"{self.path}/custom")
+
+    def test_run_tenants_archive(self, mock_auth):
+        """Each tenant should be saved to its own archive while backed up at the same time."""
+        barrier = threading.Barrier(2)
+        limits = {}
+
+        def backup(path, token):
+            limits[token['accessToken']] = rate_limit['limiter']
+            os.makedirs(path)
+            open_archive(path)
+            barrier.wait()
+            save_output('archive', f"{path}/Filters/", token['accessToken'], {"tenant": token['accessToken']})
+            barrier.wait()
+            close_archive()
+            return 1
+
+        self.results = run_tenants(self.tenants, backup, workers=2)
+
+        self.assertEqual(self.results, {"tenant1": 1, "second": 1})
+        self.assertEqual(limits["tenant1"].interval, 0.2)
+        self.assertIsNone(limits["tenant2"].rate)
+        for tenant, name in ((self.tenants[0], "tenant1"), (self.tenants[1], "tenant2")):
+            with tarfile.open(f"{tenant['path']}/{ARCHIVE_NAME}") as tar:
+                self.assertEqual(tar.getnames(), [f"Filters/{name}.json"])
+
+    def test_run_tenants_connections(self, mock_auth):
+        """Tenants backed up at the same time should reuse the connections of the shared session."""
+        # Requests are sent for real, restore functions left patched by other test modules
+        patch.stopall()
+        self.server = GraphServer(generate_tenant(10, seed=1))
+        set_graph_url(self.server.start())
+        self.tenants = [{"name": name, "params": {"TENANT_NAME": name}, "path": f"{self.path}/{name}"}
+                        for name in ("first", "second")]
+
+        def backup(path, token):
+            for i in range(10):
+                makeapirequest("https://graph.microsoft.com/beta/deviceManagement/assignmentFilters", token)
+            return 10
+
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_tenants(self.tenants, backup, workers=2)
+        finally:
+            set_graph_url(None)
+            self.server.stop()
+
+        self.assertEqual(self.server.stats['requests'], 20)
+        self.assertLessEqual(self.server.stats['connections'], 2)
+
+    def test_run_tenants_output(self, mock_auth):
+        """The output of each tenant should be printed in one block."""
+        stdout = io.StringIO()
+
+        def backup(path, token):
+            print(f"backing up {token['accessToken']}")
+            return 0
+
+        with patch("sys.stdout", stdout):
+            run_tenants(self.tenants[:1], backup)
+
+        self.assertEqual(stdout.getvalue(), f"{'=' * 30} tenant1 {'=' * 30}\nbacking up tenant1\n"
+                                            f"Backed up 0 configurations to {self.tenants[0]['path']}\n")
+
+    def test_run_tenants_failed(self, mock_auth):
+        """Other tenants should be backed up if one fails, then an exception should be raised."""
+        done = []
+
+        def backup(path, token):
+            if token['accessToken'] == "tenant1":
+                raise Exception("failed")
+            done.append(token['accessToken'])
+            return 0
+
+        with self.assertRaises(Exception):
+            run_tenants(self.tenants, backup)
+
+        self.assertEqual(done, ["tenant2"])
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the progress events sent for each category.
+"""
+
+import unittest
+
+from src.IntuneCD.progress import set_progress_listener
+from src.IntuneCD.metrics import timed_category
+from src.IntuneCD.manifest import manifest_category
+
+
+class TestProgress(unittest.TestCase):
+    """Test class for progress."""
+
+    def setUp(self):
+        self.events = []
+        set_progress_listener(self.events.append)
+
+    def tearDown(self):
+        set_progress_listener(None)
+
+    def test_category(self):
+        """An event should be sent when the category starts and when it is done, with the count."""
+        with timed_category("update", "Filters") as category:
+            category.add(2)
+            self.count = category.add(3)
+
+        self.assertEqual(self.count, 3)
+        self.assertEqual([{k: v for k, v in event.items() if k != 'seconds'} for event in self.events], [
+            {'event': 'category', 'phase': 'update', 'category': 'Filters', 'status': 'started'},
+            {'event': 'category', 'phase': 'update', 'category': 'Filters', 'status': 'done', 'count': 5}])
+        self.assertGreaterEqual(self.events[1]['seconds'], 0)
+
+    def test_failed(self):
+        """The event sent when the category is done should have the failed status if it raised an exception."""
+        with self.assertRaises(Exception):
+            with timed_category("update", "Filters") as category:
+                category.add(1)
+                raise Exception("update failed")
+
+        self.assertEqual((self.events[-1]['status'], self.events[-1]['count']), ('failed', 1))
+
+    def test_manifest_category(self):
+        """Backed up categories should send events with the backup phase."""
+        with manifest_category("Filters") as category:
+            category.add(4)
+
+        self.assertEqual([(event['phase'], event['status']) for event in self.events],
+                         [('backup', 'started'), ('backup', 'done')])
+        self.assertEqual(self.events[-1]['count'], 4)
+
+    def test_no_listener(self):
+        """No events should be sent when no listener is set."""
+        set_progress_listener(None)
+
+        with timed_category("update", "Filters") as category:
+            category.add(1)
+
+        self.assertEqual(self.events, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
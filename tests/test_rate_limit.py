@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the rate_limit module.
+"""
+
+import unittest
+
+from unittest.mock import patch
+from src.IntuneCD.rate_limit import (RateLimiter, set_rate_limit, wait_for_rate_limit, update_rate_limit, rate_limit,
+                                     RAMP_UP, THROTTLE_BURST, THROTTLE_WINDOW)
+
+
+@patch("src.IntuneCD.rate_limit.time.monotonic", return_value=100.0)
+@patch("src.IntuneCD.rate_limit.time.sleep")
+class TestRateLimit(unittest.TestCase):
+    """Test class for rate_limit."""
+
+    def tearDown(self):
+        set_rate_limit(None)
+
+    def clock(self, mock_sleep, mock_monotonic):
+        """Advance the time by the seconds slept."""
+        self.now = mock_monotonic.return_value
+
+        def sleep(seconds):
+            self.now += seconds
+        mock_monotonic.side_effect = lambda: self.now
+        mock_sleep.side_effect = sleep
+
+    def test_requests_are_spaced(self, mock_sleep, mock_monotonic):
+        """Requests sent at the same time should wait for the interval."""
+        self.clock(mock_sleep, mock_monotonic)
+        self.limiter = RateLimiter(4)
+
+        self.limiter.wait()
+        self.limiter.wait()
+        self.limiter.wait()
+
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list], [0.25, 0.25])
+
+    def test_no_limit(self, mock_sleep, mock_monotonic):
+        """Without a rate limit requests should not wait."""
+        set_rate_limit(None)
+
+        wait_for_rate_limit()
+        wait_for_rate_limit()
+
+        self.assertIsNone(rate_limit['limiter'].rate)
+        self.assertEqual(mock_sleep.call_count, 0)
+
+    def throttle(self, limiter, count=THROTTLE_BURST, retry_after=0):
+        """Throttle enough requests to make throttling sustained."""
+        for i in range(count):
+            limiter.throttled(retry_after)
+
+    def test_throttled(self, mock_sleep, mock_monotonic):
+        """An isolated throttled request should pause requests for Retry-After and keep the rate."""
+        self.clock(mock_sleep, mock_monotonic)
+        set_rate_limit(4)
+
+        update_rate_limit(429, {"Retry-After": "3"})
+        wait_for_rate_limit()
+        wait_for_rate_limit()
+
+        self.assertEqual(rate_limit['limiter'].rate, 4)
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list], [3.0, 0.25])
+
+    def test_throttled_sustained(self, mock_sleep, mock_monotonic):
+        """Sustained throttling should halve the rate."""
+        set_rate_limit(4)
+
+        for i in range(THROTTLE_BURST):
+            update_rate_limit(429, {"Retry-After": "3"})
+
+        self.assertEqual(rate_limit['limiter'].rate, 2)
+        self.assertEqual(rate_limit['limiter'].blocked_until, 103.0)
+
+    def test_throttled_burst(self, mock_sleep, mock_monotonic):
+        """Requests throttled while backing off should lower the rate once."""
+        self.limiter = RateLimiter(4)
+
+        self.throttle(self.limiter, THROTTLE_BURST * 2)
+
+        self.assertEqual(self.limiter.rate, 2)
+
+    def test_throttled_again(self, mock_sleep, mock_monotonic):
+        """Requests throttled after backing off should lower the rate again."""
+        self.limiter = RateLimiter(4)
+
+        self.throttle(self.limiter)
+        mock_monotonic.return_value = 101.0
+        self.throttle(self.limiter)
+
+        self.assertEqual(self.limiter.rate, 1)
+
+    def test_floor(self, mock_sleep, mock_monotonic):
+        """The rate should not be lowered below a share of the maximum rate."""
+        self.limiter = RateLimiter(8)
+
+        for i in range(5):
+            mock_monotonic.return_value = 100.0 + i
+            self.throttle(self.limiter)
+
+        self.assertEqual(self.limiter.rate, 2)
+
+    def test_throttled_batch(self, mock_sleep, mock_monotonic):
+        """A batch should count once, with the share of its requests that were throttled."""
+        self.limiter = RateLimiter(4)
+
+        for i in range(THROTTLE_WINDOW):
+            self.limiter.throttled(0, 1 / 20)
+
+        self.assertEqual(self.limiter.rate, 4)
+
+    def test_sparse_throttling(self, mock_sleep, mock_monotonic):
+        """Throttling a few requests at random should not lower the rate the requests are sent at."""
+        self.clock(mock_sleep, mock_monotonic)
+        self.limiter = RateLimiter(10)
+
+        for i in range(300):
+            self.limiter.wait()
+            if i % 30 == 0:
+                self.limiter.throttled(1)
+            else:
+                self.limiter.succeeded()
+
+        self.assertEqual(self.limiter.rate, 10)
+        # The requests are spaced 0.1 seconds, each of the 10 throttled requests pauses them for 1 second
+        self.assertAlmostEqual(self.now - 100.0, 29.9 + 10 * 0.9, places=6)
+
+    def test_throttled_no_limit(self, mock_sleep, mock_monotonic):
+        """Without a rate limit, the rate should be lowered from the rate requests were sent at."""
+        self.limiter = RateLimiter()
+        for i in range(10):
+            self.limiter.wait()
+
+        self.throttle(self.limiter)
+
+        self.assertEqual(self.limiter.rate, 5)
+
+    def test_ramp_up(self, mock_sleep, mock_monotonic):
+        """Healthy responses should raise the rate up to the maximum."""
+        self.limiter = RateLimiter(4)
+        self.throttle(self.limiter)
+        self.assertEqual(self.limiter.rate, 2)
+
+        mock_monotonic.return_value = 101.0 + RAMP_UP / 2
+        self.limiter.succeeded()
+        self.assertAlmostEqual(self.limiter.rate, 2 * 2 ** 0.5)
+
+        mock_monotonic.return_value = 101.0 + RAMP_UP * 2
+        self.limiter.succeeded()
+        self.assertEqual(self.limiter.rate, 4)
+
+    def test_ramp_up_no_limit(self, mock_sleep, mock_monotonic):
+        """Without a rate limit, requests should not be limited once the rate is raised above the rate sent at."""
+        self.limiter = RateLimiter()
+        for i in range(10):
+            self.limiter.wait()
+        self.throttle(self.limiter)
+
+        mock_monotonic.return_value = 101.0 + RAMP_UP * 2
+        self.limiter.succeeded()
+
+        self.assertIsNone(self.limiter.rate)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""
+This module tests caching responses from Graph between runs.
+"""
+
+import io
+import contextlib
+import unittest
+
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from benchmarks.tenant import generate_tenant
+from benchmarks.graph_server import GraphServer
+from src.IntuneCD.graph_request import makeapirequest, set_graph_url
+from src.IntuneCD.graph_batch import batch_request
+from src.IntuneCD.response_cache import open_response_cache, close_response_cache, response_cache
+from src.IntuneCD.run_update import start as start_update
+
+TOKEN = {"accessToken": "token"}
+FILTERS = "https://graph.microsoft.com/beta/deviceManagement/assignmentFilters"
+TEMPLATES = "https://graph.microsoft.com/beta/deviceManagement/templates"
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test class for response_cache."""
+
+    def setUp(self):
+        # Requests are sent for real, restore functions left patched by other test modules
+        patch.stopall()
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.tenant = generate_tenant(50, seed=3)
+        self.server = GraphServer(self.tenant, page_size=10)
+        set_graph_url(self.server.start())
+        open_response_cache(self.directory.path)
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            close_response_cache()
+        set_graph_url(None)
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_not_modified(self):
+        """A response that has not changed should be answered with 304 and returned from the cache."""
+        self.first = makeapirequest(FILTERS, TOKEN)
+        self.second = makeapirequest(FILTERS, TOKEN)
+
+        self.assertEqual(self.second, self.first)
+        self.assertEqual(self.server.stats['not_modified'], 1)
+        self.assertEqual(response_cache['not_modified'], 1)
+
+    def test_modified(self):
+        """A response that has changed should be returned from Graph."""
+        self.first = makeapirequest(FILTERS, TOKEN)
+        self.tenant.remove('deviceManagement/assignmentFilters/' + self.first['value'][0]['id'])
+        self.second = makeapirequest(FILTERS, TOKEN)
+
+        self.assertEqual(self.second['value'], self.first['value'][1:])
+        self.assertEqual(self.server.stats['not_modified'], 0)
+
+    def test_immutable(self):
+        """Resources that do not change should be returned from the cache without sending a request."""
+        self.template = makeapirequest(TEMPLATES, TOKEN)['value'][0]['id']
+        self.first = makeapirequest(f"{TEMPLATES}/{self.template}/categories", TOKEN)
+        self.requests = self.server.stats['requests']
+        self.second = makeapirequest(f"{TEMPLATES}/{self.template}/categories", TOKEN)
+
+        self.assertEqual(self.second, self.first)
+        self.assertEqual(self.server.stats['requests'], self.requests)
+        self.assertEqual(response_cache['hits'], 1)
+
+    def test_immutable_batch(self):
+        """Resources that do not change should be served from the cache in a batch, in the order requested."""
+        self.templates = [template['id'] for template in makeapirequest(TEMPLATES, TOKEN)['value']]
+        self.first = batch_request(self.templates[:1], 'deviceManagement/templates/', '/categories', TOKEN)
+        self.second = batch_request(self.templates, 'deviceManagement/templates/', '/categories', TOKEN)
+        self.batches = self.server.stats['batch_requests']
+        self.third = batch_request(self.templates, 'deviceManagement/templates/', '/categories', TOKEN)
+
+        self.assertEqual(self.second[0], self.first[0])
+        self.assertEqual(self.third, self.second)
+        self.assertEqual(self.server.stats['batch_requests'], self.batches)
+
+    def test_mixed_batch(self):
+        """A batch with cached and live responses should return them in the order requested."""
+        self.templates = [template['id'] for template in makeapirequest(TEMPLATES, TOKEN)['value']][:2]
+        self.first = batch_request(self.templates[:1], 'deviceManagement/templates/', '/categories', TOKEN)
+        # Graph returns the IDs in a batch as strings
+        self.live = {'responses': [{'id': '2', 'status': 200, 'headers': {}, 'body': {'live': True}}]}
+
+        with patch("src.IntuneCD.graph_batch.makeapirequestPost", return_value=self.live):
+            self.second = batch_request(self.templates, 'deviceManagement/templates/', '/categories', TOKEN)
+
+        self.assertEqual(self.second, [self.first[0], {'live': True}])
+        self.assertEqual(response_cache['hits'], 1)
+
+    def test_closed(self):
+        """No requests should be sent conditionally once the cache is closed."""
+        makeapirequest(FILTERS, TOKEN)
+        with contextlib.redirect_stdout(io.StringIO()):
+            close_response_cache()
+        makeapirequest(FILTERS, TOKEN)
+
+        self.assertEqual(self.server.stats['not_modified'], 0)
+
+    def test_failed_update(self):
+        """Responses cached by an update that failed should be used by the next run."""
+        def failed_update(*args):
+            makeapirequest(FILTERS, TOKEN)
+            raise Exception("update failed")
+
+        close_response_cache()
+        argv = ["IntuneCD-startupdate", "-p", self.directory.path, "--cache", self.directory.path]
+        with patch("sys.argv", argv), patch("src.IntuneCD.run_update.getAuth", return_value=TOKEN), \
+                patch("src.IntuneCD.run_update.run_update", side_effect=failed_update), \
+                contextlib.redirect_stdout(io.StringIO()) as output:
+            with self.assertRaises(Exception):
+                start_update()
+
+        self.assertIsNone(response_cache['path'])
+        self.assertIn("Response cache: 0 responses served from the cache, 0 not modified, 1 saved",
+                      output.getvalue())
+
+        open_response_cache(self.directory.path)
+        makeapirequest(FILTERS, TOKEN)
+        self.assertEqual(self.server.stats['not_modified'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
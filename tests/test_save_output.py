@@ -10,7 +10,7 @@ import yaml
 
 from testfixtures import TempDirectory
 from unittest.mock import patch
-from src.IntuneCD.save_output import save_output
+from src.IntuneCD.save_output import save_output, save_text
 
 
 @patch("src.IntuneCD.save_output")
@@ -57,6 +57,13 @@ class TestSaveOutput(unittest.TestCase):
             self.save = save_output(
                 'invalid', self.path, self.fname, self.data)
 
+    def test_save_text(self, mock_save_output):
+        """The folder should be created and the file should have the expected contents."""
+        save_text('json', self.path + "Script Data/", "script.sh", "echo test")
+
+        with open(self.path + "Script Data/script.sh", 'r') as f:
+            self.assertEqual(f.read(), "echo test")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+This module tests scanning the backup for files.
+"""
+
+import os
+import unittest
+
+from unittest.mock import patch
+from testfixtures import TempDirectory
+from src.IntuneCD.scan_files import scan_backup, get_files, walk_files, file_format, tree
+
+
+class TestScanFiles(unittest.TestCase):
+    """Test class for scan_files."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.path = self.directory.path
+        self.directory.write("Filters/b.yaml", "name: b", encoding="utf-8")
+        self.directory.write("Filters/A.json", "{}", encoding="utf-8")
+        self.directory.write("Filters/Filters.md", "# Filters", encoding="utf-8")
+        self.directory.write("Filters/.DS_Store", "", encoding="utf-8")
+        self.directory.write("Filters/Script Data/test.ps1", "test", encoding="utf-8")
+        self.directory.write("Management Intents/Template/intent.json", "{}", encoding="utf-8")
+
+    def tearDown(self):
+        tree['root'] = None
+        tree['dirs'] = {}
+        self.directory.cleanup()
+
+    def test_file_format(self):
+        """The format should be returned from the extension."""
+        self.assertEqual(file_format("test.json"), "json")
+        self.assertEqual(file_format("test.yaml"), "yaml")
+        self.assertEqual(file_format("test.md"), "md")
+        self.assertIsNone(file_format("test.ps1"))
+
+    def test_get_files(self):
+        """JSON and YAML files in the folder should be returned sorted, without hidden files and folders."""
+        self.files = get_files(f"{self.path}/Filters")
+
+        self.assertEqual(self.files, [f"{self.path}/Filters/A.json", f"{self.path}/Filters/b.yaml"])
+
+    def test_get_files_subdirs(self):
+        """Files in the sub folders should be returned."""
+        self.files = get_files(f"{self.path}/Management Intents/", subdirs=True)
+
+        self.assertEqual(self.files, [f"{self.path}/Management Intents/Template/intent.json"])
+
+    def test_get_files_path_does_not_exist(self):
+        """An empty list should be returned."""
+        self.assertEqual(get_files(f"{self.path}/Compliance Policies"), [])
+
+    def test_scan_backup_walks_once(self):
+        """Folders in a scanned backup should not be read again."""
+        scan_backup(self.path)
+
+        with patch("src.IntuneCD.scan_files.os.scandir") as self.scandir:
+            self.files = get_files(f"{self.path}/Filters", formats=('md',))
+
+        self.assertEqual(self.scandir.call_count, 0)
+        self.assertEqual(self.files, [f"{self.path}/Filters/Filters.md"])
+
+    def test_walk_files(self):
+        """All files should be returned sorted by depth."""
+        self.files = walk_files(self.path)
+
+        self.assertEqual(self.files, [
+            os.path.join(self.path, "Filters", "A.json"),
+            os.path.join(self.path, "Filters", "b.yaml"),
+            os.path.join(self.path, "Management Intents", "Template", "intent.json")
+        ])
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""
+This module tests keeping the backup in an in-memory snapshot.
+"""
+
+import os
+import json
+import threading
+import unittest
+
+from testfixtures import TempDirectory
+from src.IntuneCD.save_output import save_output, save_text
+from src.IntuneCD.scan_files import get_files
+from src.IntuneCD.snapshot import (open_snapshot, close_snapshot, path_exists, open_file, category_done,
+                                   finish_snapshot, wait_for_category, snapshot)
+
+
+class TestSnapshot(unittest.TestCase):
+    """Test class for snapshot."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.path = self.directory.path
+        open_snapshot(self.path)
+
+    def tearDown(self):
+        close_snapshot()
+        self.directory.cleanup()
+
+    def test_save_output_kept_in_memory(self):
+        """The configuration should be kept in the snapshot and not saved to disk."""
+        save_output('json', f"{self.path}/Filters/", "test", {"displayName": "test"})
+
+        self.assertFalse(os.path.exists(f"{self.path}/Filters"))
+        self.assertTrue(path_exists(f"{self.path}/Filters/"))
+        with open_file(f"{self.path}/Filters/test.json") as f:
+            self.assertEqual(json.load(f), {"displayName": "test"})
+
+    def test_save_output_persist(self):
+        """The configuration should be kept in the snapshot and saved to disk."""
+        open_snapshot(self.path, persist=True)
+        save_output('json', f"{self.path}/Filters/", "test", {"displayName": "test"})
+
+        self.assertTrue(os.path.exists(f"{self.path}/Filters/test.json"))
+        self.assertEqual(get_files(f"{self.path}/Filters/"), [f"{self.path}/Filters/test.json"])
+
+    def test_get_files(self):
+        """Files in the snapshot should be returned sorted, with sub folders only when asked for."""
+        save_output('yaml', f"{self.path}/Filters/", "b", {})
+        save_output('json', f"{self.path}/Filters/", "A", {})
+        save_text('json', f"{self.path}/Filters/Script Data/", "test.ps1", "test")
+        save_output('json', f"{self.path}/Management Intents/Template/", "intent", {})
+
+        self.assertEqual(get_files(f"{self.path}/Filters/"),
+                         [f"{self.path}/Filters/A.json", f"{self.path}/Filters/b.yaml"])
+        self.assertEqual(get_files(f"{self.path}/Management Intents/", subdirs=True),
+                         [f"{self.path}/Management Intents/Template/intent.json"])
+        self.assertEqual(get_files(f"{self.path}/Compliance Policies/"), [])
+
+    def test_open_file_bytes(self):
+        """Text saved to the snapshot should be readable as bytes."""
+        save_text('json', f"{self.path}/Profiles/mobileconfig/", "test.mobileconfig", "<plist/>")
+
+        with open_file(f"{self.path}/Profiles/mobileconfig/test.mobileconfig", 'rb') as f:
+            self.assertEqual(f.read(), b"<plist/>")
+
+    def test_open_file_not_found(self):
+        """FileNotFoundError should be raised for files not in the snapshot."""
+        with self.assertRaises(FileNotFoundError):
+            open_file(f"{self.path}/Filters/test.json")
+
+    def test_outside_snapshot(self):
+        """Paths outside the snapshot should be read from disk."""
+        other = TempDirectory()
+        other.write("test.json", "{}", encoding="utf-8")
+
+        self.assertTrue(path_exists(f"{other.path}/test.json"))
+        with open_file(f"{other.path}/test.json") as f:
+            self.assertEqual(f.read(), "{}")
+        other.cleanup()
+
+    def test_wait_for_category(self):
+        """Waiting should return when the category is done in another thread."""
+        thread = threading.Thread(target=category_done, args=("Filters",))
+        thread.start()
+        wait_for_category("Filters")
+        thread.join()
+
+        self.assertIn("Filters", snapshot['done'])
+
+    def test_wait_for_category_backup_failed(self):
+        """An exception should be raised when the backup failed."""
+        finish_snapshot(ValueError("test"))
+
+        with self.assertRaises(Exception):
+            wait_for_category("Filters")
+
+    def test_wait_for_category_no_snapshot(self):
+        """Waiting should return right away when no snapshot is open."""
+        close_snapshot()
+
+        wait_for_category("Filters")
+
+
+if __name__ == '__main__':
+    unittest.main()
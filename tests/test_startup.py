@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+
+"""
+This module tests the dependencies imported when the IntuneCD commands start.
+"""
+
+import unittest
+
+from benchmarks.startup import COMMANDS, measure
+
+
+class TestStartup(unittest.TestCase):
+    """Test class for the start up of the commands."""
+
+    def test_heavy_modules(self):
+        """Heavy dependencies should not be imported when a command starts."""
+        for command, module in COMMANDS.items():
+            with self.subTest(command=command):
+                self.assertEqual(measure(module, runs=1)['heavy_modules'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,22 @@
 #!/usr/bin/env python3
 
 """
-This module tests the update_frontend function.
+This module tests the update_frontend function, the FeedStream class and updating the frontend from the commands.
 """
 
+import io
+import time
+import threading
+import base64
+import contextlib
 import unittest
 
 from unittest import mock
 from unittest.mock import patch
-from src.IntuneCD.update_frontend import update_frontend
+from testfixtures import TempDirectory
+from src.IntuneCD.update_frontend import update_frontend, FeedStream
+from src.IntuneCD.metrics import timed_category
+from src.IntuneCD.run_update import start as start_update
 
 
 def _mock_response(
@@ -77,5 +85,195 @@ class TestUpdateFrontend(unittest.TestCase):
                               {"configurations": 1})
 
 
+def _feed(mock_post):
+    """Return the chunks posted to the feed and the output they decode to."""
+    chunks = [call.kwargs['json'] for call in mock_post.call_args_list]
+    return chunks, ''.join(base64.b64decode(chunk['feed']).decode('utf-8') for chunk in chunks if 'feed' in chunk)
+
+
+@patch("requests.post")
+class TestFeedStream(unittest.TestCase):
+    """Test class for FeedStream."""
+
+    def setUp(self):
+        self.env = patch.dict("os.environ", {'API_KEY': 'test'})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+
+    def test_chunks(self, mock_post):
+        """The output should be sent in numbered chunks, the last one marked final."""
+        mock_post.return_value = _mock_response(self, status=200, content='')
+
+        with FeedStream("http://localhost:8080/api/feed/update", 'backup', chunk_size=10) as feed:
+            for i in range(5):
+                print(f"Backing up profile {i}", file=feed)
+
+        self.chunks, self.output = _feed(mock_post)
+
+        self.assertEqual(self.output, ''.join(f"Backing up profile {i}\n" for i in range(5)))
+        self.assertEqual([chunk['sequence'] for chunk in self.chunks], list(range(6)))
+        self.assertEqual([chunk['final'] for chunk in self.chunks], [False] * 5 + [True])
+        self.assertEqual({chunk['type'] for chunk in self.chunks}, {'backup'})
+
+    def test_interval(self, mock_post):
+        """Output in a chunk that is not full should be sent after the interval."""
+        mock_post.return_value = _mock_response(self, status=200, content='')
+
+        with FeedStream("http://localhost:8080/api/feed/update", 'update', interval=0.01) as feed:
+            print("Updating profile", file=feed)
+            for i in range(100):
+                if mock_post.called:
+                    break
+                time.sleep(0.01)
+
+            self.assertEqual(_feed(mock_post), ([{'type': 'update', 'event': 'output', 'feed': base64.b64encode(
+                b"Updating profile\n").decode('utf-8'), 'sequence': 0, 'final': False}], "Updating profile\n"))
+
+    def test_event(self, mock_post):
+        """Progress events should be sent after the output written before them, numbered with the chunks."""
+        mock_post.return_value = _mock_response(self, status=200, content='')
+
+        with FeedStream("http://localhost:8080/api/feed/stream", 'backup') as feed:
+            print("Backing up profile", file=feed)
+            feed.event({'event': 'category', 'category': 'Profiles', 'status': 'done', 'count': 1})
+
+        self.chunks = _feed(mock_post)[0]
+
+        self.assertEqual([(chunk['event'], chunk['sequence']) for chunk in self.chunks],
+                         [('output', 0), ('category', 1), ('output', 2)])
+        self.assertEqual(self.chunks[1], {'type': 'backup', 'event': 'category', 'category': 'Profiles',
+                                          'status': 'done', 'count': 1, 'sequence': 1, 'final': False})
+
+    def test_bounded(self, mock_post):
+        """Writing should block while the maximum number of chunks is waiting to be sent."""
+        sending = threading.Event()
+        release = threading.Event()
+
+        def post(*args, **kwargs):
+            sending.set()
+            release.wait()
+            return _mock_response(self, status=200, content='')
+
+        mock_post.side_effect = post
+        feed = FeedStream("http://localhost:8080/api/feed/update", 'backup', chunk_size=1, max_chunks=1)
+        writer = threading.Thread(target=lambda: [feed.write(str(i)) for i in range(5)])
+        writer.start()
+        sending.wait()
+        writer.join(timeout=0.1)
+
+        self.assertTrue(writer.is_alive())
+        self.assertEqual(feed.chunks.qsize(), 1)
+
+        release.set()
+        writer.join()
+        feed.close()
+        self.assertEqual(_feed(mock_post)[1], "01234")
+
+    def test_interval_queue_full(self, mock_post):
+        """Output should not be queued after the interval while the queue is full, the sender would wait on itself."""
+        sending = threading.Event()
+        release = threading.Event()
+
+        def post(*args, **kwargs):
+            sending.set()
+            release.wait()
+            return _mock_response(self, status=200, content='')
+
+        mock_post.side_effect = post
+        feed = FeedStream("http://localhost:8080/api/feed/update", 'backup', chunk_size=1, max_chunks=1)
+        feed.write("0")
+        sending.wait()
+        feed.write("1")
+        # The output written after the queue is full is less than a chunk, so only the interval would queue it
+        feed.chunk_size = 1024
+        feed.write("Backing up profile\n")
+
+        with feed.lock:
+            feed._queue_chunk(block=False)
+            self.assertEqual((feed.buffer, feed.sequence), (["Backing up profile\n"], 2))
+
+        release.set()
+        feed.close()
+        self.assertEqual(_feed(mock_post)[1], "01Backing up profile\n")
+
+    def test_retry(self, mock_post):
+        """A chunk that failed should be sent again."""
+        mock_post.side_effect = [_mock_response(self, status=500, content='Internal Server Error'),
+                                 _mock_response(self, status=200, content='')]
+
+        with FeedStream("http://localhost:8080/api/feed/update", 'backup', retry_delay=0) as feed:
+            print("Backing up profile", file=feed)
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(_feed(mock_post)[1], "Backing up profile\nBacking up profile\n")
+
+    def test_failed(self, mock_post):
+        """A chunk that still fails should raise an exception when the stream is closed."""
+        mock_post.return_value = _mock_response(self, status=500, content='Internal Server Error')
+
+        with self.assertRaises(Exception):
+            with FeedStream("http://localhost:8080/api/feed/update", 'backup', chunk_size=10, retries=1,
+                            retry_delay=0) as feed:
+                for i in range(5):
+                    print(f"Backing up profile {i}", file=feed)
+
+        # The rest of the feed is dropped after the first chunk failed
+        self.assertEqual(mock_post.call_count, 2)
+
+
+@patch("requests.post")
+@patch("src.IntuneCD.run_update.getAuth", return_value="token")
+class TestFrontendFeed(unittest.TestCase):
+    """Test class for updating the frontend feed from the commands."""
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.directory.create()
+        self.env = patch.dict("os.environ", {'API_KEY': 'test'})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.directory.cleanup()
+
+    def update(self, mock_post, *args):
+        def run_update(*run_args):
+            print("Updating profile")
+            with timed_category("update", "Profiles") as category:
+                return category.add(2)
+
+        mock_post.return_value = _mock_response(self, status=200, content='')
+        argv = ["IntuneCD-startupdate", "-p", self.directory.path, "-f", "http://localhost:8080", *args]
+        with patch("sys.argv", argv), patch("src.IntuneCD.run_update.run_update", side_effect=run_update), \
+                contextlib.redirect_stdout(io.StringIO()):
+            start_update()
+
+        return [(call.args[0], call.kwargs['json']) for call in mock_post.call_args_list]
+
+    def test_feed(self, mock_auth, mock_post):
+        """The whole output should be sent to the feed in one request when the run is done."""
+        self.posts = self.update(mock_post)
+
+        self.assertEqual(self.posts, [
+            ("http://localhost:8080/api/overview/summary", {'type': 'diff_count', 'diff_count': 2}),
+            ("http://localhost:8080/api/feed/update",
+             {'type': 'update', 'feed': base64.b64encode(b"Updating profile\n").decode('utf-8')})])
+
+    def test_feed_stream(self, mock_auth, mock_post):
+        """With --frontendstream the output and category events should be streamed to the feed stream."""
+        self.posts = self.update(mock_post, "--frontendstream")
+        self.events = [body for url, body in self.posts if url == "http://localhost:8080/api/feed/stream"]
+
+        self.assertEqual([(event['event'], event.get('status')) for event in self.events],
+                         [('output', None), ('category', 'started'), ('category', 'done'), ('output', None)])
+        self.assertEqual(self.events[2]['count'], 2)
+        self.assertTrue(self.events[-1]['final'])
+        self.assertEqual(self.posts[-1], ("http://localhost:8080/api/overview/summary",
+                                          {'type': 'diff_count', 'diff_count': 2}))
+        self.assertNotIn("http://localhost:8080/api/feed/update", [url for url, body in self.posts])
+
+
 if __name__ == '__main__':
     unittest.main()